@@ -0,0 +1,29 @@
+"""add_partial_credit_balance
+
+Revision ID: 3c9e1f4a7b20
+Revises: 0f242032f6d4
+Create Date: 2026-10-18 10:12:44.318206
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9e1f4a7b20'
+down_revision: Union[str, None] = '0f242032f6d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Fraction de crédit consommée par les régénérations partielles (pas encore déduite)
+    op.add_column('users', sa.Column('partial_credit_balance', sa.Float(), nullable=False, server_default='0'))
+    op.add_column('teams', sa.Column('partial_credit_balance', sa.Float(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    op.drop_column('teams', 'partial_credit_balance')
+    op.drop_column('users', 'partial_credit_balance')
@@ -0,0 +1,51 @@
+"""add_hot_path_indexes
+
+Revision ID: 5d7e2a9c4f13
+Revises: 3c9e1f4a7b20
+Create Date: 2026-10-18 14:05:21.507392
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d7e2a9c4f13'
+down_revision: Union[str, None] = '3c9e1f4a7b20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (nom, table, colonnes) - doit rester aligné avec les __table_args__ de app/models.py
+INDEXES = [
+    ('ix_content_requests_user_id_created_at', 'content_requests', ['user_id', 'created_at']),
+    ('ix_generated_contents_request_id', 'generated_contents', ['request_id']),
+    ('ix_scheduled_contents_user_id_scheduled_date', 'scheduled_contents', ['user_id', 'scheduled_date']),
+    ('ix_scheduled_contents_reminder_24h', 'scheduled_contents', ['status', 'reminder_24h_sent', 'scheduled_date']),
+    ('ix_scheduled_contents_reminder_1h', 'scheduled_contents', ['status', 'reminder_1h_sent', 'scheduled_date']),
+    ('ix_team_members_user_id_status', 'team_members', ['user_id', 'status']),
+    ('ix_usage_analytics_user_id_request_date', 'usage_analytics', ['user_id', 'request_date']),
+]
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY ne bloque pas les écritures mais ne peut pas tourner dans une transaction
+    with op.get_context().autocommit_block():
+        conn = op.get_bind()
+        for name, table, columns in INDEXES:
+            # Un build concurrent interrompu laisse un index INVALID : on le supprime avant de recommencer
+            invalid = conn.execute(sa.text(
+                "SELECT 1 FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid "
+                "WHERE c.relname = :name AND NOT i.indisvalid"
+            ), {"name": name}).first()
+            if invalid:
+                op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+            op.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({", ".join(columns)})')
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, _, _ in reversed(INDEXES):
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
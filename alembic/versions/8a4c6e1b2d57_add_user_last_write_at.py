@@ -0,0 +1,27 @@
+"""add_user_last_write_at
+
+Revision ID: 8a4c6e1b2d57
+Revises: 5d7e2a9c4f13
+Create Date: 2026-10-18 16:22:09.844130
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a4c6e1b2d57'
+down_revision: Union[str, None] = '5d7e2a9c4f13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Dernière écriture de l'utilisateur : ses lectures restent sur le primaire pendant la fenêtre read-your-writes
+    op.add_column('users', sa.Column('last_write_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'last_write_at')
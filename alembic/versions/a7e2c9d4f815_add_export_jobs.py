@@ -0,0 +1,49 @@
+"""add_export_jobs
+
+Revision ID: a7e2c9d4f815
+Revises: f1d7b3c9e264
+Create Date: 2026-10-18 23:18:42.601937
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7e2c9d4f815'
+down_revision: Union[str, None] = 'f1d7b3c9e264'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'export_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('format', sa.String(), nullable=False),
+        sa.Column('include_team', sa.Boolean(), nullable=False, server_default=sa.true()),
+        sa.Column('date_from', sa.DateTime(), nullable=True),
+        sa.Column('date_to', sa.DateTime(), nullable=True),
+        sa.Column('cursor', sa.String(), nullable=True),
+        sa.Column('status', sa.String(), nullable=False, server_default='pending'),
+        sa.Column('requests_count', sa.Integer(), nullable=True),
+        sa.Column('file_path', sa.String(), nullable=True),
+        sa.Column('file_size', sa.BigInteger(), nullable=True),
+        sa.Column('error_message', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.text('now()')),
+        sa.Column('completed_at', sa.DateTime(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_export_jobs_id'), 'export_jobs', ['id'], unique=False)
+    op.create_index(op.f('ix_export_jobs_user_id'), 'export_jobs', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_export_jobs_user_id'), table_name='export_jobs')
+    op.drop_index(op.f('ix_export_jobs_id'), table_name='export_jobs')
+    op.drop_table('export_jobs')
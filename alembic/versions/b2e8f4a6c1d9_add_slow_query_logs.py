@@ -0,0 +1,42 @@
+"""add_slow_query_logs
+
+Revision ID: b2e8f4a6c1d9
+Revises: 8a4c6e1b2d57
+Create Date: 2026-10-18 17:05:41.302118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b2e8f4a6c1d9'
+down_revision: Union[str, None] = '8a4c6e1b2d57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Journal des requêtes SQL lentes (SLOW_QUERY_LOG_TABLE=true)
+    op.create_table(
+        'slow_query_logs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('fingerprint', sa.Text(), nullable=False),
+        sa.Column('statement', sa.Text(), nullable=False),
+        sa.Column('duration_ms', sa.Float(), nullable=False),
+        sa.Column('row_count', sa.Integer(), nullable=True),
+        sa.Column('route', sa.String(), nullable=True),
+        sa.Column('plan', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_slow_query_logs_id'), 'slow_query_logs', ['id'], unique=False)
+    op.create_index(op.f('ix_slow_query_logs_created_at'), 'slow_query_logs', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_slow_query_logs_created_at'), table_name='slow_query_logs')
+    op.drop_index(op.f('ix_slow_query_logs_id'), table_name='slow_query_logs')
+    op.drop_table('slow_query_logs')
@@ -0,0 +1,42 @@
+"""exact_partial_credit_units
+
+Revision ID: b8d2f6a4c031
+Revises: a7e2c9d4f815
+Create Date: 2026-10-19 09:41:27.512093
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8d2f6a4c031'
+down_revision: Union[str, None] = 'a7e2c9d4f815'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Figé : app.utils.team_utils.CREDIT_UNITS au moment de la migration
+CREDIT_UNITS = 12_252_240
+
+
+def upgrade() -> None:
+    # Solde partiel exact : entier en 1/CREDIT_UNITS de crédit au lieu d'un Float arrondi
+    for table in ('users', 'teams'):
+        op.add_column(table, sa.Column('partial_credit_units', sa.BigInteger(), nullable=False, server_default='0'))
+        op.execute(
+            f"UPDATE {table} SET partial_credit_units = ROUND(partial_credit_balance * {CREDIT_UNITS}) "
+            "WHERE partial_credit_balance <> 0"
+        )
+        op.drop_column(table, 'partial_credit_balance')
+
+
+def downgrade() -> None:
+    for table in ('users', 'teams'):
+        op.add_column(table, sa.Column('partial_credit_balance', sa.Float(), nullable=False, server_default='0'))
+        op.execute(
+            f"UPDATE {table} SET partial_credit_balance = partial_credit_units::float / {CREDIT_UNITS} "
+            "WHERE partial_credit_units <> 0"
+        )
+        op.drop_column(table, 'partial_credit_units')
@@ -0,0 +1,159 @@
+"""partition_content_tables_by_month
+
+Revision ID: c5a1d7e3f920
+Revises: b2e8f4a6c1d9
+Create Date: 2026-10-18 18:12:37.905114
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5a1d7e3f920'
+down_revision: Union[str, None] = 'b2e8f4a6c1d9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Valeurs et helpers figés à la date de la migration (indépendants de app.partitioning)
+PARTITION_MONTHS_AHEAD = 3
+
+
+def _month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+
+def _add_months(value: datetime, months: int) -> datetime:
+    year, month = divmod(value.month - 1 + months, 12)
+    return datetime(value.year + year, month + 1, 1)
+
+
+def _create_partition_sql(table: str, lower: datetime) -> str:
+    upper = _add_months(lower, 1)
+    return (
+        f"CREATE TABLE IF NOT EXISTS {table}_y{lower:%Y}m{lower:%m} PARTITION OF {table} "
+        f"FOR VALUES FROM ('{lower:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')"
+    )
+
+
+# Réécrit les deux tables : à lancer pendant une fenêtre de maintenance (écritures bloquées pendant la copie)
+TABLES = {
+    'content_requests': {
+        'columns': """
+            id INTEGER NOT NULL DEFAULT nextval('content_requests_id_seq'::regclass),
+            user_id INTEGER NOT NULL REFERENCES users(id),
+            original_text TEXT NOT NULL,
+            platform VARCHAR NOT NULL,
+            tone VARCHAR,
+            language VARCHAR,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT (now() AT TIME ZONE 'utc')
+        """,
+        'copy': ['id', 'user_id', 'original_text', 'platform', 'tone', 'language'],
+        'indexes': [
+            ('ix_content_requests_id', ['id']),
+            ('ix_content_requests_user_id_created_at', ['user_id', 'created_at']),
+        ],
+    },
+    'generated_contents': {
+        'columns': """
+            id INTEGER NOT NULL DEFAULT nextval('generated_contents_id_seq'::regclass),
+            request_id INTEGER NOT NULL,
+            polished_text TEXT NOT NULL,
+            format_name VARCHAR,
+            variant_number INTEGER,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT (now() AT TIME ZONE 'utc')
+        """,
+        'copy': ['id', 'request_id', 'polished_text', 'format_name', 'variant_number'],
+        'indexes': [
+            ('ix_generated_contents_id', ['id']),
+            ('ix_generated_contents_request_id', ['request_id']),
+        ],
+    },
+}
+
+# FK vers ces tables : impossibles une fois partitionnées (l'unicité porte sur id + created_at)
+DROPPED_FOREIGN_KEYS = [
+    ('generated_contents', 'request_id', 'content_requests'),
+    ('scheduled_contents', 'content_request_id', 'content_requests'),
+    ('scheduled_contents', 'generated_content_id', 'generated_contents'),
+]
+
+
+def _drop_referencing_foreign_keys(conn) -> None:
+    rows = conn.execute(sa.text(
+        "SELECT conrelid::regclass::text, conname FROM pg_constraint "
+        "WHERE contype = 'f' AND confrelid IN ('content_requests'::regclass, 'generated_contents'::regclass)"
+    )).all()
+    for table, constraint in rows:
+        op.execute(f'ALTER TABLE {table} DROP CONSTRAINT IF EXISTS "{constraint}"')
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    _drop_referencing_foreign_keys(conn)
+
+    for table, spec in TABLES.items():
+        legacy = f'{table}_unpartitioned'
+        op.execute(f'LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE')
+        op.execute(f'ALTER TABLE {table} RENAME TO {legacy}')
+        op.execute(f'ALTER TABLE {legacy} RENAME CONSTRAINT {table}_pkey TO {legacy}_pkey')
+        for name, _ in spec['indexes']:
+            op.execute(f'DROP INDEX IF EXISTS {name}')
+        # La séquence doit survivre à la suppression de l'ancienne table
+        op.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY NONE')
+
+        op.execute(
+            f'CREATE TABLE {table} ({spec["columns"]}, PRIMARY KEY (id, created_at)) '
+            f'PARTITION BY RANGE (created_at)'
+        )
+        op.execute(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT')
+
+        # Une partition par mois, du plus ancien contenu jusqu'à PARTITION_MONTHS_AHEAD mois dans le futur
+        oldest = conn.execute(sa.text(f'SELECT min(created_at) FROM {legacy}')).scalar()
+        last = _add_months(_month_start(datetime.utcnow()), PARTITION_MONTHS_AHEAD)
+        lower = _month_start(min(oldest or datetime.utcnow(), datetime.utcnow()))
+        while lower <= last:
+            op.execute(_create_partition_sql(table, lower))
+            lower = _add_months(lower, 1)
+
+        columns = ', '.join(spec['copy'])
+        op.execute(
+            f'INSERT INTO {table} ({columns}, created_at) '
+            f"SELECT {columns}, COALESCE(created_at, now() AT TIME ZONE 'utc') FROM {legacy}"
+        )
+        op.execute(f'DROP TABLE {legacy}')
+        op.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id')
+
+        # Index créés sur la table parente : propagés à chaque partition, présente et future
+        for name, index_columns in spec['indexes']:
+            op.execute(f'CREATE INDEX {name} ON {table} ({", ".join(index_columns)})')
+        op.execute(f'ANALYZE {table}')
+
+
+def downgrade() -> None:
+    for table, spec in TABLES.items():
+        partitioned = f'{table}_partitioned'
+        op.execute(f'ALTER TABLE {table} RENAME TO {partitioned}')
+        op.execute(f'ALTER TABLE {partitioned} RENAME CONSTRAINT {table}_pkey TO {partitioned}_pkey')
+        for name, _ in spec['indexes']:
+            op.execute(f'DROP INDEX IF EXISTS {name}')
+        op.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY NONE')
+
+        op.execute(f'CREATE TABLE {table} ({spec["columns"]}, PRIMARY KEY (id))')
+        columns = ', '.join(spec['copy'] + ['created_at'])
+        op.execute(f'INSERT INTO {table} ({columns}) SELECT {columns} FROM {partitioned}')
+        op.execute(f'DROP TABLE {partitioned}')
+        op.execute(f'ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id')
+        for name, index_columns in spec['indexes']:
+            op.execute(f'CREATE INDEX {name} ON {table} ({", ".join(index_columns)})')
+
+    for table, column, referenced in DROPPED_FOREIGN_KEYS:
+        op.execute(
+            f'ALTER TABLE {table} ADD CONSTRAINT {table}_{column}_fkey '
+            f'FOREIGN KEY ({column}) REFERENCES {referenced}(id)'
+        )
@@ -0,0 +1,43 @@
+"""add_content_archives
+
+Revision ID: d9b4e2f7a813
+Revises: c5a1d7e3f920
+Create Date: 2026-10-18 19:31:04.671583
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd9b4e2f7a813'
+down_revision: Union[str, None] = 'c5a1d7e3f920'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Variantes archivées à froid, un blob compressé par requête
+    op.create_table(
+        'content_archives',
+        sa.Column('request_id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('request_created_at', sa.DateTime(), nullable=False),
+        sa.Column('payload', sa.LargeBinary(), nullable=False),
+        sa.Column('variants_count', sa.Integer(), nullable=False),
+        sa.Column('original_size', sa.Integer(), nullable=False),
+        sa.Column('compressed_size', sa.Integer(), nullable=False),
+        sa.Column('archived_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('request_id')
+    )
+    op.create_index(op.f('ix_content_archives_user_id'), 'content_archives', ['user_id'], unique=False)
+    # Le blob est déjà compressé : pas de seconde compression TOAST
+    op.execute("ALTER TABLE content_archives ALTER COLUMN payload SET STORAGE EXTERNAL")
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_content_archives_user_id'), table_name='content_archives')
+    op.drop_table('content_archives')
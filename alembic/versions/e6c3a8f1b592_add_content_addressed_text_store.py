@@ -0,0 +1,68 @@
+"""add_content_addressed_text_store
+
+Revision ID: e6c3a8f1b592
+Revises: d9b4e2f7a813
+Create Date: 2026-10-18 20:44:18.126930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6c3a8f1b592'
+down_revision: Union[str, None] = 'd9b4e2f7a813'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (table, colonne texte, colonne hash) - doit rester aligné avec app/models.py
+TEXT_COLUMNS = [
+    ('content_requests', 'original_text', 'original_text_hash'),
+    ('generated_contents', 'polished_text', 'polished_text_hash'),
+]
+
+# Même hash que app.text_store.text_hash (SHA-256 hexadécimal du texte UTF-8)
+HASH_SQL = "encode(sha256(convert_to({column}, 'UTF8')), 'hex')"
+
+
+def upgrade() -> None:
+    op.create_table(
+        'text_blobs',
+        sa.Column('hash', sa.String(length=64), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('byte_size', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.text('now()')),
+        sa.Column('last_used_at', sa.DateTime(), nullable=False, server_default=sa.text('now()')),
+        sa.PrimaryKeyConstraint('hash')
+    )
+
+    for table, text_column, hash_column in TEXT_COLUMNS:
+        # Backfill dédupliqué : un blob par texte distinct
+        op.execute(
+            f"INSERT INTO text_blobs (hash, content, byte_size) "
+            f"SELECT DISTINCT {HASH_SQL.format(column=text_column)}, {text_column}, octet_length({text_column}) "
+            f"FROM {table} "
+            f"ON CONFLICT (hash) DO NOTHING"
+        )
+        op.add_column(table, sa.Column(hash_column, sa.String(length=64), nullable=True))
+        op.execute(f"UPDATE {table} SET {hash_column} = {HASH_SQL.format(column=text_column)}")
+        op.alter_column(table, hash_column, nullable=False)
+        op.create_foreign_key(f'{table}_{hash_column}_fkey', table, 'text_blobs', [hash_column], ['hash'])
+        op.create_index(f'ix_{table}_{hash_column}', table, [hash_column], unique=False)
+        op.drop_column(table, text_column)
+        op.execute(f"ANALYZE {table}")
+    op.execute("ANALYZE text_blobs")
+
+
+def downgrade() -> None:
+    for table, text_column, hash_column in TEXT_COLUMNS:
+        op.add_column(table, sa.Column(text_column, sa.Text(), nullable=True))
+        op.execute(f"UPDATE {table} t SET {text_column} = b.content FROM text_blobs b WHERE b.hash = t.{hash_column}")
+        op.alter_column(table, text_column, nullable=False)
+        op.drop_index(f'ix_{table}_{hash_column}', table_name=table)
+        op.drop_constraint(f'{table}_{hash_column}_fkey', table, type_='foreignkey')
+        op.drop_column(table, hash_column)
+    op.drop_table('text_blobs')
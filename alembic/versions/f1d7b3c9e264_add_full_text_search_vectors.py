@@ -0,0 +1,43 @@
+"""add_full_text_search_vectors
+
+Revision ID: f1d7b3c9e264
+Revises: e6c3a8f1b592
+Create Date: 2026-10-18 22:06:51.417283
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1d7b3c9e264'
+down_revision: Union[str, None] = 'e6c3a8f1b592'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Configurations de recherche - doit rester aligné avec app/search.py (SEARCH_CONFIGURATIONS)
+SEARCH_CONFIGURATIONS = ['french', 'english', 'spanish']
+
+
+def upgrade() -> None:
+    # Colonnes générées : calculées à l'insertion du blob (réécriture de text_blobs pendant la migration)
+    for config in SEARCH_CONFIGURATIONS:
+        op.add_column('text_blobs', sa.Column(
+            f'search_{config}', postgresql.TSVECTOR(),
+            sa.Computed(f"to_tsvector('{config}'::regconfig, content)", persisted=True)
+        ))
+        op.create_index(
+            f'ix_text_blobs_search_{config}', 'text_blobs', [f'search_{config}'],
+            unique=False, postgresql_using='gin'
+        )
+    op.execute("ANALYZE text_blobs")
+
+
+def downgrade() -> None:
+    for config in SEARCH_CONFIGURATIONS:
+        op.drop_index(f'ix_text_blobs_search_{config}', table_name='text_blobs')
+        op.drop_column('text_blobs', f'search_{config}')
@@ -1,11 +1,9 @@
 import os
-from groq import Groq
 from dotenv import load_dotenv
+from app.http_client import get_groq_client
 
 load_dotenv()
 
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-
 # Prompts améliorés pour chaque format avec instructions détaillées
 FORMAT_PROMPTS = {
     "linkedin": """Crée un post LinkedIn professionnel et engageant optimisé pour l'algorithme.
@@ -143,6 +141,85 @@ FORMAT_MAX_TOKENS = {
     "persuasive": 800
 }
 
+VARIANT_INSTRUCTIONS = {
+    1: "\n\n🎯 VARIANTE 1: Version équilibrée et polyvalente.",
+    2: "\n\n🎯 VARIANTE 2: Version plus audacieuse et créative avec un angle différent.",
+    3: "\n\n🎯 VARIANTE 3: Version alternative avec une approche unique et originale."
+}
+
+def build_tone_modifier(tone: str = "professional", custom_style_analysis: str = None) -> str:
+    """
+    Construit l'instruction de ton (style personnalisé ou ton prédéfini)
+    """
+    # Si un style custom est fourni, l'utiliser à la place du tone_modifier prédéfini
+    if custom_style_analysis:
+        return f"""STYLE PERSONNALISÉ À IMITER:
+{custom_style_analysis}
+
+IMPORTANT: Reproduis fidèlement ce style d'écriture, y compris:
+- Le ton et la voix
+- Les expressions et tournures de phrases caractéristiques
+- La structure et l'organisation des idées
+- L'utilisation d'émojis, ponctuation, et mise en forme
+- Le niveau de formalité et les choix de vocabulaire"""
+
+    return TONE_MODIFIERS.get(tone, TONE_MODIFIERS["professional"])
+
+def generate_format_variant(original_text: str, format_key: str, variant_number: int, num_variants: int, tone_modifier: str, language: str = "fr") -> tuple:
+    """
+    Génère une seule variante d'un format
+
+    Returns:
+        (texte généré, tokens utilisés)
+    """
+    language_name = LANGUAGE_NAMES.get(language, "français")
+    format_prompt = FORMAT_PROMPTS[format_key]
+
+    # Système de prompt en deux parties pour meilleure qualité
+    variant_instruction = ""
+    if num_variants > 1:
+        variant_instruction = VARIANT_INSTRUCTIONS.get(variant_number, "")
+
+    system_message = f"""Tu es un expert de niveau mondial en création de contenu digital et copywriting.
+
+MISSION: {format_prompt}{variant_instruction}
+
+TON À ADOPTER: {tone_modifier}
+
+LANGUE: Écris exclusivement en {language_name}.
+
+RÈGLES CRITIQUES:
+✓ Suis EXACTEMENT la structure indiquée dans la mission
+✓ Réponds UNIQUEMENT avec le contenu final prêt à publier
+✓ N'ajoute AUCUNE explication, commentaire ou méta-texte
+✓ Ne mentionne jamais "[Prénom]", "[Nom]" ou autres placeholders - utilise des formulations génériques
+✓ Optimise pour l'engagement et la viralité
+✓ Sois authentique et humain dans le ton"""
+
+    # Max tokens adapté au format
+    max_tokens = FORMAT_MAX_TOKENS.get(format_key, 600)
+
+    # Température variable pour plus de diversité entre variantes
+    temperature = 0.8 + ((variant_number - 1) * 0.1)  # 0.8, 0.9, 1.0
+
+    response = get_groq_client().chat.completions.create(
+        model="llama-3.3-70b-versatile",
+        messages=[
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": f"Contenu à transformer:\n\n{original_text}"}
+        ],
+        temperature=temperature,
+        max_tokens=max_tokens,
+        top_p=0.95,
+        presence_penalty=0.1,
+        frequency_penalty=0.1
+    )
+
+    polished_text = response.choices[0].message.content.strip()
+
+    # Post-traitement: nettoie les artefacts potentiels
+    return clean_generated_content(polished_text), response.usage.total_tokens
+
 def polish_content_multi_format(original_text: str, tone: str = "professional", language: str = "fr", user_plan: str = "free", custom_style_analysis: str = None, selected_formats: list = None) -> dict:
     """
     Génère les formats selon le plan de l'utilisateur avec prompts optimisés
@@ -158,21 +235,7 @@ def polish_content_multi_format(original_text: str, tone: str = "professional",
     results = {}
     total_tokens = 0
 
-    language_name = LANGUAGE_NAMES.get(language, "français")
-
-    # Si un style custom est fourni, l'utiliser à la place du tone_modifier prédéfini
-    if custom_style_analysis:
-        tone_modifier = f"""STYLE PERSONNALISÉ À IMITER:
-{custom_style_analysis}
-
-IMPORTANT: Reproduis fidèlement ce style d'écriture, y compris:
-- Le ton et la voix
-- Les expressions et tournures de phrases caractéristiques
-- La structure et l'organisation des idées
-- L'utilisation d'émojis, ponctuation, et mise en forme
-- Le niveau de formalité et les choix de vocabulaire"""
-    else:
-        tone_modifier = TONE_MODIFIERS.get(tone, TONE_MODIFIERS["professional"])
+    tone_modifier = build_tone_modifier(tone, custom_style_analysis)
 
     # Récupère le nombre de variantes selon le plan
     plan_config = get_plan_config(user_plan)
@@ -181,74 +244,27 @@ IMPORTANT: Reproduis fidèlement ce style d'écriture, y compris:
     # Limiter les formats pour le plan free (3 formats seulement)
     if user_plan == "free":
         allowed_formats = ["linkedin", "instagram", "tiktok"]
-        formats_to_generate = {k: v for k, v in FORMAT_PROMPTS.items() if k in allowed_formats}
+        formats_to_generate = [k for k in FORMAT_PROMPTS if k in allowed_formats]
         delay_ms = 0  # Pas de délai pour free (seulement 3 formats)
     else:
         # Plans payants : tous les 6 formats
-        formats_to_generate = FORMAT_PROMPTS
+        formats_to_generate = list(FORMAT_PROMPTS)
         delay_ms = 100  # 100ms de délai entre chaque requête pour les plans payants
 
     # Si des formats spécifiques sont demandés, les filtrer
     if selected_formats and len(selected_formats) > 0:
-        formats_to_generate = {k: v for k, v in formats_to_generate.items() if k in selected_formats}
+        formats_to_generate = [k for k in formats_to_generate if k in selected_formats]
 
-    for format_key, format_prompt in formats_to_generate.items():
+    for format_key in formats_to_generate:
         # Générer plusieurs variantes pour Pro/Business
         format_variants = []
 
-        for variant_num in range(num_variants):
+        for variant_num in range(1, num_variants + 1):
             try:
-                # Système de prompt en deux parties pour meilleure qualité
-                variant_instruction = ""
-                if num_variants > 1:
-                    if variant_num == 0:
-                        variant_instruction = "\n\n🎯 VARIANTE 1: Version équilibrée et polyvalente."
-                    elif variant_num == 1:
-                        variant_instruction = "\n\n🎯 VARIANTE 2: Version plus audacieuse et créative avec un angle différent."
-                    elif variant_num == 2:
-                        variant_instruction = "\n\n🎯 VARIANTE 3: Version alternative avec une approche unique et originale."
-
-                system_message = f"""Tu es un expert de niveau mondial en création de contenu digital et copywriting.
-
-MISSION: {format_prompt}{variant_instruction}
-
-TON À ADOPTER: {tone_modifier}
-
-LANGUE: Écris exclusivement en {language_name}.
-
-RÈGLES CRITIQUES:
-✓ Suis EXACTEMENT la structure indiquée dans la mission
-✓ Réponds UNIQUEMENT avec le contenu final prêt à publier
-✓ N'ajoute AUCUNE explication, commentaire ou méta-texte
-✓ Ne mentionne jamais "[Prénom]", "[Nom]" ou autres placeholders - utilise des formulations génériques
-✓ Optimise pour l'engagement et la viralité
-✓ Sois authentique et humain dans le ton"""
-
-                # Max tokens adapté au format
-                max_tokens = FORMAT_MAX_TOKENS.get(format_key, 600)
-
-                # Température variable pour plus de diversité entre variantes
-                temperature = 0.8 + (variant_num * 0.1)  # 0.8, 0.9, 1.0
-
-                response = client.chat.completions.create(
-                    model="llama-3.3-70b-versatile",
-                    messages=[
-                        {"role": "system", "content": system_message},
-                        {"role": "user", "content": f"Contenu à transformer:\n\n{original_text}"}
-                    ],
-                    temperature=temperature,
-                    max_tokens=max_tokens,
-                    top_p=0.95,
-                    presence_penalty=0.1,
-                    frequency_penalty=0.1
+                polished_text, tokens = generate_format_variant(
+                    original_text, format_key, variant_num, num_variants, tone_modifier, language
                 )
-
-                polished_text = response.choices[0].message.content.strip()
-                total_tokens += response.usage.total_tokens
-
-                # Post-traitement: nettoie les artefacts potentiels
-                polished_text = clean_generated_content(polished_text)
-
+                total_tokens += tokens
                 format_variants.append(polished_text)
 
                 # Ajouter un délai entre les requêtes pour éviter les rate limits
@@ -256,14 +272,43 @@ RÈGLES CRITIQUES:
                     time.sleep(delay_ms / 1000.0)
 
             except Exception as e:
-                print(f"❌ Erreur pour {format_key} variante {variant_num + 1}: {e}")
-                format_variants.append(f"[Erreur lors de la génération de la variante {variant_num + 1}. Veuillez réessayer.]")
+                print(f"❌ Erreur pour {format_key} variante {variant_num}: {e}")
+                format_variants.append(f"[Erreur lors de la génération de la variante {variant_num}. Veuillez réessayer.]")
 
         # Stocker les variantes (soit une seule, soit plusieurs)
         results[format_key] = format_variants if num_variants > 1 else format_variants[0]
 
     return results, total_tokens
 
+def regenerate_format_variants(original_text: str, targets: list, tone: str = "professional", language: str = "fr", num_variants: int = 1, custom_style_analysis: str = None) -> tuple:
+    """
+    Régénère uniquement les couples (format, variante) demandés
+
+    Args:
+        targets: Liste de tuples (format_name, variant_number)
+        num_variants: Nombre de variantes de la requête d'origine (pour garder les mêmes consignes)
+
+    Returns:
+        ({(format_name, variant_number): texte}, tokens utilisés)
+        Les couples en erreur sont absents du dictionnaire.
+    """
+    results = {}
+    total_tokens = 0
+
+    tone_modifier = build_tone_modifier(tone, custom_style_analysis)
+
+    for format_key, variant_number in targets:
+        try:
+            polished_text, tokens = generate_format_variant(
+                original_text, format_key, variant_number, num_variants, tone_modifier, language
+            )
+            total_tokens += tokens
+            results[(format_key, variant_number)] = polished_text
+        except Exception as e:
+            print(f"❌ Erreur régénération {format_key} variante {variant_number}: {e}")
+
+    return results, total_tokens
+
 def clean_generated_content(text: str) -> str:
     """
     Nettoie le contenu généré des artefacts communs
@@ -329,7 +374,7 @@ FORMAT DE RÉPONSE (JSON strict):
 
 Réponds UNIQUEMENT avec le JSON, sans texte supplémentaire."""
 
-        response = client.chat.completions.create(
+        response = get_groq_client().chat.completions.create(
             model="llama-3.3-70b-versatile",
             messages=[
                 {"role": "system", "content": system_message},
@@ -393,7 +438,7 @@ RÈGLES:
 
 RETOURNE UNIQUEMENT la liste des hashtags, un par ligne, sans numéros ni explications."""
 
-        response = client.chat.completions.create(
+        response = get_groq_client().chat.completions.create(
             model="llama-3.3-70b-versatile",
             messages=[
                 {"role": "system", "content": system_message},
@@ -452,7 +497,7 @@ LANGUE: Écris exclusivement en {language_name}.
 RETOURNE uniquement les {count} idées, séparées par "---" (trois tirets).
 Ne numérote pas les idées et n'ajoute aucune explication."""
 
-        response = client.chat.completions.create(
+        response = get_groq_client().chat.completions.create(
             model="llama-3.3-70b-versatile",
             messages=[
                 {"role": "system", "content": system_message},
@@ -0,0 +1,36 @@
+"""
+Archivage à froid des variantes générées (voir app/content_archive.py)
+À exécuter une fois par jour via cron, après maintain_partitions.py
+
+Usage: python app/archive_old_content.py [jours]
+"""
+import os
+import sys
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import SessionLocal
+from app.content_archive import archive_old_content, ARCHIVE_AFTER_DAYS
+from app.query_stats import job_query_stats
+
+
+def run_archive(older_than_days: int = ARCHIVE_AFTER_DAYS):
+    db = SessionLocal()
+    try:
+        with job_query_stats("archive_old_content"):
+            archive_old_content(db, older_than_days)
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Erreur lors de l'archivage: {e}")
+        import traceback
+        traceback.print_exc()
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    print("="*60)
+    print("🧊 Archivage des anciennes variantes générées")
+    print("="*60)
+    run_archive(int(sys.argv[1]) if len(sys.argv) > 1 else ARCHIVE_AFTER_DAYS)
@@ -5,10 +5,14 @@ from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import os
 from dotenv import load_dotenv
-from app.database import get_db
+from app.database import (
+    get_db, get_async_db, AsyncSessionLocal, AsyncReplicaSessionLocal, check_replica_async, replica_usable
+)
 from app import crud
+from app.query_stats import set_request_plan
 
 load_dotenv()
 
@@ -32,21 +36,44 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+def _credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def decode_user_id(token: str) -> int:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: int = payload.get("sub")
         if user_id is None:
-            raise credentials_exception
+            raise _credentials_exception()
     except JWTError:
-        raise credentials_exception
-    
-    user = crud.get_user(db, user_id=int(user_id))
+        raise _credentials_exception()
+    return int(user_id)
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    user = crud.get_user(db, user_id=decode_user_id(token))
     if user is None:
-        raise credentials_exception
-    return user
\ No newline at end of file
+        raise _credentials_exception()
+    set_request_plan(user.current_plan)
+    return user
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    """Variante pour les routes async : l'utilisateur est attaché à la AsyncSession de la requête"""
+    user = await crud.get_user_async(db, user_id=decode_user_id(token))
+    if user is None:
+        raise _credentials_exception()
+    set_request_plan(user.current_plan)
+    return user
+
+async def get_async_read_db(current_user=Depends(get_current_user_async)):
+    """
+    AsyncSession pour les endpoints en lecture seule : réplique si elle est saine et
+    si l'utilisateur n'a pas écrit récemment (read-your-writes), sinon primaire
+    """
+    await check_replica_async()
+    session_factory = AsyncReplicaSessionLocal if replica_usable(current_user.last_write_at) else AsyncSessionLocal
+    async with session_factory() as db:
+        yield db
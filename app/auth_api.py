@@ -1,19 +1,21 @@
 from fastapi import Depends, HTTPException, status, Header
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 from datetime import datetime
 
-from app.database import get_db
+from app.database import get_async_db
 from app.models import User, APIKey
 from app.utils.api_keys import hash_api_key, validate_api_key_format, get_key_prefix
+from app.query_stats import set_request_plan
 
 security = HTTPBearer()
 
 
 async def get_current_user_from_api_key(
     authorization: Optional[str] = Header(None),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> User:
     """
     Authentifie un utilisateur via sa clé API
@@ -57,9 +59,9 @@ async def get_current_user_from_api_key(
     key_hash = hash_api_key(api_key)
 
     # Rechercher la clé dans la BDD par prefix (index)
-    db_api_key = db.query(APIKey).filter(
-        APIKey.key_prefix == key_prefix
-    ).first()
+    db_api_key = (await db.execute(
+        select(APIKey).where(APIKey.key_prefix == key_prefix)
+    )).scalars().first()
 
     if not db_api_key:
         raise HTTPException(
@@ -82,13 +84,14 @@ async def get_current_user_from_api_key(
         )
 
     # Charger l'utilisateur
-    user = db.query(User).filter(User.id == db_api_key.user_id).first()
+    user = await db.get(User, db_api_key.user_id)
 
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found"
         )
+    set_request_plan(user.current_plan)
 
     # Vérifier que l'utilisateur est Business
     if user.current_plan != "business":
@@ -99,7 +102,7 @@ async def get_current_user_from_api_key(
 
     # Mettre à jour last_used_at (asynchrone, ne pas bloquer)
     db_api_key.last_used_at = datetime.utcnow()
-    db.commit()
+    await db.commit()
 
     return user
 
@@ -3,6 +3,7 @@ from fastapi import HTTPException
 from google.oauth2 import id_token
 from google.auth.transport import requests
 from dotenv import load_dotenv
+from app.http_client import get_requests_session
 
 load_dotenv()
 
@@ -22,7 +23,7 @@ async def verify_google_token(token: str):
         # Vérifie le JWT directement avec la bibliothèque Google
         idinfo = id_token.verify_oauth2_token(
             token,
-            requests.Request(),
+            requests.Request(session=get_requests_session()),
             GOOGLE_CLIENT_ID
         )
 
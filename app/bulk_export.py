@@ -0,0 +1,238 @@
+"""
+Export en masse de l'historique (NDJSON, CSV ou ZIP)
+
+Les requêtes sont lues par un curseur serveur (yield_per) dans l'ordre
+(created_at, id) croissant et leurs variantes par lot
+(get_variants_for_requests) : la mémoire reste bornée quel que soit le volume.
+Chaque enregistrement porte son curseur : un export interrompu reprend avec
+cursor=<dernier curseur reçu>.
+
+Au-delà de BULK_EXPORT_SYNC_MAX_REQUESTS requêtes, l'export devient une tâche
+de fond (ExportJob) écrite dans BULK_EXPORT_DIR puis téléchargée par lien.
+BULK_EXPORT_DIR doit être partagé entre les instances de l'API.
+"""
+import csv
+import io
+import json
+import os
+import secrets
+from datetime import datetime, timedelta
+from typing import Iterator, Optional
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session, selectinload, joinedload
+from dotenv import load_dotenv
+from app import models
+from app.content_archive import get_variants_for_requests
+from app.pagination import apply_keyset, encode_cursor
+from app.query_stats import job_query_stats
+from app.zip_stream import stream_zip
+
+load_dotenv()
+
+# Format -> type MIME
+BULK_EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "zip": "application/zip",
+}
+# Nombre de requêtes au-delà duquel l'export passe en tâche de fond
+BULK_EXPORT_SYNC_MAX_REQUESTS = int(os.getenv("BULK_EXPORT_SYNC_MAX_REQUESTS", "1000"))
+# Requêtes lues par lot sur le curseur serveur
+BULK_EXPORT_BATCH_SIZE = int(os.getenv("BULK_EXPORT_BATCH_SIZE", "500"))
+# Répertoire des exports en tâche de fond et durée de conservation des fichiers
+BULK_EXPORT_DIR = os.getenv("BULK_EXPORT_DIR", "/tmp/content_exports")
+BULK_EXPORT_TTL_HOURS = int(os.getenv("BULK_EXPORT_TTL_HOURS", "24"))
+
+CSV_COLUMNS = [
+    "cursor", "request_id", "created_at", "platform", "tone", "language", "author_email",
+    "original_text", "variant_id", "format_name", "variant_number", "variant_text"
+]
+
+
+def export_query(query, date_from: Optional[datetime] = None, date_to: Optional[datetime] = None,
+                 cursor: Optional[str] = None):
+    """query : select(ContentRequest) du périmètre (visible_content_query), restreint à [date_from, date_to["""
+    if date_from:
+        query = query.where(models.ContentRequest.created_at >= date_from)
+    if date_to:
+        query = query.where(models.ContentRequest.created_at < date_to)
+    return apply_keyset(query, models.ContentRequest.created_at, models.ContentRequest.id, cursor, descending=False)
+
+
+def count_requests(db: Session, query) -> int:
+    return db.execute(select(func.count()).select_from(query.order_by(None).subquery())).scalar()
+
+
+def _iter_records(db: Session, query) -> Iterator[list]:
+    """Lots d'enregistrements (dict), un lot par paquet lu sur le curseur serveur"""
+    result = db.execute(
+        query.options(selectinload(models.ContentRequest.user), joinedload(models.ContentRequest.original_blob))
+        .execution_options(yield_per=BULK_EXPORT_BATCH_SIZE)
+    )
+    for requests in result.scalars().partitions():
+        variants_by_request = get_variants_for_requests(db, requests)
+        yield [
+            {
+                "cursor": encode_cursor(request.created_at, request.id),
+                "id": request.id,
+                "created_at": request.created_at.isoformat(),
+                "platform": request.platform,
+                "tone": request.tone,
+                "language": request.language,
+                "author": {
+                    "id": request.user.id,
+                    "name": request.user.name,
+                    "email": request.user.email
+                } if request.user else None,
+                "original_text": request.original_text,
+                "variants": [
+                    {
+                        "id": variant.id,
+                        "format_name": variant.format_name,
+                        "variant_number": variant.variant_number,
+                        "created_at": variant.created_at.isoformat(),
+                        "text": variant.polished_text
+                    }
+                    for variant in variants_by_request[request.id]
+                ]
+            }
+            for request in requests
+        ]
+
+
+def _ndjson_chunks(db: Session, query) -> Iterator[bytes]:
+    for records in _iter_records(db, query):
+        yield "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records).encode("utf-8")
+
+
+def _csv_chunks(db: Session, query) -> Iterator[bytes]:
+    # Une ligne par variante (une ligne sans variante pour une requête qui n'en a pas)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    for records in _iter_records(db, query):
+        for record in records:
+            author_email = record["author"]["email"] if record["author"] else None
+            for variant in record["variants"] or [None]:
+                writer.writerow([
+                    record["cursor"], record["id"], record["created_at"], record["platform"],
+                    record["tone"], record["language"], author_email, record["original_text"],
+                    variant["id"] if variant else None,
+                    variant["format_name"] if variant else None,
+                    variant["variant_number"] if variant else None,
+                    variant["text"] if variant else None
+                ])
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _safe_name(value: str) -> str:
+    return "".join(char if char.isalnum() or char in "-_" else "_" for char in value)
+
+
+def _zip_entries(db: Session, query):
+    # Un dossier par requête : texte original, une entrée par variante, métadonnées (avec le curseur)
+    for records in _iter_records(db, query):
+        for record in records:
+            folder = f"{record['created_at'][:10].replace('-', '')}_{record['id']}"
+            yield f"{folder}/original.txt", record["original_text"]
+            formats_count = {}
+            for variant in record["variants"]:
+                format_key = _safe_name(variant["format_name"] or f"format_{variant['variant_number']}")
+                formats_count[format_key] = formats_count.get(format_key, 0) + 1
+                variant_suffix = f"_variant_{formats_count[format_key]}" if formats_count[format_key] > 1 else ""
+                yield f"{folder}/{format_key}{variant_suffix}.txt", variant["text"]
+            metadata = {key: value for key, value in record.items() if key not in ("original_text", "variants")}
+            yield f"{folder}/request.json", json.dumps(metadata, ensure_ascii=False, indent=2)
+
+
+def export_chunks(db: Session, query, export_format: str) -> Iterator[bytes]:
+    """Contenu de l'export, morceau par morceau (query : résultat de export_query)"""
+    if export_format == "ndjson":
+        return _ndjson_chunks(db, query)
+    if export_format == "csv":
+        return _csv_chunks(db, query)
+    return stream_zip(_zip_entries(db, query))
+
+
+def run_export_job(job_id: int):
+    """Tâche de fond : écrit l'export dans BULK_EXPORT_DIR avec sa propre session"""
+    # Compteurs propres au job (sinon rattachés à la requête HTTP déjà terminée qui l'a lancé)
+    with job_query_stats("bulk_export"):
+        _run_export_job(job_id)
+
+
+def _run_export_job(job_id: int):
+    from app.database import SessionLocal
+    from app.utils.team_utils import get_user_team, visible_content_query
+
+    db = SessionLocal()
+    path = None
+    try:
+        job = db.get(models.ExportJob, job_id)
+        job.status = "running"
+        db.commit()
+
+        user = db.get(models.User, job.user_id)
+        team = get_user_team(user, db)
+        query = export_query(
+            visible_content_query(user, team, job.include_team), job.date_from, job.date_to, job.cursor
+        )
+
+        os.makedirs(BULK_EXPORT_DIR, exist_ok=True)
+        # Nom non devinable : le fichier n'est servi qu'après vérification du propriétaire, mais le répertoire est partagé
+        path = os.path.join(BULK_EXPORT_DIR, f"export_{job.id}_{secrets.token_hex(8)}.{job.format}")
+        size = 0
+        with open(f"{path}.part", "wb") as export_file:
+            for chunk in export_chunks(db, query, job.format):
+                export_file.write(chunk)
+                size += len(chunk)
+        os.replace(f"{path}.part", path)
+
+        job.status = "ready"
+        job.file_path = path
+        job.file_size = size
+        job.completed_at = datetime.utcnow()
+        job.expires_at = job.completed_at + timedelta(hours=BULK_EXPORT_TTL_HOURS)
+        db.commit()
+        print(f"📦 Export {job.id} prêt: {job.requests_count} requête(s), {size} octets")
+    except Exception as e:
+        print(f"❌ Erreur export {job_id}: {e}")
+        if path and os.path.exists(f"{path}.part"):
+            os.remove(f"{path}.part")
+        db.rollback()
+        job = db.get(models.ExportJob, job_id)
+        if job:
+            job.status = "failed"
+            job.error_message = str(e)[:500]
+            db.commit()
+    finally:
+        db.close()
+
+
+def purge_expired_exports(db: Session, now: Optional[datetime] = None) -> int:
+    """Supprime les fichiers d'export expirés (maintenance quotidienne)"""
+    now = now or datetime.utcnow()
+    jobs = db.execute(select(models.ExportJob).where(
+        models.ExportJob.status == "ready",
+        models.ExportJob.expires_at < now
+    )).scalars().all()
+    for job in jobs:
+        if job.file_path and os.path.exists(job.file_path):
+            os.remove(job.file_path)
+        job.status = "expired"
+        job.file_path = None
+    db.commit()
+    print(f"🧹 Exports expirés supprimés: {len(jobs)}")
+    return len(jobs)
+
+
+def delete_user_exports(db: Session, user_id: int):
+    """Supprime les exports (fichiers et lignes) d'un utilisateur ; ne commit pas"""
+    for job in db.execute(select(models.ExportJob).where(models.ExportJob.user_id == user_id)).scalars():
+        if job.file_path and os.path.exists(job.file_path):
+            os.remove(job.file_path)
+    db.query(models.ExportJob).filter(models.ExportJob.user_id == user_id).delete()
@@ -0,0 +1,180 @@
+"""
+Compression des réponses HTTP négociée (Accept-Encoding : br, gzip)
+
+Middleware ASGI : compresse au fil de l'eau, réponses en flux comprises
+(exports), les réponses d'au moins RESPONSE_COMPRESSION_MIN_SIZE octets.
+Brotli est préféré quand le client l'accepte et que le module est installé,
+sinon gzip. Les contenus déjà compressés (ZIP, images...) sont laissés tels quels.
+"""
+import os
+import zlib
+from typing import Optional
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from dotenv import load_dotenv
+
+try:
+    import brotli
+except ImportError:  # Brotli absent : gzip seulement
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+load_dotenv()
+
+# Taille minimale (octets) d'une réponse compressée : en dessous, l'en-tête gzip/br coûte plus qu'il ne rapporte
+RESPONSE_COMPRESSION_MIN_SIZE = int(os.getenv("RESPONSE_COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+# Qualité 4-5 : bon compromis CPU / taille pour de la compression à la volée
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+# Au-delà de cette taille, la compression d'un morceau est faite hors de l'event loop (plusieurs dizaines de ms par Mo)
+COMPRESSION_THREADPOOL_MIN_SIZE = 256 * 1024
+
+# Types de contenu non recompressés
+_UNCOMPRESSIBLE_TYPES = (
+    "application/zip", "application/gzip", "application/x-gzip", "image/", "video/", "audio/", "text/event-stream"
+)
+
+
+def _accepted_encodings(accept_encoding: str) -> dict:
+    accepted = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    return accepted
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Meilleur encodage accepté par le client ("br", "gzip") ou None"""
+    accepted = _accepted_encodings(accept_encoding)
+    for coding in ("br", "gzip"):
+        if coding == "br" and brotli is None:
+            continue
+        if accepted.get(coding, accepted.get("*", 0.0)) > 0:
+            return coding
+    return None
+
+
+class _GzipCompressor:
+    def __init__(self):
+        # wbits 31 : flux deflate avec en-tête et pied gzip
+        self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _BrotliCompressor:
+    def __init__(self):
+        self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        self._process = getattr(self._compressor, "process", None) or self._compressor.compress
+
+    def compress(self, data: bytes) -> bytes:
+        return self._process(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+_COMPRESSORS = {"gzip": _GzipCompressor, "br": _BrotliCompressor}
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = RESPONSE_COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressedResponder(self.app, encoding, self.minimum_size)(scope, receive, send)
+
+
+class _CompressedResponder:
+    def __init__(self, app, encoding: str, minimum_size: int):
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.send = None
+        self.start_message = None
+        self.compressor = None
+        self.started = False
+
+    async def _compress(self, body: bytes, finish: bool) -> bytes:
+        def compress():
+            data = self.compressor.compress(body)
+            return data + self.compressor.finish() if finish else data
+
+        if len(body) >= COMPRESSION_THREADPOOL_MIN_SIZE:
+            return await run_in_threadpool(compress)
+        return compress()
+
+    async def __call__(self, scope, receive, send):
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message):
+        if message["type"] == "http.response.start":
+            # En-têtes retenus jusqu'au premier morceau du corps (taille et type connus)
+            self.start_message = message
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if not self.started:
+            self.started = True
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            content_type = headers.get("content-type", "")
+            if "content-encoding" in headers or content_type.startswith(_UNCOMPRESSIBLE_TYPES):
+                await self.send(self.start_message)
+                await self.send(message)
+                return
+            headers.add_vary_header("Accept-Encoding")
+            if not more_body and len(body) < self.minimum_size:
+                await self.send(self.start_message)
+                await self.send(message)
+                return
+
+            self.compressor = _COMPRESSORS[self.encoding]()
+            headers["Content-Encoding"] = self.encoding
+            if more_body:
+                # Réponse en flux : taille finale inconnue (envoi chunked)
+                if "content-length" in headers:
+                    del headers["Content-Length"]
+                await self.send(self.start_message)
+                await self.send({"type": "http.response.body", "body": await self._compress(body, False), "more_body": True})
+            else:
+                compressed = await self._compress(body, True)
+                headers["Content-Length"] = str(len(compressed))
+                await self.send(self.start_message)
+                await self.send({"type": "http.response.body", "body": compressed})
+            return
+
+        if self.compressor is None:
+            await self.send(message)
+            return
+        data = await self._compress(body, not more_body)
+        await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
@@ -0,0 +1,328 @@
+"""
+Analyseur de contenu local (sans appel LLM) pour /ai/analyze
+
+Calcule en quelques microsecondes, pour le français, l'anglais et l'espagnol :
+lisibilité, longueur par rapport à la plateforme, force du hook, présence de
+question et de CTA, densité d'émojis et de hashtags, sentiment par lexique.
+"""
+import re
+import unicodedata
+from typing import List, Optional
+
+# Mots outils pour détecter la langue
+STOPWORDS = {
+    "fr": {"le", "la", "les", "de", "des", "du", "un", "une", "et", "est", "que", "qui", "pour", "dans", "pas", "vous", "nous", "sur", "avec", "ce", "cette", "mais", "au", "aux", "je", "tu", "il", "elle", "sont", "votre", "mon", "ma", "mes"},
+    "en": {"the", "a", "an", "and", "is", "are", "of", "to", "in", "for", "that", "this", "with", "you", "your", "we", "our", "it", "on", "not", "but", "be", "have", "was", "i", "my", "they", "what", "how"},
+    "es": {"el", "la", "los", "las", "de", "del", "un", "una", "y", "es", "que", "en", "para", "por", "con", "no", "su", "sus", "tu", "tus", "se", "lo", "al", "pero", "como", "yo", "mi", "nosotros", "son", "esta", "este"}
+}
+
+# Lexiques de sentiment (formes sans accents, en minuscules)
+POSITIVE_WORDS = {
+    "fr": {"bien", "super", "genial", "excellent", "incroyable", "reussite", "reussir", "succes", "heureux", "heureuse", "fier", "fiere", "merci", "bravo", "top", "parfait", "efficace", "facile", "gagner", "croissance", "opportunite", "inspirant", "passion", "adore", "aime", "meilleur", "meilleure", "positif", "positive", "progres", "victoire", "ravi", "ravie", "magnifique", "motivation", "confiance", "joie", "fantastique", "brillant", "solution"},
+    "en": {"good", "great", "awesome", "excellent", "amazing", "success", "successful", "happy", "proud", "thanks", "thank", "love", "best", "better", "perfect", "easy", "win", "growth", "opportunity", "inspiring", "passion", "positive", "progress", "victory", "excited", "wonderful", "fantastic", "brilliant", "confident", "joy", "effective", "powerful", "solution", "grateful", "thrilled"},
+    "es": {"bien", "bueno", "buena", "genial", "excelente", "increible", "exito", "feliz", "orgulloso", "orgullosa", "gracias", "perfecto", "facil", "ganar", "crecimiento", "oportunidad", "inspirador", "pasion", "encanta", "mejor", "positivo", "positiva", "progreso", "victoria", "emocionado", "maravilloso", "fantastico", "brillante", "confianza", "alegria", "eficaz", "solucion", "agradecido"}
+}
+
+NEGATIVE_WORDS = {
+    "fr": {"mal", "mauvais", "mauvaise", "echec", "echouer", "probleme", "difficile", "triste", "peur", "colere", "nul", "nulle", "pire", "erreur", "perdre", "perte", "crise", "stress", "fatigue", "deception", "decu", "decue", "inquiet", "danger", "risque", "impossible", "horrible", "terrible", "douleur", "galere", "frustration", "frustrant", "negatif", "negative"},
+    "en": {"bad", "fail", "failure", "failed", "problem", "difficult", "hard", "sad", "fear", "angry", "worst", "worse", "mistake", "error", "lose", "loss", "crisis", "stress", "tired", "disappointed", "worried", "danger", "risk", "impossible", "horrible", "terrible", "pain", "struggle", "frustrating", "frustration", "negative", "hate", "awful"},
+    "es": {"mal", "malo", "mala", "fracaso", "fallar", "problema", "dificil", "triste", "miedo", "enojo", "peor", "error", "perder", "perdida", "crisis", "estres", "cansado", "decepcion", "decepcionado", "preocupado", "peligro", "riesgo", "imposible", "horrible", "terrible", "dolor", "frustracion", "frustrante", "negativo", "negativa", "odio"}
+}
+
+NEGATIONS = {
+    "fr": {"pas", "jamais", "plus", "aucun", "aucune", "ni", "sans"},
+    "en": {"not", "no", "never", "without", "nor"},
+    "es": {"no", "nunca", "jamas", "sin", "ni", "tampoco"}
+}
+
+# Appels à l'action
+CTA_PATTERNS = {
+    "fr": r"\b(commente[zs]?|partage[zs]?|abonne[zs]?[- ]vous|suivez|clique[zs]?|decouvre[zs]?|inscri(?:s|vez)[- ]vous|telecharge[zs]?|reserve[zs]?|contacte[zs]?|dis[- ]moi|dites[- ]moi|ecri(?:s|vez)[- ]moi|lien en bio|en savoir plus|rejoin(?:s|dre|gnez)|essaye[zs]?|like[zs]?)\b",
+    # Anglais : verbes aussi noms ou verbes courants ("market share", "I like") comptés seulement
+    # en tête de phrase ou de ligne (impératif) ; expressions sans ambiguïté comptées partout
+    "en": (
+        r"(?:^|[.!?:\n])\s*(?:[^\w\s]+\s*)?(?:please\s+)?(?:comment|share|follow|join|book|contact|try|like|save)\b"
+        r"|\b(?:subscribe|click|tap|sign up|download|dm me|let me know|tell me|link in bio|learn more|check out|save this|repost"
+        r"|comment below|drop a comment|share this|share your|follow me|follow us|book a call|get in touch)\b"
+    ),
+    "es": r"\b(comenta|comparte|sigue(?:me)?|suscribete|haz clic|descarga|reserva|contacta(?:me)?|dime|dejame saber|link en bio|enlace en bio|mas informacion|unete|prueba|dale like|guarda)\b"
+}
+
+# Mots qui renforcent un hook
+HOOK_WORDS = {
+    "fr": {"pourquoi", "comment", "secret", "secrets", "erreur", "erreurs", "personne", "jamais", "voici", "arretez", "stop", "verite", "astuce", "astuces", "choc", "vraiment", "seul", "seule", "enfin", "nouveau", "nouvelle", "gratuit"},
+    "en": {"why", "how", "secret", "secrets", "mistake", "mistakes", "nobody", "never", "here", "stop", "truth", "tip", "tips", "shocking", "really", "only", "finally", "new", "free", "unpopular", "lesson", "lessons"},
+    "es": {"por que", "como", "secreto", "secretos", "error", "errores", "nadie", "nunca", "aqui", "deja", "verdad", "truco", "trucos", "impactante", "realmente", "solo", "finalmente", "nuevo", "nueva", "gratis", "leccion"}
+}
+
+# Longueur idéale (caractères) et nombre de hashtags idéal par plateforme
+PLATFORM_TARGETS = {
+    "linkedin": {"length": (600, 1500), "hashtags": (3, 5), "emojis_per_100_words": (0.5, 4)},
+    "instagram": {"length": (150, 1200), "hashtags": (8, 15), "emojis_per_100_words": (2, 10)},
+    "tiktok": {"length": (80, 400), "hashtags": (3, 6), "emojis_per_100_words": (2, 12)},
+    "twitter": {"length": (70, 280), "hashtags": (1, 3), "emojis_per_100_words": (0, 8)},
+    "facebook": {"length": (40, 400), "hashtags": (0, 3), "emojis_per_100_words": (0.5, 6)},
+    "youtube": {"length": (200, 1000), "hashtags": (2, 5), "emojis_per_100_words": (0, 5)},
+    "email": {"length": (500, 1400), "hashtags": (0, 0), "emojis_per_100_words": (0, 2)},
+    "persuasive": {"length": (1200, 2400), "hashtags": (0, 3), "emojis_per_100_words": (0.5, 6)}
+}
+DEFAULT_TARGETS = {"length": (100, 1500), "hashtags": (1, 8), "emojis_per_100_words": (0.5, 8)}
+
+SUGGESTIONS = {
+    "fr": {
+        "hook": "Renforcez la première ligne : une question, un chiffre ou une promesse forte pour arrêter le scroll",
+        "cta": "Ajoutez un appel à l'action clair (commenter, partager, s'abonner...)",
+        "question": "Posez une question à votre audience pour stimuler les commentaires",
+        "too_short": "Développez le contenu : il est court pour cette plateforme",
+        "too_long": "Raccourcissez le texte : il dépasse la longueur idéale pour cette plateforme",
+        "readability": "Simplifiez les phrases : visez des phrases plus courtes et des mots plus simples",
+        "few_hashtags": "Ajoutez quelques hashtags pertinents pour gagner en portée",
+        "many_hashtags": "Réduisez le nombre de hashtags pour garder un texte lisible",
+        "few_emojis": "Ajoutez quelques émojis pour aérer le texte et attirer l'œil",
+        "many_emojis": "Réduisez les émojis : trop d'émojis nuisent à la crédibilité",
+        "negative": "Apportez une note positive ou une solution pour équilibrer le message",
+        "structure": "Aérez le texte avec des sauts de ligne ou une liste"
+    },
+    "en": {
+        "hook": "Strengthen the first line: a question, a number or a bold promise to stop the scroll",
+        "cta": "Add a clear call-to-action (comment, share, follow...)",
+        "question": "Ask your audience a question to drive comments",
+        "too_short": "Expand the content: it is short for this platform",
+        "too_long": "Shorten the text: it exceeds the ideal length for this platform",
+        "readability": "Simplify the sentences: aim for shorter sentences and simpler words",
+        "few_hashtags": "Add a few relevant hashtags to increase reach",
+        "many_hashtags": "Use fewer hashtags to keep the text readable",
+        "few_emojis": "Add a few emojis to break up the text and catch the eye",
+        "many_emojis": "Use fewer emojis: too many hurt credibility",
+        "negative": "Add a positive angle or a solution to balance the message",
+        "structure": "Break up the text with line breaks or a list"
+    },
+    "es": {
+        "hook": "Refuerza la primera línea: una pregunta, una cifra o una promesa fuerte para detener el scroll",
+        "cta": "Añade una llamada a la acción clara (comentar, compartir, seguir...)",
+        "question": "Haz una pregunta a tu audiencia para generar comentarios",
+        "too_short": "Desarrolla el contenido: es corto para esta plataforma",
+        "too_long": "Acorta el texto: supera la longitud ideal para esta plataforma",
+        "readability": "Simplifica las frases: apunta a frases más cortas y palabras más simples",
+        "few_hashtags": "Añade algunos hashtags relevantes para ganar alcance",
+        "many_hashtags": "Reduce el número de hashtags para mantener el texto legible",
+        "few_emojis": "Añade algunos emojis para airear el texto y captar la atención",
+        "many_emojis": "Reduce los emojis: demasiados restan credibilidad",
+        "negative": "Aporta un enfoque positivo o una solución para equilibrar el mensaje",
+        "structure": "Airea el texto con saltos de línea o una lista"
+    }
+}
+
+EMOJI_RE = re.compile(
+    "[\U0001F300-\U0001FAFF\U00002600-\U000027BF\U0001F000-\U0001F02F\U0001F0A0-\U0001F0FF"
+    "\U0001F100-\U0001F1FF\U00002B00-\U00002BFF\U00002300-\U000023FF]"
+)
+HASHTAG_RE = re.compile(r"#\w+", re.UNICODE)
+WORD_RE = re.compile(r"[^\W\d_]+", re.UNICODE)
+CONTRACTION_RE = re.compile(r"n['’]t\b")
+SENTENCE_SPLIT_RE = re.compile(r"[.!?…]+|\n+")
+VOWEL_GROUP_RE = re.compile(r"[aeiouyàâäéèêëîïôöùûüáíóú]+")
+NUMBER_RE = re.compile(r"\d")
+COMPILED_CTA = {lang: re.compile(pattern, re.IGNORECASE) for lang, pattern in CTA_PATTERNS.items()}
+
+
+def strip_accents(text: str) -> str:
+    """Retire les accents (é -> e) pour la correspondance avec les lexiques"""
+    return "".join(c for c in unicodedata.normalize("NFD", text) if unicodedata.category(c) != "Mn")
+
+
+def detect_language(words: List[str]) -> str:
+    """Détecte fr/en/es en comptant les mots outils (défaut: fr)"""
+    scores = {lang: sum(1 for w in words if w in stopwords) for lang, stopwords in STOPWORDS.items()}
+    best = max(scores, key=scores.get)
+    return best if scores[best] > 0 else "fr"
+
+
+def _count_syllables(word: str) -> int:
+    return max(1, len(VOWEL_GROUP_RE.findall(word)))
+
+
+def readability_score(words: List[str], sentence_count: int, language: str) -> float:
+    """
+    Score de lisibilité 0-100 (plus haut = plus facile)
+    Flesch (en), Kandel-Moles (fr), Fernández Huerta (es)
+    """
+    if not words:
+        return 0.0
+
+    asl = len(words) / max(sentence_count, 1)  # Mots par phrase
+    asw = sum(_count_syllables(w) for w in words) / len(words)  # Syllabes par mot
+
+    if language == "en":
+        score = 206.835 - 1.015 * asl - 84.6 * asw
+    elif language == "es":
+        score = 206.84 - 60 * asw - 102 / asl
+    else:
+        score = 207 - 1.015 * asl - 73.6 * asw
+
+    return round(min(100.0, max(0.0, score)), 1)
+
+
+def lexicon_sentiment(words: List[str], language: str) -> tuple:
+    """Sentiment par lexique avec gestion simple de la négation"""
+    positives = POSITIVE_WORDS[language]
+    negatives = NEGATIVE_WORDS[language]
+    negations = NEGATIONS[language]
+
+    score = 0
+    for i, word in enumerate(words):
+        polarity = 1 if word in positives else -1 if word in negatives else 0
+        if polarity == 0:
+            continue
+        # Une négation dans les 3 mots précédents inverse la polarité
+        if any(w in negations for w in words[max(0, i - 3):i]):
+            polarity = -polarity
+        score += polarity
+
+    normalized = score / max(len(words) ** 0.5, 1)
+    if normalized > 0.15:
+        label = "positive"
+    elif normalized < -0.15:
+        label = "negative"
+    else:
+        label = "neutral"
+
+    return label, round(normalized, 3)
+
+
+def hook_strength(first_line: str, language: str) -> float:
+    """Force du hook (0-1) à partir de la première ligne"""
+    if not first_line:
+        return 0.0
+
+    folded = strip_accents(first_line.lower())
+    words = WORD_RE.findall(folded)
+    strength = 0.0
+
+    if words and len(words) <= 12:
+        strength += 0.3  # Court et percutant
+    elif words and len(words) <= 20:
+        strength += 0.15
+    if "?" in first_line:
+        strength += 0.2
+    if "!" in first_line:
+        strength += 0.1
+    if NUMBER_RE.search(first_line):
+        strength += 0.15
+    if EMOJI_RE.search(first_line[:3]):
+        strength += 0.1
+    if any(w in HOOK_WORDS[language] for w in words) or any(" " in h and h in folded for h in HOOK_WORDS[language]):
+        strength += 0.25
+
+    return round(min(strength, 1.0), 2)
+
+
+def _range_score(value: float, low: float, high: float) -> float:
+    """1 dans l'intervalle [low, high], décroît linéairement en dehors"""
+    if low <= value <= high:
+        return 1.0
+    if value < low:
+        return max(0.0, value / low) if low > 0 else 1.0
+    return max(0.0, 1 - (value - high) / max(high, 1))
+
+
+def analyze_content(content: str, platform: Optional[str] = None, language: Optional[str] = None) -> dict:
+    """
+    Analyse heuristique d'un texte
+
+    Returns:
+        dict avec sentiment, engagement_score (0-100), suggestions (3 max) et metrics
+    """
+    text = content or ""
+    folded = strip_accents(text.lower())
+    words = WORD_RE.findall(CONTRACTION_RE.sub(" not", folded))
+
+    if language not in STOPWORDS:
+        language = detect_language(words)
+
+    targets = PLATFORM_TARGETS.get((platform or "").lower(), DEFAULT_TARGETS)
+
+    sentences = [s for s in SENTENCE_SPLIT_RE.split(text) if s.strip()]
+    lines = [line.strip() for line in text.split("\n") if line.strip()]
+    first_line = lines[0] if lines else ""
+
+    emoji_count = len(EMOJI_RE.findall(text))
+    hashtag_count = len(HASHTAG_RE.findall(text))
+    word_count = len(words)
+    emojis_per_100_words = emoji_count * 100 / word_count if word_count else 0.0
+
+    readability = readability_score(words, len(sentences), language)
+    sentiment, sentiment_score = lexicon_sentiment(words, language)
+    hook = hook_strength(first_line, language)
+    has_question = "?" in text or "¿" in text
+    has_cta = bool(COMPILED_CTA[language].search(folded))
+
+    length_score = _range_score(len(text), *targets["length"])
+    hashtag_score = _range_score(hashtag_count, *targets["hashtags"])
+    emoji_score = _range_score(emojis_per_100_words, *targets["emojis_per_100_words"])
+    structure_score = 1.0 if len(lines) >= 3 or len(text) < 280 else 0.4
+
+    # Pondérations : le hook et le CTA pèsent le plus sur l'engagement
+    weighted = {
+        "hook": (hook, 0.22),
+        "cta": (1.0 if has_cta else 0.0, 0.16),
+        "question": (1.0 if has_question else 0.0, 0.10),
+        "length": (length_score, 0.14),
+        "readability": (min(readability / 60, 1.0), 0.12),
+        "hashtags": (hashtag_score, 0.08),
+        "emojis": (emoji_score, 0.06),
+        "structure": (structure_score, 0.06),
+        "sentiment": ({"positive": 1.0, "neutral": 0.7, "negative": 0.4}[sentiment], 0.06)
+    }
+    engagement_score = round(sum(value * weight for value, weight in weighted.values()) * 100)
+
+    # Suggestions : les critères les moins bien notés d'abord (perte pondérée)
+    candidates = []
+    if hook < 0.5:
+        candidates.append(((1 - hook) * 0.22, "hook"))
+    if not has_cta:
+        candidates.append((0.16, "cta"))
+    if not has_question:
+        candidates.append((0.10, "question"))
+    if length_score < 1:
+        candidates.append(((1 - length_score) * 0.14, "too_short" if len(text) < targets["length"][0] else "too_long"))
+    if readability < 50:
+        candidates.append(((1 - readability / 60) * 0.12, "readability"))
+    if hashtag_score < 1:
+        candidates.append(((1 - hashtag_score) * 0.08, "few_hashtags" if hashtag_count < targets["hashtags"][0] else "many_hashtags"))
+    if emoji_score < 1:
+        candidates.append(((1 - emoji_score) * 0.06, "few_emojis" if emojis_per_100_words < targets["emojis_per_100_words"][0] else "many_emojis"))
+    if structure_score < 1:
+        candidates.append((0.04, "structure"))
+    if sentiment == "negative":
+        candidates.append((0.03, "negative"))
+
+    candidates.sort(key=lambda c: c[0], reverse=True)
+    suggestions = [SUGGESTIONS[language][key] for _, key in candidates[:3]]
+
+    return {
+        "sentiment": sentiment,
+        "engagement_score": min(100, max(0, engagement_score)),
+        "suggestions": suggestions,
+        "metrics": {
+            "language": language,
+            "platform": platform,
+            "characters": len(text),
+            "words": word_count,
+            "sentences": len(sentences),
+            "readability": readability,
+            "length_score": round(length_score, 2),
+            "hook_strength": hook,
+            "has_question": has_question,
+            "has_cta": has_cta,
+            "emoji_count": emoji_count,
+            "emojis_per_100_words": round(emojis_per_100_words, 2),
+            "hashtag_count": hashtag_count,
+            "sentiment_score": sentiment_score
+        }
+    }
+
+
+def analyze_contents(contents: List[str], platform: Optional[str] = None, language: Optional[str] = None) -> List[dict]:
+    """Analyse de plusieurs textes (même plateforme/langue)"""
+    return [analyze_content(content, platform, language) for content in contents]
@@ -0,0 +1,245 @@
+"""
+Archivage à froid des variantes générées
+
+Les variantes des requêtes plus anciennes que ARCHIVE_AFTER_DAYS sont
+regroupées par requête en un blob JSON compressé (zlib) dans content_archives,
+puis supprimées de generated_contents. Les lectures (historique, export)
+passent par get_variants / get_variants_async qui réhydratent l'archive à la
+demande ; restore_variants la remet en table avant une écriture (régénération).
+"""
+import json
+import os
+import zlib
+from datetime import datetime, timedelta
+from typing import Iterator, List
+from sqlalchemy import select, insert, delete, text
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
+from dotenv import load_dotenv
+from app import models
+from app.text_store import intern_texts
+
+load_dotenv()
+
+# Âge (jours) à partir duquel les variantes d'une requête sont archivées
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "30"))
+# Requêtes archivées par transaction
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "200"))
+
+_VARIANT_FIELDS = ("id", "format_name", "variant_number", "polished_text")
+
+
+def encode_variants(variants) -> bytes:
+    payload = [
+        dict({field: getattr(variant, field) for field in _VARIANT_FIELDS}, created_at=variant.created_at.isoformat())
+        for variant in variants
+    ]
+    return zlib.compress(json.dumps(payload, ensure_ascii=False).encode("utf-8"), 9)
+
+
+def decode_variants(archive: models.ContentArchive) -> List[models.GeneratedContent]:
+    """Variantes réhydratées (objets transitoires, non rattachés à la session)"""
+    return [
+        models.GeneratedContent(
+            request_id=archive.request_id,
+            created_at=datetime.fromisoformat(item["created_at"]),
+            **{field: item[field] for field in _VARIANT_FIELDS}
+        )
+        for item in json.loads(zlib.decompress(archive.payload).decode("utf-8"))
+    ]
+
+
+def _live_variants_query(content_request: models.ContentRequest):
+    return select(models.GeneratedContent).options(joinedload(models.GeneratedContent.polished_blob)).where(
+        models.GeneratedContent.request_id == content_request.id,
+        models.GeneratedContent.created_at >= content_request.created_at
+    ).order_by(models.GeneratedContent.id)
+
+
+def get_variants(db: Session, content_request: models.ContentRequest) -> List[models.GeneratedContent]:
+    """Variantes d'une requête, depuis generated_contents ou l'archive"""
+    variants = db.execute(_live_variants_query(content_request)).scalars().all()
+    if variants:
+        return variants
+    archive = db.get(models.ContentArchive, content_request.id)
+    return decode_variants(archive) if archive else []
+
+
+async def get_variants_async(db: AsyncSession, content_request: models.ContentRequest) -> List[models.GeneratedContent]:
+    """Variante AsyncSession de get_variants"""
+    variants = (await db.execute(_live_variants_query(content_request))).scalars().all()
+    if variants:
+        return variants
+    archive = await db.get(models.ContentArchive, content_request.id)
+    return decode_variants(archive) if archive else []
+
+
+def iter_variants(db: Session, content_request: models.ContentRequest,
+                  batch_size: int = 50) -> Iterator[models.GeneratedContent]:
+    """Comme get_variants, mais lit les variantes en table par lots (yield_per) au fil de la consommation"""
+    found = False
+    for variant in db.execute(
+        _live_variants_query(content_request).execution_options(yield_per=batch_size)
+    ).scalars():
+        found = True
+        yield variant
+    if not found:
+        archive = db.get(models.ContentArchive, content_request.id)
+        if archive:
+            yield from decode_variants(archive)
+
+
+def _batch_variants_query(requests, load_texts: bool = True):
+    # Variantes jamais antérieures à leur requête : borne basse pour l'élagage des partitions
+    query = select(models.GeneratedContent).where(
+        models.GeneratedContent.request_id.in_([request.id for request in requests]),
+        models.GeneratedContent.created_at >= min(request.created_at for request in requests)
+    ).order_by(models.GeneratedContent.request_id, models.GeneratedContent.id)
+    if load_texts:
+        # Sans load_texts : aperçus ou comptes seulement, les textes ne sont pas lus
+        query = query.options(joinedload(models.GeneratedContent.polished_blob))
+    return query
+
+
+def _group_variants(requests, variants) -> dict:
+    by_request = {request.id: [] for request in requests}
+    for variant in variants:
+        by_request[variant.request_id].append(variant)
+    return by_request
+
+
+def _archives_query(request_ids: list):
+    return select(models.ContentArchive).where(models.ContentArchive.request_id.in_(request_ids))
+
+
+def get_variants_for_requests(db: Session, requests: list, load_texts: bool = True) -> dict:
+    """
+    Variantes de plusieurs requêtes en au plus deux requêtes SQL (en table,
+    puis archives des requêtes restées sans variante) : {request_id: [variantes]}.
+    load_texts=False ne lit pas les textes des variantes en table (les variantes archivées gardent le leur).
+    """
+    if not requests:
+        return {}
+    by_request = _group_variants(requests, db.execute(_batch_variants_query(requests, load_texts)).scalars().all())
+    missing = [request_id for request_id, variants in by_request.items() if not variants]
+    if missing:
+        for archive in db.execute(_archives_query(missing)).scalars():
+            by_request[archive.request_id] = decode_variants(archive)
+    return by_request
+
+
+async def get_variants_for_requests_async(db: AsyncSession, requests: list, load_texts: bool = True) -> dict:
+    """Variante AsyncSession de get_variants_for_requests"""
+    if not requests:
+        return {}
+    by_request = _group_variants(
+        requests, (await db.execute(_batch_variants_query(requests, load_texts))).scalars().all()
+    )
+    missing = [request_id for request_id, variants in by_request.items() if not variants]
+    if missing:
+        for archive in (await db.execute(_archives_query(missing))).scalars():
+            by_request[archive.request_id] = decode_variants(archive)
+    return by_request
+
+
+def restore_variants(db: Session, content_request: models.ContentRequest) -> bool:
+    """
+    Remet les variantes archivées dans generated_contents (mêmes id et created_at)
+    avant une modification. Ne commit pas. Retourne True si une archive a été restaurée.
+    """
+    archive = db.get(models.ContentArchive, content_request.id, with_for_update=True)
+    if archive is None:
+        return False
+    variants = decode_variants(archive)
+    if variants:
+        hashes = intern_texts(db, [variant.polished_text for variant in variants])
+        db.execute(insert(models.GeneratedContent), [
+            {"id": variant.id, "request_id": variant.request_id, "created_at": variant.created_at,
+             "format_name": variant.format_name, "variant_number": variant.variant_number,
+             "polished_text_hash": hashes[variant.polished_text]}
+            for variant in variants
+        ])
+    db.delete(archive)
+    db.flush()
+    return True
+
+
+# Requêtes assez anciennes dont les variantes sont encore en table (le calendrier référence des lignes : exclues).
+# Lignes verrouillées jusqu'au commit du lot ; celles qu'une régénération tient déjà sont laissées au passage suivant.
+_ARCHIVABLE_SQL = text(
+    "SELECT r.id, r.user_id, r.created_at FROM content_requests r "
+    "WHERE r.created_at < :cutoff "
+    "AND EXISTS (SELECT 1 FROM generated_contents g WHERE g.request_id = r.id AND g.created_at >= r.created_at) "
+    "AND NOT EXISTS (SELECT 1 FROM scheduled_contents s WHERE s.content_request_id = r.id) "
+    "AND NOT EXISTS (SELECT 1 FROM scheduled_contents s JOIN generated_contents g ON g.id = s.generated_content_id "
+    "WHERE g.request_id = r.id) "
+    "ORDER BY r.created_at LIMIT :limit "
+    "FOR UPDATE OF r SKIP LOCKED"
+)
+
+
+def archive_old_content(db: Session, older_than_days: int = ARCHIVE_AFTER_DAYS,
+                        batch_size: int = ARCHIVE_BATCH_SIZE) -> dict:
+    """
+    Archive les variantes des requêtes plus anciennes que older_than_days,
+    par lots de batch_size requêtes (un commit par lot). Les requêtes du lot sont
+    verrouillées (FOR UPDATE SKIP LOCKED) : une régénération concurrente
+    (crud.persist_regeneration) ne peut pas écrire un texte que le lot supprimerait.
+    Retourne le nombre de requêtes / variantes archivées et les tailles avant/après.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    stats = {"requests": 0, "variants": 0, "original_bytes": 0, "compressed_bytes": 0}
+
+    while True:
+        batch = db.execute(_ARCHIVABLE_SQL, {"cutoff": cutoff, "limit": batch_size}).all()
+        if not batch:
+            break
+
+        request_ids = [row.id for row in batch]
+        oldest = min(row.created_at for row in batch)
+        variants_by_request = {}
+        for variant in db.execute(
+            select(models.GeneratedContent).options(joinedload(models.GeneratedContent.polished_blob)).where(
+                models.GeneratedContent.request_id.in_(request_ids),
+                models.GeneratedContent.created_at >= oldest
+            ).order_by(models.GeneratedContent.id)
+        ).scalars():
+            variants_by_request.setdefault(variant.request_id, []).append(variant)
+        # Archives déjà présentes (variantes restaurées puis de nouveau anciennes), lues pour tout le lot
+        existing_archives = {archive.request_id: archive for archive in db.execute(_archives_query(request_ids)).scalars()}
+
+        for row in batch:
+            variants = variants_by_request[row.id]
+            existing = existing_archives.get(row.id)
+            if existing is not None:
+                variants = decode_variants(existing) + variants
+                db.delete(existing)
+                db.flush()
+
+            payload = encode_variants(variants)
+            original_size = sum(len(variant.polished_text.encode("utf-8")) for variant in variants)
+            db.add(models.ContentArchive(
+                request_id=row.id,
+                user_id=row.user_id,
+                request_created_at=row.created_at,
+                payload=payload,
+                variants_count=len(variants),
+                original_size=original_size,
+                compressed_size=len(payload)
+            ))
+            stats["requests"] += 1
+            stats["variants"] += len(variants)
+            stats["original_bytes"] += original_size
+            stats["compressed_bytes"] += len(payload)
+
+        db.flush()
+        db.execute(delete(models.GeneratedContent).where(
+            models.GeneratedContent.request_id.in_(request_ids),
+            models.GeneratedContent.created_at >= oldest
+        ).execution_options(synchronize_session=False))
+        db.commit()
+        db.expunge_all()
+
+    print(f"🧊 Archivage: {stats['requests']} requête(s), {stats['variants']} variante(s), "
+          f"{stats['original_bytes']} -> {stats['compressed_bytes']} octets")
+    return stats
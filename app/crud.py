@@ -1,10 +1,16 @@
+from sqlalchemy import insert, update
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app import models, schemas
 from app.plan_config import get_plan_credits, PLAN_MAPPING
+from app.utils.team_utils import lock_credit_account, deduct_partial_credits
+from app.text_store import intern_texts, intern_texts_async
+from app.content_archive import restore_variants
 from passlib.context import CryptContext
 import random
 import re
 from datetime import datetime, timedelta
+from fractions import Fraction
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -72,13 +78,21 @@ def create_user(db: Session, user: schemas.UserCreate):
 def get_user(db: Session, user_id: int):
     return db.query(models.User).filter(models.User.id == user_id).first()
 
+async def get_user_async(db: AsyncSession, user_id: int):
+    return await db.get(models.User, user_id)
+
+def mark_user_write(user: models.User):
+    """Horodate la dernière écriture de l'utilisateur (read-your-writes : ses lectures restent sur le primaire)"""
+    user.last_write_at = datetime.utcnow()
+
 # Content Request CRUD
 def create_content_request(db: Session, request: schemas.ContentRequestCreate, user_id: int):
     db_request = models.ContentRequest(
         user_id=user_id,
         original_text=request.original_text,
         platform=request.platform,
-        tone=request.tone
+        tone=request.tone,
+        language=request.language
     )
     db.add(db_request)
     db.commit()
@@ -97,6 +111,127 @@ def create_generated_content(db: Session, request_id: int, polished_text: str, v
     db.refresh(db_content)
     return db_content
 
+def _generated_contents_insert(request_id: int, variants: list, hashes: dict):
+    """
+    INSERT multi-lignes avec RETURNING id, created_at (un seul aller-retour).
+    variants: [(format_name, variant_number, polished_text)], hashes: {texte: hash} (textes déjà dans text_blobs)
+    Returns (instruction, lignes retournées à l'appelant, paramètres de l'INSERT)
+    """
+    rows = [
+        {"request_id": request_id, "format_name": format_name, "variant_number": variant_number, "polished_text": text}
+        for format_name, variant_number, text in variants
+    ]
+    params = [
+        {"request_id": request_id, "format_name": format_name, "variant_number": variant_number,
+         "polished_text_hash": hashes[text]}
+        for format_name, variant_number, text in variants
+    ]
+    stmt = insert(models.GeneratedContent).returning(
+        models.GeneratedContent.id,
+        models.GeneratedContent.created_at,
+        sort_by_parameter_order=True  # RETURNING dans l'ordre des lignes envoyées
+    )
+    return stmt, rows, params
+
+def _with_returned(rows: list, returned) -> list:
+    for row, (content_id, created_at) in zip(rows, returned):
+        row["id"] = content_id
+        row["created_at"] = created_at
+    return rows
+
+def create_generated_contents(db: Session, request_id: int, variants: list) -> list:
+    """
+    Insère toutes les variantes d'une requête en une instruction (sans commit :
+    elles partent avec le commit suivant de l'appelant).
+    Retourne les lignes insérées (dicts avec id et created_at).
+    """
+    if not variants:
+        return []
+    hashes = intern_texts(db, [text for _, _, text in variants])
+    stmt, rows, params = _generated_contents_insert(request_id, variants, hashes)
+    return _with_returned(rows, db.execute(stmt, params).all())
+
+async def create_generated_contents_async(db: AsyncSession, request_id: int, variants: list) -> list:
+    """Variante AsyncSession de create_generated_contents"""
+    if not variants:
+        return []
+    hashes = await intern_texts_async(db, [text for _, _, text in variants])
+    stmt, rows, params = _generated_contents_insert(request_id, variants, hashes)
+    return _with_returned(rows, (await db.execute(stmt, params)).all())
+
+class PolishRejected(Exception):
+    """Refus détecté sous verrou au moment d'écrire (crédits épuisés, essai Pro déjà utilisé)"""
+
+
+def persist_polish(db: Session, user_id: int, request: schemas.ContentRequestCreate, variants: list,
+                   tokens_used: int, using_pro_trial: bool = False) -> tuple:
+    """
+    Unité de travail d'un polish, à exécuter via database.run_in_transaction (un seul commit).
+    Verrouille le compte (utilisateur puis équipe), revérifie crédits / essai Pro,
+    puis écrit la requête, les variantes, le débit et l'analytics.
+    Returns (content_request, lignes generated_contents insérées)
+    """
+    user, team = lock_credit_account(user_id, db)
+
+    if using_pro_trial:
+        if user.has_used_pro_trial:
+            raise PolishRejected("Vous avez déjà utilisé votre essai Pro gratuit")
+        user.has_used_pro_trial = True
+        user.pro_trial_activated_at = datetime.utcnow()
+    elif team:
+        if team.team_credits < 1:
+            raise PolishRejected("Crédits insuffisants")
+        team.team_credits -= 1
+    else:
+        if user.credits_remaining < 1:
+            raise PolishRejected("Crédits insuffisants")
+        user.credits_remaining -= 1
+
+    content_request = models.ContentRequest(
+        user_id=user_id,
+        original_text=request.original_text,
+        platform=request.platform,
+        tone=request.tone,
+        language=request.language
+    )
+    db.add(content_request)
+    db.flush()  # id nécessaire pour les variantes
+
+    rows = create_generated_contents(db, content_request.id, variants)
+    db.add(models.UsageAnalytics(user_id=user_id, tokens_used=tokens_used, platform=None))
+    mark_user_write(user)
+
+    return content_request, rows
+
+def persist_regeneration(db: Session, user_id: int, content_request: models.ContentRequest, variant_keys: dict,
+                         regenerated: dict, credit_fraction: Fraction, tokens_used: int) -> int:
+    """
+    Unité de travail d'une régénération partielle, à exécuter via database.run_in_transaction.
+    Verrouille le compte, facture la fraction de crédit (refus si le solde ne la couvre pas),
+    verrouille la requête (exclut l'archivage concurrent, voir archive_old_content),
+    remet l'archive éventuelle en table puis écrit les textes régénérés et l'analytics.
+    variant_keys: {(format, variante): (id, created_at)}, regenerated: {(format, variante): texte}
+    Returns le nombre de crédits entiers débités
+    """
+    user, team = lock_credit_account(user_id, db)
+    credits_deducted = deduct_partial_credits(user, team, credit_fraction)
+    if credits_deducted is None:
+        raise PolishRejected("Crédits insuffisants")
+
+    # Même verrou que l'archivage : ses variantes ne peuvent pas être archivées sous nos pieds
+    db.refresh(content_request, with_for_update=True)
+    # Archive éventuelle remise en table (mêmes id et created_at)
+    restore_variants(db, content_request)
+    hashes = intern_texts(db, regenerated.values())
+    db.execute(update(models.GeneratedContent), [
+        {"id": variant_keys[key][0], "created_at": variant_keys[key][1], "polished_text_hash": hashes[text]}
+        for key, text in regenerated.items()
+    ])
+
+    db.add(models.UsageAnalytics(user_id=user_id, tokens_used=tokens_used, platform=None))
+    mark_user_write(user)
+    return credits_deducted
+
 def get_user_requests(db: Session, user_id: int, skip: int = 0, limit: int = 10):
     return db.query(models.ContentRequest).filter(
         models.ContentRequest.user_id == user_id
@@ -1,36 +1,45 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
+import random
+import threading
+import time
+from datetime import datetime
 from dotenv import load_dotenv
+from app.db_pool import pool_kwargs, uses_transaction_pooler, register_engine
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+# Réplique en lecture (optionnelle) pour analytics, historique et dashboards admin
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
 
-# Configuration pour Neon PostgreSQL (serverless avec SSL)
-# Neon utilise un connection pooler qui nécessite des paramètres spécifiques
-connect_args = {}
+# Fenêtre pendant laquelle un utilisateur lit sur le primaire après sa propre écriture (read-your-writes)
+REPLICA_READ_YOUR_WRITES_SECONDS = float(os.getenv("REPLICA_READ_YOUR_WRITES_SECONDS", "30"))
+# Au-delà de ce retard de réplication, la réplique n'est plus utilisée
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "10"))
+# Intervalle entre deux vérifications de santé / retard de la réplique
+REPLICA_HEALTH_CHECK_INTERVAL = float(os.getenv("REPLICA_HEALTH_CHECK_INTERVAL", "5"))
 
-if DATABASE_URL and "neon.tech" in DATABASE_URL:
-    # Neon requiert SSL et a des paramètres spécifiques pour le pooler
-    connect_args = {
-        "sslmode": "require",
-        "connect_timeout": 30,
-    }
-    # Pool configuration optimisée pour serverless
-    engine = create_engine(
-        DATABASE_URL,
-        connect_args=connect_args,
-        pool_size=5,
-        max_overflow=10,
-        pool_timeout=30,
-        pool_recycle=300,  # Recycle connections toutes les 5 minutes
-        pool_pre_ping=True,  # Vérifie la connexion avant utilisation
-    )
-else:
-    # Configuration standard pour autres bases PostgreSQL
-    engine = create_engine(DATABASE_URL)
+
+def create_sync_engine(database_url: str):
+    # Pool selon le profil DB_POOL_PROFILE (serverless par défaut pour Neon, dedicated sinon)
+    connect_args = {}
+    if database_url and "neon.tech" in database_url:
+        # Neon requiert SSL
+        connect_args = {
+            "sslmode": "require",
+            "connect_timeout": 30,
+        }
+    return create_engine(database_url, connect_args=connect_args, **pool_kwargs(database_url))
+
+
+engine = create_sync_engine(DATABASE_URL)
+register_engine("primary", engine, DATABASE_URL)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -41,4 +50,192 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+# Échecs de sérialisation / deadlocks : la transaction peut être rejouée telle quelle
+RETRYABLE_SQLSTATES = {"40001", "40P01"}
+TRANSACTION_MAX_RETRIES = int(os.getenv("TRANSACTION_MAX_RETRIES", "3"))
+
+
+def is_retryable_error(error: DBAPIError) -> bool:
+    orig = getattr(error, "orig", None)
+    code = getattr(orig, "pgcode", None) or getattr(orig, "sqlstate", None)
+    return code in RETRYABLE_SQLSTATES
+
+
+def run_in_transaction(db, work, retries: int = TRANSACTION_MAX_RETRIES):
+    """
+    Exécute work(db) puis commit, dans une seule transaction.
+    Rejoue l'ensemble (avec backoff) sur échec de sérialisation ou deadlock,
+    rollback et relance toute autre erreur.
+    """
+    for attempt in range(retries + 1):
+        try:
+            result = work(db)
+            db.commit()
+            return result
+        except DBAPIError as e:
+            db.rollback()
+            if not is_retryable_error(e) or attempt == retries:
+                raise
+            print(f"🔁 Transaction retry {attempt + 1}/{retries} ({e.orig.__class__.__name__})")
+            time.sleep(0.05 * (2 ** attempt) + random.uniform(0, 0.05))
+        except Exception:
+            db.rollback()
+            raise
+
+
+# Moteur asynchrone (asyncpg) : coexiste avec le moteur sync pendant la migration des routes
+def to_async_url(database_url: str):
+    """
+    postgresql://...?sslmode=require -> postgresql+asyncpg://...
+    asyncpg ne comprend pas les paramètres libpq (sslmode, channel_binding) :
+    ils sont retirés de l'URL et SSL passe par connect_args.
+    """
+    url = make_url(database_url.replace("postgres://", "postgresql://", 1))
+    ssl_mode = url.query.get("sslmode")
+    url = url.set(drivername="postgresql+asyncpg").difference_update_query(["sslmode", "channel_binding"])
+    return url, ssl_mode
+
+
+def create_asyncpg_engine(database_url: str):
+    async_url, ssl_mode = to_async_url(database_url)
+    async_connect_args = {}
+
+    if "neon.tech" in database_url:
+        async_connect_args = {"ssl": "require", "timeout": 30}
+    elif ssl_mode and ssl_mode not in ("disable", "allow", "prefer"):
+        async_connect_args["ssl"] = ssl_mode
+
+    if uses_transaction_pooler(database_url):
+        # PgBouncer en mode transaction (dont le pooler Neon) ne garde pas les prepared statements entre transactions
+        async_connect_args["statement_cache_size"] = 0
+        async_url = async_url.update_query_dict({"prepared_statement_cache_size": "0"})
+
+    return create_async_engine(async_url, connect_args=async_connect_args, **pool_kwargs(database_url, is_async=True))
+
+
+async_engine = None
+AsyncSessionLocal = None
+
+if DATABASE_URL:
+    async_engine = create_asyncpg_engine(DATABASE_URL)
+    register_engine("primary_async", async_engine, DATABASE_URL)
+    # expire_on_commit=False : pas de lazy-load implicite (interdit en async) après un commit
+    AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False, autoflush=False)
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# Réplique en lecture : même profil de pool que le primaire
+replica_engine = None
+async_replica_engine = None
+ReplicaSessionLocal = None
+AsyncReplicaSessionLocal = None
+
+# Retard de réplication en secondes (0 si la réplique a tout rejoué)
+REPLICA_LAG_SQL = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+_replica_lock = threading.Lock()
+_replica_state = {"healthy": False, "lag": None, "checked_at": 0.0, "error": None}
+
+
+def _set_replica_state(healthy: bool, lag=None, error=None):
+    with _replica_lock:
+        _replica_state.update(healthy=healthy, lag=lag, error=error, checked_at=time.monotonic())
+
+
+def _replica_check_due() -> bool:
+    """True si une vérification est due ; réserve le créneau pour éviter des vérifications simultanées"""
+    with _replica_lock:
+        now = time.monotonic()
+        if now - _replica_state["checked_at"] < REPLICA_HEALTH_CHECK_INTERVAL:
+            return False
+        _replica_state["checked_at"] = now
+        return True
+
+
+def _on_replica_error(context):
+    # Connexion perdue : bascule immédiate sur le primaire jusqu'à la prochaine vérification
+    if context.is_disconnect:
+        _set_replica_state(False, error=str(context.original_exception))
+
+
+if DATABASE_REPLICA_URL:
+    replica_engine = create_sync_engine(DATABASE_REPLICA_URL)
+    async_replica_engine = create_asyncpg_engine(DATABASE_REPLICA_URL)
+    register_engine("replica", replica_engine, DATABASE_REPLICA_URL)
+    register_engine("replica_async", async_replica_engine, DATABASE_REPLICA_URL)
+    event.listen(replica_engine, "handle_error", _on_replica_error)
+    event.listen(async_replica_engine.sync_engine, "handle_error", _on_replica_error)
+    ReplicaSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+    AsyncReplicaSessionLocal = async_sessionmaker(async_replica_engine, class_=AsyncSession, expire_on_commit=False, autoflush=False)
+
+
+def check_replica():
+    """Vérifie la réplique (au plus une fois par REPLICA_HEALTH_CHECK_INTERVAL)"""
+    if replica_engine is None or not _replica_check_due():
+        return
+    try:
+        with replica_engine.connect() as conn:
+            lag = float(conn.execute(REPLICA_LAG_SQL).scalar() or 0)
+        _set_replica_state(lag <= REPLICA_MAX_LAG_SECONDS, lag=lag)
+    except Exception as e:
+        _set_replica_state(False, error=str(e))
+
+
+async def check_replica_async():
+    """Variante async de check_replica (ne bloque pas l'event loop)"""
+    if async_replica_engine is None or not _replica_check_due():
+        return
+    try:
+        async with async_replica_engine.connect() as conn:
+            lag = float((await conn.execute(REPLICA_LAG_SQL)).scalar() or 0)
+        _set_replica_state(lag <= REPLICA_MAX_LAG_SECONDS, lag=lag)
+    except Exception as e:
+        _set_replica_state(False, error=str(e))
+
+
+def replica_usable(last_write_at=None) -> bool:
+    """
+    La réplique peut servir la lecture si elle est saine et, pour un utilisateur
+    qui vient d'écrire, si sa dernière écriture est plus ancienne que la fenêtre
+    read-your-writes (et que le retard mesuré).
+    """
+    with _replica_lock:
+        healthy, lag = _replica_state["healthy"], _replica_state["lag"] or 0
+    if not healthy:
+        return False
+    if last_write_at is None:
+        return True
+    elapsed = (datetime.utcnow() - last_write_at).total_seconds()
+    return elapsed > max(REPLICA_READ_YOUR_WRITES_SECONDS, lag)
+
+
+def get_replica_status() -> dict:
+    with _replica_lock:
+        state = dict(_replica_state)
+    return {
+        "configured": replica_engine is not None,
+        "healthy": state["healthy"],
+        "lag_seconds": state["lag"],
+        "error": state["error"],
+        "read_your_writes_seconds": REPLICA_READ_YOUR_WRITES_SECONDS,
+        "max_lag_seconds": REPLICA_MAX_LAG_SECONDS
+    }
+
+
+def get_replica_db():
+    """Session de lecture : réplique si disponible, sinon primaire (ex: dashboards admin)"""
+    check_replica()
+    db = ReplicaSessionLocal() if replica_usable() else SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -0,0 +1,195 @@
+"""
+Profils de pool de connexions PostgreSQL et métriques en direct
+
+DB_POOL_PROFILE choisit un profil nommé (serverless, dedicated,
+pgbouncer-transaction) ; DB_POOL_SIZE / DB_MAX_OVERFLOW / DB_POOL_TIMEOUT /
+DB_POOL_RECYCLE surchargent ses valeurs. Les pools sont instrumentés
+(temps d'attente, timeouts, recyclages) et exposés par /admin/metrics/db-pool.
+"""
+import os
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool, NullPool
+from dotenv import load_dotenv
+
+load_dotenv()
+
+POOL_PROFILES = {
+    # Neon / bases serverless : petit pool, connexions recyclées souvent (le compute peut s'endormir)
+    "serverless": {"pool_size": 5, "max_overflow": 10, "pool_timeout": 30, "pool_recycle": 300, "pool_pre_ping": True},
+    # Postgres dédié : pool plus large, connexions longues
+    "dedicated": {"pool_size": 20, "max_overflow": 10, "pool_timeout": 30, "pool_recycle": 1800, "pool_pre_ping": True},
+    # PgBouncer en mode transaction : c'est PgBouncer qui poole, pas de pool côté application
+    "pgbouncer-transaction": {"poolclass": NullPool},
+}
+
+_OVERRIDES = {
+    "pool_size": "DB_POOL_SIZE",
+    "max_overflow": "DB_MAX_OVERFLOW",
+    "pool_timeout": "DB_POOL_TIMEOUT",
+    "pool_recycle": "DB_POOL_RECYCLE",
+}
+
+
+def get_pool_profile(database_url: str) -> str:
+    """Profil configuré, sinon serverless pour Neon et dedicated ailleurs"""
+    profile = os.getenv("DB_POOL_PROFILE")
+    if profile:
+        if profile not in POOL_PROFILES:
+            raise ValueError(f"DB_POOL_PROFILE inconnu: {profile} (attendu: {', '.join(POOL_PROFILES)})")
+        return profile
+    return "serverless" if database_url and "neon.tech" in database_url else "dedicated"
+
+
+def uses_transaction_pooler(database_url: str) -> bool:
+    """Pooler en mode transaction : pas de prepared statements nommés côté asyncpg"""
+    return get_pool_profile(database_url) == "pgbouncer-transaction" or bool(database_url and "neon.tech" in database_url)
+
+
+class _PoolStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.recycles = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.wait_count = 0
+        self.wait_total_ms = 0.0
+        self.wait_max_ms = 0.0
+
+
+class _InstrumentedPoolMixin:
+    """Mesure le temps passé à attendre une connexion libre et les timeouts"""
+
+    _pool_stats = None
+
+    def _do_get(self):
+        stats = self._pool_stats
+        if stats is None:
+            return super()._do_get()
+
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            with stats.lock:
+                stats.timeouts += 1
+            raise
+        finally:
+            waited_ms = (time.perf_counter() - start) * 1000
+            with stats.lock:
+                stats.wait_count += 1
+                stats.wait_total_ms += waited_ms
+                stats.wait_max_ms = max(stats.wait_max_ms, waited_ms)
+
+    def recreate(self):
+        # engine.dispose() recrée le pool : les compteurs continuent sur le nouveau
+        pool = super().recreate()
+        pool._pool_stats = self._pool_stats
+        return pool
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+_registry_lock = threading.Lock()
+# nom -> (moteur sync, profil, compteurs)
+_engines = {}
+
+
+def pool_kwargs(database_url: str, is_async: bool = False) -> dict:
+    """Arguments create_engine / create_async_engine du profil actif"""
+    kwargs = dict(POOL_PROFILES[get_pool_profile(database_url)])
+    if kwargs.get("poolclass") is NullPool:
+        return kwargs
+
+    for key, env_name in _OVERRIDES.items():
+        value = os.getenv(env_name)
+        if value is not None:
+            kwargs[key] = int(value)
+    kwargs["poolclass"] = InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool
+    return kwargs
+
+
+def register_engine(name: str, engine, database_url: str):
+    """Branche les événements du pool et référence le moteur dans les métriques"""
+    if engine is None:
+        return
+    sync_engine = getattr(engine, "sync_engine", engine)
+    stats = _PoolStats()
+    sync_engine.pool._pool_stats = stats
+
+    @event.listens_for(sync_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        # record_info survit aux reconnexions du même slot : une 2e connexion = recyclage ou invalidation
+        with stats.lock:
+            stats.connects += 1
+            if connection_record.record_info.get("connected"):
+                if not connection_record.record_info.pop("invalidated", False):
+                    stats.recycles += 1
+            connection_record.record_info["connected"] = True
+
+    @event.listens_for(sync_engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        with stats.lock:
+            stats.invalidations += 1
+        connection_record.record_info["invalidated"] = True
+
+    @event.listens_for(sync_engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        with stats.lock:
+            stats.checkouts += 1
+
+    @event.listens_for(sync_engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        with stats.lock:
+            stats.checkins += 1
+
+    with _registry_lock:
+        _engines[name] = (sync_engine, get_pool_profile(database_url), stats)
+
+
+def get_pool_metrics() -> dict:
+    """État courant et compteurs cumulés de chaque pool"""
+    with _registry_lock:
+        engines = dict(_engines)
+
+    metrics = {}
+    for name, (engine, profile, stats) in engines.items():
+        pool = engine.pool
+        entry = {"profile": profile, "pool_class": pool.__class__.__name__}
+
+        if isinstance(pool, QueuePool):
+            entry.update({
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+                "max_overflow": pool._max_overflow,
+                "timeout": pool.timeout(),
+                "recycle": pool._recycle,
+            })
+
+        with stats.lock:
+            entry.update({
+                "checkouts": stats.checkouts,
+                "checkins": stats.checkins,
+                "connects": stats.connects,
+                "recycles": stats.recycles,
+                "invalidations": stats.invalidations,
+                "timeouts": stats.timeouts,
+                "wait_avg_ms": round(stats.wait_total_ms / stats.wait_count, 2) if stats.wait_count else 0.0,
+                "wait_max_ms": round(stats.wait_max_ms, 2),
+            })
+        metrics[name] = entry
+
+    return metrics
@@ -2,6 +2,7 @@ import os
 from typing import Optional
 import sib_api_v3_sdk
 from sib_api_v3_sdk.rest import ApiException
+from app.http_client import get_brevo_api_client
 
 # Configuration Brevo (API)
 BREVO_API_KEY = os.getenv("BREVO_API_KEY", "")
@@ -159,7 +160,7 @@ def send_verification_email(to_email: str, verification_code: str, user_name: Op
         """
 
         # Créer l'instance API
-        api_instance = sib_api_v3_sdk.TransactionalEmailsApi(sib_api_v3_sdk.ApiClient(configuration))
+        api_instance = sib_api_v3_sdk.TransactionalEmailsApi(get_brevo_api_client(configuration))
 
         # Créer l'objet email
         send_smtp_email = sib_api_v3_sdk.SendSmtpEmail(
@@ -357,7 +358,7 @@ def send_calendar_reminder(to_email: str, user_name: str, content_preview: str,
         """
 
         # Créer l'instance API
-        api_instance = sib_api_v3_sdk.TransactionalEmailsApi(sib_api_v3_sdk.ApiClient(configuration))
+        api_instance = sib_api_v3_sdk.TransactionalEmailsApi(get_brevo_api_client(configuration))
 
         # Créer l'objet email
         send_smtp_email = sib_api_v3_sdk.SendSmtpEmail(
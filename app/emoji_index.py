@@ -0,0 +1,153 @@
+"""
+Index inversé mot-clé -> emoji pour /ai/emojis
+
+Construit une fois au démarrage (lifespan) à partir du lexique fr/en/es
+embarqué (app/data/emoji_lexicon.json). Les mots du contenu sont normalisés
+(minuscules, sans accents, racinisés) puis cherchés dans l'index : pas
+d'appel LLM tant que la correspondance est suffisante.
+"""
+import json
+import os
+import re
+import threading
+from collections import defaultdict
+from typing import List, Optional
+from app.content_analyzer import strip_accents, STOPWORDS
+
+LEXICON_PATH = os.path.join(os.path.dirname(__file__), "data", "emoji_lexicon.json")
+
+# Suffixes retirés par la racinisation légère (fr/en/es confondus, du plus long au plus court)
+SUFFIXES = sorted({
+    "issements", "issement", "ements", "ement", "ations", "ation", "ateurs", "ateur", "atrices", "atrice",
+    "euses", "euse", "eurs", "eur", "ments", "ment", "ites", "ite", "iques", "ique", "ives", "ive",
+    "ings", "ing", "ness", "ers", "er", "ed", "ly", "ies", "es", "s", "x",
+    "aciones", "acion", "mente", "ando", "iendo", "ados", "ado", "idas", "ida", "ar", "ir", "e"
+}, key=len, reverse=True)
+MIN_STEM_LENGTH = 3
+
+# Poids des catégories du lexique par plateforme (1.0 par défaut)
+PLATFORM_CATEGORY_WEIGHTS = {
+    "linkedin": {"business": 1.5, "success": 1.3, "productivity": 1.3, "education": 1.2, "ideas": 1.2, "tech": 1.2,
+                 "marketing": 1.1, "fun": 0.5, "food": 0.6, "entertainment": 0.6},
+    "twitter": {"trending": 1.4, "tech": 1.2, "ideas": 1.1, "alert": 1.2},
+    "facebook": {"family": 1.3, "celebration": 1.3, "emotion": 1.2, "food": 1.1},
+    "instagram": {"lifestyle": 1.5, "travel": 1.4, "food": 1.3, "nature": 1.3, "emotion": 1.2, "business": 0.7},
+    "tiktok": {"fun": 1.5, "trending": 1.5, "entertainment": 1.3, "emotion": 1.2, "business": 0.6, "productivity": 0.7},
+    "youtube": {"entertainment": 1.5, "education": 1.3, "tech": 1.2, "trending": 1.2}
+}
+
+# Emojis de complément quand l'index ne trouve pas assez de correspondances
+PLATFORM_DEFAULTS = {
+    "linkedin": ["💡", "🚀", "🎯", "📈", "🤝"],
+    "twitter": ["🔥", "👀", "💡", "⚡", "🚀"],
+    "facebook": ["❤️", "🎉", "🙌", "✨", "💬"],
+    "instagram": ["✨", "📸", "😍", "🌟", "❤️"],
+    "tiktok": ["🔥", "😂", "🤯", "👀", "✨"],
+    "youtube": ["🎬", "🔥", "👉", "🎯", "💡"]
+}
+DEFAULT_EMOJIS = ["✨", "🎯", "💡", "🚀", "⭐"]
+
+# En dessous de ce nombre de mots-clés distincts reconnus, la suggestion est jugée peu fiable
+MIN_CONFIDENT_MATCHES = 2
+
+TOKEN_RE = re.compile(r"[^\W\d_]+", re.UNICODE)
+ALL_STOPWORDS = {strip_accents(word) for words in STOPWORDS.values() for word in words}
+
+_lock = threading.Lock()
+_index = None
+
+
+def stem(word: str) -> str:
+    """Racinisation légère : minuscules, sans accents, un suffixe retiré"""
+    word = strip_accents(word.lower())
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM_LENGTH:
+            return word[:-len(suffix)]
+    return word
+
+
+def _terms(text: str) -> List[str]:
+    """Racines des mots (hors mots outils) puis bigrammes de racines"""
+    stems = [stem(token) for token in TOKEN_RE.findall(text) if strip_accents(token.lower()) not in ALL_STOPWORDS]
+    return stems + [f"{a} {b}" for a, b in zip(stems, stems[1:])]
+
+
+class EmojiIndex:
+    """Index inversé : racine (ou bigramme) -> [(position de l'emoji, poids)]"""
+
+    def __init__(self, entries: List[dict]):
+        self.emojis = [entry["emoji"] for entry in entries]
+        self.categories = [entry.get("category", "") for entry in entries]
+        postings = defaultdict(dict)
+
+        for position, entry in enumerate(entries):
+            for keywords in entry["keywords"].values():
+                for keyword in keywords:
+                    stems = [stem(token) for token in TOKEN_RE.findall(keyword)
+                             if strip_accents(token.lower()) not in ALL_STOPWORDS]
+                    if not stems:
+                        continue
+                    # Expressions multi-mots indexées en bigramme, plus spécifiques donc mieux pondérées
+                    term, weight = (" ".join(stems[:2]), 2.0) if len(stems) > 1 else (stems[0], 1.0)
+                    postings[term][position] = max(postings[term].get(position, 0), weight)
+
+        # Un terme partagé par beaucoup d'emojis est moins discriminant
+        self.postings = {
+            term: [(position, weight / len(hits)) for position, weight in hits.items()]
+            for term, hits in postings.items()
+        }
+
+    def search(self, content: str, platform: Optional[str] = None, limit: int = 8) -> tuple:
+        """Retourne (emojis classés, nombre de mots-clés distincts reconnus)"""
+        category_weights = PLATFORM_CATEGORY_WEIGHTS.get((platform or "").lower(), {})
+        scores = defaultdict(float)
+        matched = set()
+
+        for term in _terms(content):
+            hits = self.postings.get(term)
+            if not hits:
+                continue
+            matched.add(term)
+            for position, weight in hits:
+                scores[position] += weight * category_weights.get(self.categories[position], 1.0)
+
+        ranked = sorted(scores, key=lambda position: scores[position], reverse=True)
+        return [self.emojis[position] for position in ranked[:limit]], len(matched)
+
+
+def load_lexicon(path: str = LEXICON_PATH) -> List[dict]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["entries"]
+
+
+def build_emoji_index() -> EmojiIndex:
+    """Construit l'index (appelé au démarrage, idempotent)"""
+    global _index
+    with _lock:
+        if _index is None:
+            _index = EmojiIndex(load_lexicon())
+            print(f"😀 Emoji index ready ({len(_index.emojis)} emojis, {len(_index.postings)} termes)")
+        return _index
+
+
+def get_emoji_index() -> EmojiIndex:
+    return _index or build_emoji_index()
+
+
+def suggest_emojis(content: str, platform: Optional[str] = None, limit: int = 8) -> tuple:
+    """
+    Suggestions locales : (emojis, confiant).
+    Complète avec les emojis par défaut de la plateforme si besoin.
+    """
+    emojis, matched = get_emoji_index().search(content, platform, limit)
+    confident = matched >= MIN_CONFIDENT_MATCHES and len(emojis) >= 3
+    return fill_emojis(emojis, platform, limit), confident
+
+
+def fill_emojis(emojis: List[str], platform: Optional[str] = None, limit: int = 8) -> List[str]:
+    """Déduplique et complète avec les emojis par défaut de la plateforme"""
+    result = []
+    for emoji in emojis + PLATFORM_DEFAULTS.get((platform or "").lower(), DEFAULT_EMOJIS):
+        if emoji not in result:
+            result.append(emoji)
+    return result[:limit]
@@ -0,0 +1,104 @@
+"""
+Champs partiels (fields=) et mode aperçu (view=preview) des listes
+
+fields=id,created_at,... limite les clés renvoyées pour chaque élément et
+évite les chargements inutiles (auteurs, variantes). En aperçu, les textes
+sont tronqués en SQL (substr sur text_blobs.content) : seul le début de la
+valeur TOAST est lu et sérialisé. La troncature est détectée sans lire le
+texte entier, en comparant au nombre d'octets stocké (text_blobs.byte_size).
+"""
+import os
+from typing import Iterable, Optional
+from fastapi import HTTPException, status
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from dotenv import load_dotenv
+from app import models
+
+load_dotenv()
+
+# Longueur (caractères) des textes en aperçu
+PREVIEW_LENGTH = int(os.getenv("PREVIEW_LENGTH", "200"))
+VIEWS = ("full", "preview")
+VIEW_PATTERN = "^(full|preview)$"
+
+
+def parse_fields(fields: Optional[str], allowed: Iterable[str]) -> Optional[set]:
+    """fields=a,b,c -> ensemble validé (id toujours inclus) ; None = tous les champs"""
+    if not fields:
+        return None
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested - set(allowed)
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}. Allowed: {', '.join(allowed)}"
+        )
+    return requested | {"id"}
+
+
+def wants(fields: Optional[set], name: str) -> bool:
+    return fields is None or name in fields
+
+
+def pick_fields(item: dict, fields: Optional[set]) -> dict:
+    if fields is None:
+        return item
+    return {key: value for key, value in item.items() if key in fields}
+
+
+def format_preview(text: Optional[str], byte_size: Optional[int]) -> Optional[str]:
+    """Aperçu lu en SQL : '...' ajouté si le texte complet est plus long"""
+    if text is None:
+        return None
+    return text + "..." if byte_size is not None and len(text.encode("utf-8")) < byte_size else text
+
+
+def truncate_text(text: Optional[str], length: int = PREVIEW_LENGTH) -> Optional[str]:
+    """Troncature côté Python, pour les textes déjà en mémoire (variantes archivées)"""
+    if text is None:
+        return None
+    return text[:length] + "..." if len(text) > length else text
+
+
+def _text_previews_query(hashes: set, length: int):
+    return select(
+        models.TextBlob.hash, func.substr(models.TextBlob.content, 1, length), models.TextBlob.byte_size
+    ).where(models.TextBlob.hash.in_(hashes))
+
+
+def text_previews(db: Session, hashes: Iterable[str], length: int = PREVIEW_LENGTH) -> dict:
+    """{hash: aperçu} en une requête"""
+    hashes = {digest for digest in hashes if digest}
+    if not hashes:
+        return {}
+    return {
+        digest: format_preview(text, byte_size)
+        for digest, text, byte_size in db.execute(_text_previews_query(hashes, length))
+    }
+
+
+async def text_previews_async(db: AsyncSession, hashes: Iterable[str], length: int = PREVIEW_LENGTH) -> dict:
+    """Variante AsyncSession de text_previews"""
+    hashes = {digest for digest in hashes if digest}
+    if not hashes:
+        return {}
+    return {
+        digest: format_preview(text, byte_size)
+        for digest, text, byte_size in await db.execute(_text_previews_query(hashes, length))
+    }
+
+
+def variant_previews(db: Session, variant_ids: Iterable[int], length: Optional[int] = PREVIEW_LENGTH) -> dict:
+    """{id de variante: aperçu (texte complet si length est None)} en une requête"""
+    variant_ids = {variant_id for variant_id in variant_ids if variant_id}
+    if not variant_ids:
+        return {}
+    text = models.TextBlob.content if length is None else func.substr(models.TextBlob.content, 1, length)
+    rows = db.execute(
+        select(models.GeneratedContent.id, text, models.TextBlob.byte_size)
+        .join(models.TextBlob, models.TextBlob.hash == models.GeneratedContent.polished_text_hash)
+        .where(models.GeneratedContent.id.in_(variant_ids))
+    )
+    return {variant_id: format_preview(value, byte_size) for variant_id, value, byte_size in rows}
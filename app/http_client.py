@@ -0,0 +1,251 @@
+"""
+Couche HTTP sortante partagée (Groq, Google, Stripe, Brevo, scraping)
+
+Un seul jeu de pools de connexions keep-alive pour toutes les intégrations,
+démarré et arrêté par le lifespan de l'application (app.main). Les scripts
+(cron, CLI) peuvent aussi l'utiliser : les clients sont créés à la demande.
+"""
+import os
+import threading
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Timeouts (secondes)
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "60"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+
+# Limites des pools
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "20"))
+HTTP_MAX_HOSTS = int(os.getenv("HTTP_MAX_HOSTS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+
+_lock = threading.Lock()
+_httpx_client = None
+_async_httpx_client = None
+_requests_session = None
+_groq_client = None
+_async_groq_client = None
+_brevo_api_client = None
+
+# Compteurs du client httpx (Groq) alimentés par l'extension "trace" de httpcore
+_httpx_stats = {
+    "requests": 0,
+    "new_connections": 0,
+    "tls_handshakes": 0
+}
+
+
+def _count(key: str):
+    with _lock:
+        _httpx_stats[key] += 1
+
+
+def _trace(event_name: str, info: dict):
+    """Callback httpcore : compte les nouvelles connexions et handshakes TLS"""
+    if event_name == "connection.connect_tcp.complete":
+        _count("new_connections")
+    elif event_name == "connection.start_tls.complete":
+        _count("tls_handshakes")
+
+
+def _on_request(request: httpx.Request):
+    _count("requests")
+    request.extensions["trace"] = _trace
+
+
+async def _async_trace(event_name: str, info: dict):
+    _trace(event_name, info)
+
+
+async def _on_async_request(request: httpx.Request):
+    _count("requests")
+    request.extensions["trace"] = _async_trace
+
+
+def _httpx_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS_PER_HOST,
+        max_keepalive_connections=HTTP_MAX_CONNECTIONS_PER_HOST,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+    )
+
+
+def get_httpx_client() -> httpx.Client:
+    """
+    Client httpx partagé (utilisé par le SDK Groq).
+    httpx n'a pas de limite par hôte : le client ne servant qu'à l'API Groq,
+    la limite globale fait office de limite par hôte.
+    """
+    global _httpx_client
+    with _lock:
+        if _httpx_client is None:
+            _httpx_client = httpx.Client(
+                timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+                limits=_httpx_limits(),
+                event_hooks={"request": [_on_request]}
+            )
+        return _httpx_client
+
+
+def get_async_httpx_client() -> httpx.AsyncClient:
+    """Client httpx asynchrone partagé (endpoints async, ex: /ai/*)"""
+    global _async_httpx_client
+    with _lock:
+        if _async_httpx_client is None:
+            _async_httpx_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+                limits=_httpx_limits(),
+                event_hooks={"request": [_on_async_request]}
+            )
+        return _async_httpx_client
+
+
+def get_requests_session() -> requests.Session:
+    """Session requests partagée (scraping, Google OAuth, Stripe)"""
+    global _requests_session
+    with _lock:
+        if _requests_session is None:
+            session = requests.Session()
+            # pool_connections = nombre d'hôtes gardés en cache, pool_maxsize = connexions par hôte
+            adapter = HTTPAdapter(
+                pool_connections=HTTP_MAX_HOSTS,
+                pool_maxsize=HTTP_MAX_CONNECTIONS_PER_HOST,
+                pool_block=False
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _requests_session = session
+        return _requests_session
+
+
+def get_groq_client():
+    """Client Groq branché sur le pool httpx partagé"""
+    global _groq_client
+    if _groq_client is None:
+        from groq import Groq
+        http_client = get_httpx_client()
+        with _lock:
+            if _groq_client is None:
+                _groq_client = Groq(
+                    api_key=os.getenv("GROQ_API_KEY"),
+                    http_client=http_client,
+                    timeout=HTTP_TIMEOUT
+                )
+    return _groq_client
+
+
+def get_async_groq_client():
+    """Client Groq asynchrone : n'occupe pas l'event loop pendant la complétion"""
+    global _async_groq_client
+    if _async_groq_client is None:
+        from groq import AsyncGroq
+        http_client = get_async_httpx_client()
+        with _lock:
+            if _async_groq_client is None:
+                _async_groq_client = AsyncGroq(
+                    api_key=os.getenv("GROQ_API_KEY"),
+                    http_client=http_client,
+                    timeout=HTTP_TIMEOUT
+                )
+    return _async_groq_client
+
+
+def get_brevo_api_client(configuration):
+    """ApiClient Brevo unique (son pool urllib3 est réutilisé entre les envois)"""
+    global _brevo_api_client
+    with _lock:
+        if _brevo_api_client is None:
+            import sib_api_v3_sdk
+            configuration.connection_pool_maxsize = HTTP_MAX_CONNECTIONS_PER_HOST
+            _brevo_api_client = sib_api_v3_sdk.ApiClient(configuration)
+        return _brevo_api_client
+
+
+def _configure_stripe():
+    """Fait passer le SDK Stripe par la session requests partagée"""
+    import stripe
+    stripe.default_http_client = stripe.RequestsClient(
+        timeout=HTTP_TIMEOUT,
+        session=get_requests_session()
+    )
+
+
+def start_http_clients():
+    """Crée les pools au démarrage de l'application"""
+    get_httpx_client()
+    get_requests_session()
+    get_groq_client()
+    get_async_groq_client()
+    _configure_stripe()
+    print(f"🌐 Outbound HTTP pools ready ({HTTP_MAX_CONNECTIONS_PER_HOST} connexions/hôte, timeout {HTTP_TIMEOUT}s)")
+
+
+async def close_http_clients():
+    """Ferme toutes les connexions à l'arrêt de l'application"""
+    global _httpx_client, _async_httpx_client, _requests_session, _groq_client, _async_groq_client, _brevo_api_client
+    with _lock:
+        async_client = _async_httpx_client
+        _async_httpx_client = None
+        _async_groq_client = None
+
+    if async_client is not None:
+        await async_client.aclose()
+
+    with _lock:
+        if _httpx_client is not None:
+            _httpx_client.close()
+        if _requests_session is not None:
+            _requests_session.close()
+        if _brevo_api_client is not None:
+            _brevo_api_client.rest_client.pool_manager.clear()
+
+        _httpx_client = None
+        _requests_session = None
+        _groq_client = None
+        _brevo_api_client = None
+
+
+def _urllib3_pool_stats(pool_manager) -> list:
+    """Statistiques par hôte d'un PoolManager urllib3"""
+    stats = []
+    for key in list(pool_manager.pools.keys()):
+        try:
+            pool = pool_manager.pools[key]
+        except KeyError:
+            continue  # Pool évincé entre-temps
+        stats.append({
+            "host": pool.host,
+            "requests": pool.num_requests,
+            "new_connections": pool.num_connections,
+            "reused": max(pool.num_requests - pool.num_connections, 0),
+            "idle_connections": pool.pool.qsize() if pool.pool else 0
+        })
+    return stats
+
+
+def get_http_metrics() -> dict:
+    """Métriques de réutilisation des connexions pour toutes les intégrations"""
+    with _lock:
+        groq_stats = dict(_httpx_stats)
+        session = _requests_session
+        brevo = _brevo_api_client
+
+    groq_stats["reused"] = max(groq_stats["requests"] - groq_stats["new_connections"], 0)
+    groq_stats["reuse_rate"] = round(groq_stats["reused"] / groq_stats["requests"], 3) if groq_stats["requests"] else None
+
+    return {
+        "groq": groq_stats,
+        "requests_session": _urllib3_pool_stats(session.get_adapter("https://").poolmanager) if session else [],
+        "brevo": _urllib3_pool_stats(brevo.rest_client.pool_manager) if brevo else [],
+        "limits": {
+            "max_connections_per_host": HTTP_MAX_CONNECTIONS_PER_HOST,
+            "max_hosts": HTTP_MAX_HOSTS,
+            "timeout": HTTP_TIMEOUT,
+            "connect_timeout": HTTP_CONNECT_TIMEOUT,
+            "keepalive_expiry": HTTP_KEEPALIVE_EXPIRY
+        }
+    }
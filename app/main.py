@@ -1,6 +1,17 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import engine, Base
+from starlette.background import BackgroundTask
+from app.database import engine, async_engine, replica_engine, async_replica_engine, Base
+from app.http_client import start_http_clients, close_http_clients
+from app.emoji_index import build_emoji_index
+from app.partitioning import ensure_partitions
+from app.responses import FastJSONResponse
+from app.compression import CompressionMiddleware
+from app.query_stats import (
+    instrument_engine, start_request_stats, stop_request_stats, record_route, QUERY_STATS_HEADERS,
+    has_pending_slow_queries, persist_slow_queries
+)
 from app.routers import users, content, analytics, admin, plans, ai, stripe_router, calendar, teams, trial, api_keys, api_v1, onboarding, style_profiles
 
 # Crée les tables (au cas où)
@@ -16,12 +27,58 @@ try:
 except Exception as e:
     print(f"Warning: Could not run migrations: {e}")
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pools HTTP sortants partagés (Groq, Google, Stripe, Brevo)
+    start_http_clients()
+    # Index mot-clé -> emoji de /ai/emojis
+    build_emoji_index()
+    # Partitions mensuelles à venir (aussi créées chaque jour par app/maintain_partitions.py)
+    try:
+        ensure_partitions(engine)
+    except Exception as e:
+        print(f"Warning: Could not create partitions: {e}")
+    yield
+    await close_http_clients()
+    if async_engine is not None:
+        await async_engine.dispose()
+    if async_replica_engine is not None:
+        await async_replica_engine.dispose()
+        replica_engine.dispose()
+
 app = FastAPI(
     title="AI Content Polisher",
     description="API pour transformer du texte en contenu adapté aux réseaux sociaux",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    # Sérialisation orjson pour toutes les routes (app.responses)
+    default_response_class=FastJSONResponse
 )
 
+# Compteurs SQL par requête (nombre, temps BDD, N+1)
+for db_engine in (engine, async_engine, replica_engine, async_replica_engine):
+    instrument_engine(getattr(db_engine, "sync_engine", db_engine))
+
+@app.middleware("http")
+async def query_stats_middleware(request: Request, call_next):
+    stats, token = start_request_stats()
+    try:
+        response = await call_next(request)
+    finally:
+        stop_request_stats(token)
+
+    route = request.scope.get("route")
+    record_route(f"{request.method} {route.path}" if route else "unmatched", stats)
+
+    if QUERY_STATS_HEADERS:
+        response.headers["X-DB-Query-Count"] = str(stats.count)
+        response.headers["X-DB-Time-Ms"] = f"{stats.total_ms:.1f}"
+
+    # Requêtes lentes écrites en table après l'envoi de la réponse
+    if has_pending_slow_queries() and response.background is None:
+        response.background = BackgroundTask(persist_slow_queries)
+    return response
+
 # CORS pour permettre les requêtes depuis le frontend
 app.add_middleware(
     CORSMiddleware,
@@ -37,6 +94,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compression gzip / brotli négociée (ajoutée en dernier : enveloppe toutes les réponses)
+app.add_middleware(CompressionMiddleware)
+
 # Inclusion des routers
 app.include_router(users.router)
 app.include_router(content.router)
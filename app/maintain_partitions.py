@@ -0,0 +1,46 @@
+"""
+Maintenance des tables partitionnées (content_requests, generated_contents)
+À exécuter une fois par jour via cron :
+- crée les partitions des prochains mois
+- supprime l'historique expiré des plans limités (plan gratuit : 7 jours)
+- supprime les textes dédupliqués qui ne sont plus référencés
+- supprime les fichiers d'export en masse expirés
+
+Usage: python app/maintain_partitions.py [--dry-run]
+"""
+import os
+import sys
+
+# Add parent directory to path to import app modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import engine, SessionLocal
+from app.partitioning import ensure_partitions, purge_expired_history
+from app.text_store import collect_unreferenced_texts
+from app.bulk_export import purge_expired_exports
+from app.query_stats import job_query_stats
+
+
+def maintain_partitions(dry_run: bool = False):
+    try:
+        with job_query_stats("maintain_partitions"):
+            ensure_partitions(engine)
+            purge_expired_history(engine, dry_run=dry_run)
+            if not dry_run:
+                collect_unreferenced_texts(engine)
+                db = SessionLocal()
+                try:
+                    purge_expired_exports(db)
+                finally:
+                    db.close()
+    except Exception as e:
+        print(f"❌ Erreur lors de la maintenance des partitions: {e}")
+        import traceback
+        traceback.print_exc()
+
+
+if __name__ == "__main__":
+    print("="*60)
+    print("🗂️ Maintenance des partitions et rétention de l'historique")
+    print("="*60)
+    maintain_partitions(dry_run="--dry-run" in sys.argv)
@@ -1,8 +1,11 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Enum, Float, Boolean
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, ForeignKey, Enum, Float, Boolean, Index, LargeBinary, Computed, select
+from sqlalchemy.orm import relationship, deferred
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.ext.hybrid import hybrid_property
 from datetime import datetime
 import enum
 from app.database import Base
+from app.text_store import stage_text, staged_text
 
 class SubscriptionTier(str, enum.Enum):
     free = "free"
@@ -32,6 +35,8 @@ class User(Base):
     plan_started_at = Column(DateTime, default=datetime.utcnow)
     credits_remaining = Column(Integer, default=10)
     last_credit_renewal = Column(DateTime, default=datetime.utcnow)  # Dernière date de renouvellement des crédits
+    partial_credit_units = Column(BigInteger, default=0, nullable=False)  # Fraction de crédit due (régénérations partielles), en 1/CREDIT_UNITS
+    last_write_at = Column(DateTime, nullable=True)  # Dernière génération (routage lecture primaire/réplique)
     email_verified = Column(Integer, default=0)  # 0 = non vérifié, 1 = vérifié
     verification_code = Column(String, nullable=True)  # Code à 6 chiffres
     verification_code_expires = Column(DateTime, nullable=True)  # Expiration du code
@@ -50,31 +55,138 @@ class User(Base):
     content_requests = relationship("ContentRequest", back_populates="user")
     usage_analytics = relationship("UsageAnalytics", back_populates="user")
 
+class TextBlob(Base):
+    """Texte stocké une seule fois, adressé par son SHA-256 (voir app.text_store)"""
+    __tablename__ = "text_blobs"
+
+    hash = Column(String(64), primary_key=True)
+    content = Column(Text, nullable=False)
+    byte_size = Column(Integer, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_used_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    # Recherche plein texte (app.search) : un vecteur par configuration de langue, jamais chargés par l'ORM
+    search_french = deferred(Column(TSVECTOR, Computed("to_tsvector('french'::regconfig, content)", persisted=True)))
+    search_english = deferred(Column(TSVECTOR, Computed("to_tsvector('english'::regconfig, content)", persisted=True)))
+    search_spanish = deferred(Column(TSVECTOR, Computed("to_tsvector('spanish'::regconfig, content)", persisted=True)))
+
+    __table_args__ = (
+        Index("ix_text_blobs_search_french", "search_french", postgresql_using="gin"),
+        Index("ix_text_blobs_search_english", "search_english", postgresql_using="gin"),
+        Index("ix_text_blobs_search_spanish", "search_spanish", postgresql_using="gin"),
+    )
+
 class ContentRequest(Base):
     __tablename__ = "content_requests"
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    original_text = Column(Text, nullable=False)
+    original_text_hash = Column(String(64), ForeignKey("text_blobs.hash"), nullable=False, index=True)  # Texte dédupliqué (app.text_store)
     platform = Column(String, nullable=False)
     tone = Column(String)  # casual, professional, engaging, etc.
     language = Column(String, default="fr")  # fr, en, es
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, primary_key=True, default=datetime.utcnow)  # Clé de partition (mensuelle)
     
     user = relationship("User", back_populates="content_requests")
-    generated_contents = relationship("GeneratedContent", back_populates="request")
+    # Texte chargé à la demande : joinedload(original_blob) là où il est lu
+    original_blob = relationship("TextBlob", innerjoin=True)
+    # Pas de FK possible vers une table partitionnée sans la clé de partition : jointure explicite
+    generated_contents = relationship(
+        "GeneratedContent",
+        primaryjoin="ContentRequest.id == foreign(GeneratedContent.request_id)",
+        back_populates="request"
+    )
+
+    __table_args__ = (
+        Index("ix_content_requests_user_id_created_at", "user_id", "created_at"),  # Historique, analytics
+        {"postgresql_partition_by": "RANGE (created_at)"},  # Partitions créées par app.partitioning
+    )
+
+    @hybrid_property
+    def original_text(self):
+        staged = staged_text(self, "original_text_hash")
+        if staged is not None:
+            return staged
+        return self.original_blob.content if self.original_blob else None
+
+    @original_text.setter
+    def original_text(self, value):
+        self.original_text_hash = stage_text(self, "original_text_hash", value)
+
+    @original_text.expression
+    def original_text(cls):
+        return select(TextBlob.content).where(TextBlob.hash == cls.original_text_hash).scalar_subquery()
 
 class GeneratedContent(Base):
     __tablename__ = "generated_contents"
 
-    id = Column(Integer, primary_key=True, index=True)
-    request_id = Column(Integer, ForeignKey("content_requests.id"), nullable=False)
-    polished_text = Column(Text, nullable=False)
+    id = Column(Integer, primary_key=True, autoincrement=True, index=True)
+    request_id = Column(Integer, nullable=False)  # content_requests.id (intégrité assurée par l'application)
+    polished_text_hash = Column(String(64), ForeignKey("text_blobs.hash"), nullable=False, index=True)  # Texte dédupliqué (app.text_store)
     format_name = Column(String, nullable=True)  # linkedin, instagram, tiktok, etc.
     variant_number = Column(Integer, default=1)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, primary_key=True, default=datetime.utcnow)  # Clé de partition, jamais antérieure à celle de la requête
+
+    request = relationship(
+        "ContentRequest",
+        primaryjoin="foreign(GeneratedContent.request_id) == ContentRequest.id",
+        back_populates="generated_contents"
+    )
+    # Texte chargé à la demande : joinedload(polished_blob) là où il est lu
+    polished_blob = relationship("TextBlob", innerjoin=True)
+
+    __table_args__ = (
+        Index("ix_generated_contents_request_id", "request_id"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+    @hybrid_property
+    def polished_text(self):
+        staged = staged_text(self, "polished_text_hash")
+        if staged is not None:
+            return staged
+        return self.polished_blob.content if self.polished_blob else None
+
+    @polished_text.setter
+    def polished_text(self, value):
+        self.polished_text_hash = stage_text(self, "polished_text_hash", value)
+
+    @polished_text.expression
+    def polished_text(cls):
+        return select(TextBlob.content).where(TextBlob.hash == cls.polished_text_hash).scalar_subquery()
+
+class ContentArchive(Base):
+    """Variantes archivées d'une requête (voir app.content_archive)"""
+    __tablename__ = "content_archives"
+
+    request_id = Column(Integer, primary_key=True, autoincrement=False)  # content_requests.id
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    request_created_at = Column(DateTime, nullable=False)  # Rétention par plan
+    payload = Column(LargeBinary, nullable=False)  # JSON des variantes compressé (zlib)
+    variants_count = Column(Integer, nullable=False)
+    original_size = Column(Integer, nullable=False)  # Octets de texte avant compression
+    compressed_size = Column(Integer, nullable=False)
+    archived_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+class ExportJob(Base):
+    """Export en masse exécuté en tâche de fond (voir app.bulk_export)"""
+    __tablename__ = "export_jobs"
 
-    request = relationship("ContentRequest", back_populates="generated_contents")
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    format = Column(String, nullable=False)  # ndjson, csv, zip
+    include_team = Column(Boolean, default=True, nullable=False)
+    date_from = Column(DateTime, nullable=True)
+    date_to = Column(DateTime, nullable=True)
+    cursor = Column(String, nullable=True)  # Reprise d'un export interrompu
+    status = Column(String, default="pending", nullable=False)  # pending, running, ready, failed, expired
+    requests_count = Column(Integer, nullable=True)
+    file_path = Column(String, nullable=True)
+    file_size = Column(BigInteger, nullable=True)
+    error_message = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    completed_at = Column(DateTime, nullable=True)
+    expires_at = Column(DateTime, nullable=True)
 
 class UsageAnalytics(Base):
     __tablename__ = "usage_analytics"
@@ -87,13 +199,17 @@ class UsageAnalytics(Base):
 
     user = relationship("User", back_populates="usage_analytics")
 
+    __table_args__ = (
+        Index("ix_usage_analytics_user_id_request_date", "user_id", "request_date"),
+    )
+
 class ScheduledContent(Base):
     __tablename__ = "scheduled_contents"
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    content_request_id = Column(Integer, ForeignKey("content_requests.id"), nullable=True)
-    generated_content_id = Column(Integer, ForeignKey("generated_contents.id"), nullable=True)
+    content_request_id = Column(Integer, nullable=True)  # content_requests.id (table partitionnée, pas de FK)
+    generated_content_id = Column(Integer, nullable=True)  # generated_contents.id (table partitionnée, pas de FK)
     scheduled_date = Column(DateTime, nullable=False)
     platform = Column(String, nullable=False)  # linkedin, instagram, etc.
     status = Column(String, default="scheduled")  # scheduled, published, cancelled
@@ -108,6 +224,12 @@ class ScheduledContent(Base):
     reminder_24h_sent_at = Column(DateTime, nullable=True)
     reminder_1h_sent_at = Column(DateTime, nullable=True)
 
+    __table_args__ = (
+        Index("ix_scheduled_contents_user_id_scheduled_date", "user_id", "scheduled_date"),  # Calendrier
+        Index("ix_scheduled_contents_reminder_24h", "status", "reminder_24h_sent", "scheduled_date"),  # Rappels
+        Index("ix_scheduled_contents_reminder_1h", "status", "reminder_1h_sent", "scheduled_date"),
+    )
+
 class Team(Base):
     __tablename__ = "teams"
 
@@ -117,6 +239,7 @@ class Team(Base):
     plan = Column(String, nullable=False)  # pro, business
     max_members = Column(Integer, default=2)  # 2 for Pro, 5 for Business
     team_credits = Column(Integer, default=0)  # Shared team credits pool
+    partial_credit_units = Column(BigInteger, default=0, nullable=False)  # Fractional credit owed by partial regenerations, in 1/CREDIT_UNITS
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -130,6 +253,10 @@ class TeamMember(Base):
     status = Column(String, default="active")  # active, pending, removed
     joined_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        Index("ix_team_members_user_id_status", "user_id", "status"),  # get_effective_plan / get_user_team
+    )
+
 class TeamInvitation(Base):
     __tablename__ = "team_invitations"
 
@@ -194,4 +321,16 @@ class UserStyleProfile(Base):
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
-    user = relationship("User")
\ No newline at end of file
+    user = relationship("User")
+
+class SlowQueryLog(Base):
+    __tablename__ = "slow_query_logs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    fingerprint = Column(Text, nullable=False)  # Requête normalisée (valeurs remplacées par ?)
+    statement = Column(Text, nullable=False)  # Requête d'exemple (tronquée)
+    duration_ms = Column(Float, nullable=False)
+    row_count = Column(Integer, nullable=True)  # -1 si le driver ne le fournit pas
+    route = Column(String, nullable=True)  # ex: "GET /admin/stats"
+    plan = Column(String, nullable=True)  # Plan de l'utilisateur authentifié
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
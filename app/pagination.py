@@ -0,0 +1,106 @@
+"""
+Pagination par curseur (keyset) des historiques
+
+Le curseur est opaque pour le client : (created_at, id) du dernier élément
+de la page, encodé en base64 URL-safe. La page suivante filtre
+created_at <= c AND (created_at < c OR id < i) au lieu de sauter N lignes :
+le coût d'une page ne dépend plus de sa profondeur (index user_id, created_at).
+
+Le total, optionnel, est mis en cache COUNT_CACHE_TTL_SECONDS par périmètre
+(utilisateur ou équipe + filtres) et recalculé si l'utilisateur a écrit
+depuis le calcul (User.last_write_at).
+"""
+import base64
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Optional
+from fastapi import HTTPException, status
+from sqlalchemy import and_, or_, select, func
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Durée de vie (secondes) d'un total mis en cache
+COUNT_CACHE_TTL_SECONDS = int(os.getenv("COUNT_CACHE_TTL_SECONDS", "60"))
+# Nombre maximum de totaux gardés en mémoire
+COUNT_CACHE_MAX_ENTRIES = int(os.getenv("COUNT_CACHE_MAX_ENTRIES", "10000"))
+
+_lock = threading.Lock()
+_counts = {}  # clé -> (total, calculé à (datetime UTC), calculé à (monotonic))
+
+
+def encode_cursor(created_at: datetime, item_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), item_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """Retourne (created_at, id) ; 400 si le curseur est invalide"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, item_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(item_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def apply_keyset(query, created_column, id_column, cursor: Optional[str], descending: bool = True):
+    """Tri du plus récent au plus ancien (ou l'inverse), à partir du curseur s'il est fourni"""
+    if cursor:
+        created_at, item_id = decode_cursor(cursor)
+        # Forme dépliée de (created_at, id) < (c, i) : la borne created_at <= c reste utilisable par l'index
+        if descending:
+            query = query.where(and_(
+                created_column <= created_at,
+                or_(created_column < created_at, id_column < item_id)
+            ))
+        else:
+            query = query.where(and_(
+                created_column >= created_at,
+                or_(created_column > created_at, id_column > item_id)
+            ))
+    if descending:
+        return query.order_by(created_column.desc(), id_column.desc())
+    return query.order_by(created_column, id_column)
+
+
+def split_page(rows: list, limit: int, cursor_of):
+    """
+    rows : résultats lus avec limit + 1. Retourne (page, next_cursor) ;
+    next_cursor est None sur la dernière page. cursor_of(row) -> (created_at, id).
+    """
+    if limit <= 0:
+        return [], None
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    return page, encode_cursor(*cursor_of(page[-1]))
+
+
+async def cached_count(db, key: tuple, query, last_write_at: Optional[datetime] = None) -> int:
+    """Total de query (sans tri ni limite), servi depuis le cache tant qu'il est frais"""
+    now = time.monotonic()
+    with _lock:
+        cached = _counts.get(key)
+    if cached:
+        total, computed_at, computed_monotonic = cached
+        if now - computed_monotonic < COUNT_CACHE_TTL_SECONDS and not (last_write_at and last_write_at >= computed_at):
+            return total
+
+    computed_at = datetime.utcnow()
+    total = (await db.execute(select(func.count()).select_from(query.subquery()))).scalar()
+    with _lock:
+        if len(_counts) >= COUNT_CACHE_MAX_ENTRIES:
+            # Purge des entrées expirées, sinon remise à zéro
+            for stale_key in [k for k, v in _counts.items() if now - v[2] >= COUNT_CACHE_TTL_SECONDS]:
+                del _counts[stale_key]
+            if len(_counts) >= COUNT_CACHE_MAX_ENTRIES:
+                _counts.clear()
+        _counts[key] = (total, computed_at, now)
+    return total
@@ -0,0 +1,210 @@
+"""
+Partitionnement mensuel de content_requests / generated_contents et rétention par plan
+
+Les deux tables sont partitionnées par RANGE (created_at), une partition par
+mois (ex: content_requests_y2026m10) plus une partition DEFAULT de secours.
+ensure_partitions() crée les partitions des PARTITION_MONTHS_AHEAD prochains
+mois (au démarrage et via maintain_partitions.py), en y déplaçant les lignes
+déjà tombées dans DEFAULT pour ce mois ; purge_expired_history()
+supprime, partition par partition, l'historique des plans à history_days
+limité (plan gratuit : 7 jours).
+
+Les requêtes doivent filtrer sur created_at avec des bornes explicites pour
+que PostgreSQL n'examine que les partitions utiles.
+"""
+import os
+import re
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import text
+from dotenv import load_dotenv
+from app.plan_config import PLAN_CONFIG, get_history_cutoff
+
+load_dotenv()
+
+PARTITIONED_TABLES = ("content_requests", "generated_contents")
+# Nombre de mois futurs pour lesquels une partition existe toujours
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+
+_BOUND_RE = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+def month_start(value: datetime) -> datetime:
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(value: datetime, months: int) -> datetime:
+    year, month = divmod(value.month - 1 + months, 12)
+    return datetime(value.year + year, month + 1, 1)
+
+
+def partition_name(table: str, lower: datetime) -> str:
+    return f"{table}_y{lower:%Y}m{lower:%m}"
+
+
+def create_partition_sql(table: str, lower: datetime) -> str:
+    upper = add_months(lower, 1)
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(table, lower)} PARTITION OF {table} "
+        f"FOR VALUES FROM ('{lower:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')"
+    )
+
+
+def is_partitioned(conn, table: str) -> bool:
+    return conn.execute(text(
+        "SELECT 1 FROM pg_partitioned_table pt JOIN pg_class c ON c.oid = pt.partrelid WHERE c.relname = :table"
+    ), {"table": table}).first() is not None
+
+
+def list_partitions(conn, table: str) -> list:
+    """
+    [(nom, borne basse, borne haute)] ; bornes à None pour la partition DEFAULT.
+    Une table non partitionnée est vue comme une partition unique sans bornes.
+    """
+    if not is_partitioned(conn, table):
+        return [(table, None, None)]
+
+    rows = conn.execute(text(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :table ORDER BY c.relname"
+    ), {"table": table}).all()
+
+    partitions = []
+    for name, bound in rows:
+        match = _BOUND_RE.search(bound or "")
+        if match:
+            partitions.append((name, datetime.fromisoformat(match.group(1)), datetime.fromisoformat(match.group(2))))
+        else:
+            partitions.append((name, None, None))
+    return partitions
+
+
+def _column_list(conn, table: str) -> str:
+    return conn.execute(text(
+        "SELECT string_agg(quote_ident(attname), ', ' ORDER BY attnum) FROM pg_attribute "
+        "WHERE attrelid = CAST(:table AS regclass) AND attnum > 0 AND NOT attisdropped"
+    ), {"table": table}).scalar()
+
+
+def create_partition(conn, table: str, lower: datetime) -> int:
+    """
+    Crée la partition du mois commençant à lower, dans la transaction de l'appelant.
+    PostgreSQL refuse de la créer si la partition DEFAULT contient déjà des lignes
+    de ce mois : DEFAULT est alors détachée, la partition créée, les lignes
+    déplacées, puis DEFAULT rattachée. Retourne le nombre de lignes déplacées.
+    """
+    default = f"{table}_default"
+    bounds = {"lower": lower, "upper": add_months(lower, 1)}
+    in_range = "created_at >= :lower AND created_at < :upper"
+
+    has_default = conn.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": default}).scalar()
+    if not has_default or not conn.execute(text(f"SELECT EXISTS (SELECT 1 FROM {default} WHERE {in_range})"), bounds).scalar():
+        conn.execute(text(create_partition_sql(table, lower)))
+        return 0
+
+    columns = _column_list(conn, table)
+    conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {default}"))
+    conn.execute(text(create_partition_sql(table, lower)))
+    moved = conn.execute(text(
+        f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {default} WHERE {in_range}"
+    ), bounds).rowcount
+    conn.execute(text(f"DELETE FROM {default} WHERE {in_range}"), bounds)
+    conn.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {default} DEFAULT"))
+    print(f"🗂️ {moved} ligne(s) déplacée(s) de {default} vers {partition_name(table, lower)}")
+    return moved
+
+
+def ensure_partitions(engine, months_ahead: int = PARTITION_MONTHS_AHEAD, now: Optional[datetime] = None) -> list:
+    """
+    Crée les partitions manquantes du mois courant et des mois suivants
+    (create_partition : lignes déjà dans DEFAULT déplacées) ; retourne leurs noms.
+    Tout est fait en une transaction : en cas d'échec, rien n'est créé et l'erreur remonte.
+    """
+    start = month_start(now or datetime.utcnow())
+    created = []
+
+    with engine.begin() as conn:
+        for table in PARTITIONED_TABLES:
+            if not is_partitioned(conn, table):
+                continue
+            existing = {name for name, _, _ in list_partitions(conn, table)}
+            if f"{table}_default" not in existing:
+                conn.execute(text(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT"))
+                created.append(f"{table}_default")
+            for offset in range(months_ahead + 1):
+                lower = add_months(start, offset)
+                if partition_name(table, lower) not in existing:
+                    create_partition(conn, table, lower)
+                    created.append(partition_name(table, lower))
+
+    if created:
+        print(f"🗂️ Partitions créées: {', '.join(created)}")
+    return created
+
+
+# Utilisateurs du plan, hors membres actifs d'une équipe (qui ont le plan de l'équipe)
+_EXPIRED_OWNER_SQL = (
+    "u.current_plan = :plan AND NOT EXISTS ("
+    "SELECT 1 FROM team_members tm WHERE tm.user_id = u.id AND tm.status = 'active')"
+)
+
+
+def purge_expired_history(engine, now: Optional[datetime] = None, dry_run: bool = False) -> dict:
+    """
+    Supprime l'historique expiré des plans à history_days limité, une partition
+    à la fois (un commit par partition). Les partitions entièrement plus
+    récentes que la date limite ne sont pas touchées. Le contenu référencé par
+    le calendrier est conservé.
+    Retourne {table: lignes supprimées} ; dry_run annule tout à la fin.
+    """
+    now = now or datetime.utcnow()
+    deleted = {table: 0 for table in PARTITIONED_TABLES + ("content_archives",)}
+
+    with engine.connect() as conn:
+        for plan in PLAN_CONFIG:
+            cutoff = get_history_cutoff(plan, now)
+            if cutoff is None:
+                continue
+            params = {"plan": plan, "cutoff": cutoff}
+
+            # Variantes d'abord : une requête n'est supprimée que si plus aucune variante ne la référence
+            for name, lower, _ in list_partitions(conn, "generated_contents"):
+                if lower is not None and lower >= cutoff:
+                    continue
+                deleted["generated_contents"] += conn.execute(text(
+                    f"DELETE FROM {name} g USING content_requests r, users u "
+                    f"WHERE g.request_id = r.id AND r.user_id = u.id AND {_EXPIRED_OWNER_SQL} "
+                    "AND g.created_at < :cutoff AND r.created_at < :cutoff "
+                    "AND NOT EXISTS (SELECT 1 FROM scheduled_contents s WHERE s.generated_content_id = g.id)"
+                ), params).rowcount
+                if not dry_run:
+                    conn.commit()
+
+            for name, lower, _ in list_partitions(conn, "content_requests"):
+                if lower is not None and lower >= cutoff:
+                    continue
+                deleted["content_requests"] += conn.execute(text(
+                    f"DELETE FROM {name} r USING users u "
+                    f"WHERE r.user_id = u.id AND {_EXPIRED_OWNER_SQL} AND r.created_at < :cutoff "
+                    "AND NOT EXISTS (SELECT 1 FROM generated_contents g "
+                    "WHERE g.request_id = r.id AND g.created_at >= r.created_at) "
+                    "AND NOT EXISTS (SELECT 1 FROM scheduled_contents s WHERE s.content_request_id = r.id)"
+                ), params).rowcount
+                if not dry_run:
+                    conn.commit()
+
+            # Variantes archivées à froid (app.content_archive) des mêmes requêtes
+            deleted["content_archives"] += conn.execute(text(
+                f"DELETE FROM content_archives a USING users u "
+                f"WHERE a.user_id = u.id AND {_EXPIRED_OWNER_SQL} AND a.request_created_at < :cutoff"
+            ), params).rowcount
+            if not dry_run:
+                conn.commit()
+
+        conn.rollback()
+
+    print(f"🧹 Rétention{' (simulation)' if dry_run else ''}: "
+          f"{deleted['content_requests']} requête(s), {deleted['generated_contents']} variante(s), "
+          f"{deleted['content_archives']} archive(s)")
+    return deleted
@@ -1,6 +1,8 @@
 """
 Configuration centralisée des plans et leurs fonctionnalités
 """
+from datetime import datetime, timedelta
+from typing import Optional
 
 PLAN_CONFIG = {
     'free': {
@@ -137,6 +139,14 @@ def get_plan_config(plan_name: str) -> dict:
     plan_name = PLAN_MAPPING.get(plan_name, plan_name)
     return PLAN_CONFIG.get(plan_name, PLAN_CONFIG['free'])
 
+def get_history_cutoff(plan_name: str, now: Optional[datetime] = None) -> Optional[datetime]:
+    """Date avant laquelle l'historique n'est plus visible pour ce plan (None = illimité)"""
+    # Plan inconnu : pas de limite (la rétention supprime des données, on reste prudent)
+    days = PLAN_CONFIG.get(PLAN_MAPPING.get(plan_name, plan_name), {}).get('history_days')
+    if not days:
+        return None
+    return (now or datetime.utcnow()) - timedelta(days=days)
+
 def get_plan_credits(plan_name: str) -> int:
     """Récupère le nombre de crédits d'un plan"""
     config = get_plan_config(plan_name)
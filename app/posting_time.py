@@ -0,0 +1,346 @@
+"""
+Moteur de recommandation des meilleurs créneaux de publication
+
+Combine les tendances de chaque plateforme avec l'activité propre de
+l'utilisateur (horodatage des ContentRequest, dates et statuts des
+ScheduledContent). Les histogrammes sont chargés une fois par utilisateur,
+mis à jour incrémentalement à chaque nouvel événement, et les
+recommandations par (plateforme, fuseau) sont précalculées dans le profil :
+la lecture est un simple accès au cache. Les profils expirent après
+PROFILE_TTL_SECONDS et les moins récemment utilisés sont évincés au-delà de
+POSTING_TIME_CACHE_MAX_USERS.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from sqlalchemy import func, extract
+from sqlalchemy.orm import Session
+from dotenv import load_dotenv
+from app import models
+
+load_dotenv()
+
+HOURS_PER_WEEK = 168
+DAY_NAMES = ["Lundi", "Mardi", "Mercredi", "Jeudi", "Vendredi", "Samedi", "Dimanche"]
+
+# Profil rechargé depuis la BDD après ce délai (mises à jour faites par d'autres workers)
+PROFILE_TTL_SECONDS = 3600
+# Profils gardés en mémoire par worker (LRU)
+POSTING_TIME_CACHE_MAX_USERS = int(os.getenv("POSTING_TIME_CACHE_MAX_USERS", "10000"))
+# Historique pris en compte
+HISTORY_DAYS = 180
+# Nombre de points de données pour lequel l'activité perso pèse autant que la tendance plateforme
+PERSONALIZATION_PRIOR = 20
+
+# Poids des signaux utilisateur
+SIGNAL_WEIGHTS = {
+    "published": 3.0,   # Contenu effectivement publié à ce créneau
+    "scheduled": 1.0,   # Contenu planifié à ce créneau
+    "cancelled": -1.0,  # Créneau abandonné
+    "request": 0.5,     # Création de contenu pour cette plateforme
+    "request_any": 0.25  # Création de contenu multi-format
+}
+
+# Tendances par plateforme (heure locale de l'audience)
+PLATFORM_BASELINES = {
+    "linkedin": {
+        "best_time": "Mardi-Jeudi, 9h-11h",
+        "reason": "Activité maximale des professionnels pendant les heures de travail",
+        "peak_days": ["Mardi", "Mercredi", "Jeudi"],
+        "hours": (9, 11)
+    },
+    "twitter": {
+        "best_time": "Lundi-Vendredi, 12h-13h",
+        "reason": "Pic d'engagement pendant la pause déjeuner",
+        "peak_days": ["Lundi", "Mercredi", "Vendredi"],
+        "hours": (12, 13)
+    },
+    "facebook": {
+        "best_time": "Mercredi-Vendredi, 13h-16h",
+        "reason": "Engagement élevé en milieu d'après-midi",
+        "peak_days": ["Mercredi", "Jeudi", "Vendredi"],
+        "hours": (13, 16)
+    },
+    "instagram": {
+        "best_time": "Lundi-Vendredi, 11h-14h",
+        "reason": "Activité maximale pendant et après le déjeuner",
+        "peak_days": ["Lundi", "Mercredi", "Vendredi"],
+        "hours": (11, 14)
+    },
+    "tiktok": {
+        "best_time": "Mardi-Jeudi, 18h-22h",
+        "reason": "Pic d'engagement en soirée",
+        "peak_days": ["Mardi", "Jeudi", "Samedi"],
+        "hours": (18, 22)
+    },
+    "youtube": {
+        "best_time": "Jeudi-Samedi, 14h-16h",
+        "reason": "Meilleur moment pour les vidéos longue durée",
+        "peak_days": ["Jeudi", "Vendredi", "Samedi"],
+        "hours": (14, 16)
+    }
+}
+DEFAULT_PLATFORM = "linkedin"
+
+# Clé des histogrammes pour les contenus multi-format (valent pour toutes les plateformes)
+ANY_PLATFORM = "*"
+
+
+def _baseline_weights(platform: str) -> list:
+    """Poids 0-1 par heure de la semaine (heure locale, lundi 0h = index 0)"""
+    config = PLATFORM_BASELINES[platform]
+    start, end = config["hours"]
+    peak_days = {DAY_NAMES.index(day) for day in config["peak_days"]}
+
+    weights = []
+    for bucket in range(HOURS_PER_WEEK):
+        day, hour = divmod(bucket, 24)
+        weight = 0.05 if hour < 7 or hour >= 23 else 0.25
+        if start <= hour < end:
+            weight += 0.6
+        if day in peak_days:
+            weight *= 1.5
+        weights.append(weight)
+
+    peak = max(weights)
+    return [w / peak for w in weights]
+
+
+BASELINE_WEIGHTS = {platform: _baseline_weights(platform) for platform in PLATFORM_BASELINES}
+
+
+class _UserProfile:
+    """Histogrammes UTC (168 cases) par plateforme et type de signal"""
+
+    def __init__(self):
+        self.histograms = {}
+        self.data_points = {}
+        # (plateforme, fuseau) -> recommandation précalculée
+        self.recommendations = {}
+        self.loaded_at = time.monotonic()
+
+    def expired(self) -> bool:
+        return time.monotonic() - self.loaded_at >= PROFILE_TTL_SECONDS
+
+    def add(self, platform: str, kind: str, bucket: int, count: float = 1):
+        histogram = self.histograms.setdefault((platform, kind), [0.0] * HOURS_PER_WEEK)
+        histogram[bucket] = max(0.0, histogram[bucket] + count)
+        self.data_points[platform] = max(0, self.data_points.get(platform, 0) + count)
+
+
+_lock = threading.Lock()
+# user_id -> _UserProfile, du moins au plus récemment utilisé
+_profiles = OrderedDict()
+
+
+def _cached_profile(user_id: int) -> Optional[_UserProfile]:
+    """Profil encore frais, marqué comme le plus récemment utilisé (appelé sous _lock)"""
+    profile = _profiles.get(user_id)
+    if profile is None:
+        return None
+    if profile.expired():
+        del _profiles[user_id]
+        return None
+    _profiles.move_to_end(user_id)
+    return profile
+
+
+def _store_profile(user_id: int, profile: _UserProfile):
+    """Ajoute le profil et évince les moins récemment utilisés (appelé sous _lock)"""
+    _profiles[user_id] = profile
+    _profiles.move_to_end(user_id)
+    while len(_profiles) > POSTING_TIME_CACHE_MAX_USERS:
+        _profiles.popitem(last=False)
+
+
+def _utc_bucket(dt: datetime) -> int:
+    """Case horaire UTC d'une date naïve (stockée en UTC) ou aware"""
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(ZoneInfo("UTC")).replace(tzinfo=None)
+    return dt.weekday() * 24 + dt.hour
+
+
+def _normalize_platform(platform: Optional[str]) -> str:
+    platform = (platform or "").lower()
+    if platform == "multi_format":
+        return ANY_PLATFORM
+    return platform
+
+
+def get_timezone(name: str) -> ZoneInfo:
+    """Résout un nom de fuseau IANA (ValueError si inconnu)"""
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Fuseau horaire inconnu: {name}")
+
+
+def _load_profile(db: Session, user_id: int) -> _UserProfile:
+    """Construit les histogrammes d'un utilisateur avec deux requêtes agrégées"""
+    profile = _UserProfile()
+    since = datetime.utcnow() - timedelta(days=HISTORY_DAYS)
+
+    # extract('dow') : 0 = dimanche -> converti en 0 = lundi
+    request_rows = db.query(
+        models.ContentRequest.platform,
+        extract('dow', models.ContentRequest.created_at).label('dow'),
+        extract('hour', models.ContentRequest.created_at).label('hour'),
+        func.count(models.ContentRequest.id).label('count')
+    ).filter(
+        models.ContentRequest.user_id == user_id,
+        models.ContentRequest.created_at >= since
+    ).group_by('platform', 'dow', 'hour').all()
+
+    for row in request_rows:
+        bucket = ((int(row.dow) + 6) % 7) * 24 + int(row.hour)
+        platform = _normalize_platform(row.platform)
+        profile.add(platform, "request_any" if platform == ANY_PLATFORM else "request", bucket, row.count)
+
+    scheduled_rows = db.query(
+        models.ScheduledContent.platform,
+        models.ScheduledContent.status,
+        extract('dow', models.ScheduledContent.scheduled_date).label('dow'),
+        extract('hour', models.ScheduledContent.scheduled_date).label('hour'),
+        func.count(models.ScheduledContent.id).label('count')
+    ).filter(
+        models.ScheduledContent.user_id == user_id,
+        models.ScheduledContent.scheduled_date >= since
+    ).group_by('platform', 'status', 'dow', 'hour').all()
+
+    for row in scheduled_rows:
+        if row.status not in SIGNAL_WEIGHTS:
+            continue
+        bucket = ((int(row.dow) + 6) % 7) * 24 + int(row.hour)
+        profile.add(_normalize_platform(row.platform), row.status, bucket, row.count)
+
+    return profile
+
+
+def _compute(profile: _UserProfile, platform: str, tz: ZoneInfo) -> dict:
+    """Combine tendance plateforme et activité utilisateur (168 cases, coût constant)"""
+    baseline_platform = platform if platform in PLATFORM_BASELINES else DEFAULT_PLATFORM
+    baseline = BASELINE_WEIGHTS[baseline_platform]
+
+    # Signal utilisateur en UTC
+    signal = [0.0] * HOURS_PER_WEEK
+    for (hist_platform, kind), histogram in profile.histograms.items():
+        if hist_platform not in (platform, ANY_PLATFORM):
+            continue
+        weight = SIGNAL_WEIGHTS[kind]
+        for bucket, count in enumerate(histogram):
+            if count:
+                signal[bucket] += weight * count
+
+    data_points = int(profile.data_points.get(platform, 0) + profile.data_points.get(ANY_PLATFORM, 0))
+
+    # Décalage UTC -> heure locale (offset actuel du fuseau)
+    offset_hours = round(datetime.now(tz).utcoffset().total_seconds() / 3600)
+    local_signal = [0.0] * HOURS_PER_WEEK
+    for bucket, value in enumerate(signal):
+        # Lissage sur les heures voisines
+        local_bucket = (bucket + offset_hours) % HOURS_PER_WEEK
+        local_signal[local_bucket] += value * 0.5
+        local_signal[(local_bucket - 1) % HOURS_PER_WEEK] += value * 0.25
+        local_signal[(local_bucket + 1) % HOURS_PER_WEEK] += value * 0.25
+
+    peak = max(local_signal)
+    if peak > 0:
+        local_signal = [max(value, 0.0) / peak for value in local_signal]
+    else:
+        local_signal = [0.0] * HOURS_PER_WEEK
+
+    user_weight = data_points / (data_points + PERSONALIZATION_PRIOR) if peak > 0 else 0.0
+    scores = [(1 - user_weight) * b + user_weight * u for b, u in zip(baseline, local_signal)]
+
+    # Meilleurs jours
+    day_scores = [sum(scores[day * 24:(day + 1) * 24]) for day in range(7)]
+    peak_days = sorted(range(7), key=lambda d: day_scores[d], reverse=True)[:3]
+
+    # Meilleure fenêtre de 2h sur ces jours
+    hour_scores = [sum(scores[day * 24 + hour] for day in peak_days) for hour in range(24)]
+    best_hour = max(range(23), key=lambda h: hour_scores[h] + hour_scores[h + 1])
+
+    ordered_days = sorted(peak_days)
+    if ordered_days[-1] - ordered_days[0] == len(ordered_days) - 1:
+        days_label = f"{DAY_NAMES[ordered_days[0]]}-{DAY_NAMES[ordered_days[-1]]}"
+    else:
+        days_label = ", ".join(DAY_NAMES[day] for day in ordered_days)
+
+    best_slots = sorted(range(HOURS_PER_WEEK), key=lambda b: scores[b], reverse=True)[:5]
+
+    if user_weight > 0:
+        reason = f"Basé sur votre activité ({data_points} contenus) et les tendances de {baseline_platform.capitalize()}"
+    else:
+        reason = PLATFORM_BASELINES[baseline_platform]["reason"]
+
+    return {
+        "best_time": f"{days_label}, {best_hour}h-{best_hour + 2}h",
+        "reason": reason,
+        "peak_days": [DAY_NAMES[day] for day in ordered_days],
+        "timezone": tz.key,
+        "personalized": user_weight > 0,
+        "data_points": data_points,
+        "best_slots": [
+            {"day": DAY_NAMES[bucket // 24], "hour": bucket % 24, "score": round(scores[bucket], 3)}
+            for bucket in best_slots
+        ]
+    }
+
+
+def get_recommendation(db: Session, user_id: int, platform: str, timezone: str = "Europe/Paris") -> dict:
+    """Recommandation servie depuis le cache (calculée au premier appel)"""
+    tz = get_timezone(timezone)
+    platform = _normalize_platform(platform) or DEFAULT_PLATFORM
+    key = (platform, tz.key)
+
+    with _lock:
+        profile = _cached_profile(user_id)
+        if profile is not None:
+            cached = profile.recommendations.get(key)
+            if cached:
+                return cached
+
+    if profile is None:
+        profile = _load_profile(db, user_id)
+
+    with _lock:
+        if _profiles.get(user_id) is not profile:
+            # Nouveau profil : les recommandations de l'ancien partent avec lui
+            _store_profile(user_id, profile)
+        result = _compute(profile, platform, tz)
+        profile.recommendations[key] = result
+        return result
+
+
+def _record(user_id: int, platform: Optional[str], kind: str, when: datetime, count: float):
+    """Met à jour l'histogramme et recalcule les recommandations déjà en cache"""
+    with _lock:
+        profile = _cached_profile(user_id)
+        if profile is None:
+            return  # Sera chargé depuis la BDD au prochain appel
+
+        platform = _normalize_platform(platform)
+        profile.add(platform, kind, _utc_bucket(when), count)
+
+        # Seules les recommandations de cet utilisateur sont parcourues
+        for cached_platform, timezone in list(profile.recommendations):
+            if platform == ANY_PLATFORM or cached_platform == platform:
+                profile.recommendations[(cached_platform, timezone)] = _compute(
+                    profile, cached_platform, ZoneInfo(timezone)
+                )
+
+
+def record_content_request(user_id: int, platform: Optional[str], created_at: datetime):
+    """À appeler après la création d'une ContentRequest"""
+    kind = "request_any" if _normalize_platform(platform) == ANY_PLATFORM else "request"
+    _record(user_id, platform, kind, created_at, 1)
+
+
+def record_scheduled_content(user_id: int, platform: str, scheduled_date: datetime, status: str, count: int = 1):
+    """À appeler à la création (count=1) ou au retrait (count=-1) d'un créneau planifié"""
+    if status in SIGNAL_WEIGHTS:
+        _record(user_id, platform, status, scheduled_date, count)
@@ -0,0 +1,335 @@
+"""
+Instrumentation SQL par requête HTTP : nombre de requêtes, temps BDD, détection N+1
+
+Les événements before/after_cursor_execute des moteurs (sync, async, réplique)
+alimentent un QueryStats porté par une ContextVar, initialisé par le
+middleware HTTP (app.main). Une même empreinte de requête répétée au-delà de
+QUERY_N_PLUS_ONE_THRESHOLD fois dans une requête HTTP est signalée comme N+1.
+Les jobs hors HTTP (archivage, rétention, exports) sont instrumentés de la
+même façon par job_query_stats.
+
+Les requêtes plus lentes que SLOW_QUERY_THRESHOLD_MS sont conservées dans un
+tampon circulaire (route, plan de l'utilisateur, durée, lignes) et, si
+SLOW_QUERY_LOG_TABLE est activé, enregistrées dans la table slow_query_logs.
+"""
+import os
+import re
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+from sqlalchemy import event
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Nombre d'exécutions d'une même empreinte à partir duquel on signale un N+1
+QUERY_N_PLUS_ONE_THRESHOLD = int(os.getenv("QUERY_N_PLUS_ONE_THRESHOLD", "5"))
+# Ajoute X-DB-Query-Count / X-DB-Time-Ms aux réponses : dev/test uniquement (expose des détails internes)
+QUERY_STATS_HEADERS = os.getenv("QUERY_STATS_HEADERS", "false").lower() == "true"
+# Requêtes lentes : seuil, taille du tampon en mémoire, persistance optionnelle en table
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "200"))
+SLOW_QUERY_BUFFER_SIZE = int(os.getenv("SLOW_QUERY_BUFFER_SIZE", "1000"))
+SLOW_QUERY_LOG_TABLE = os.getenv("SLOW_QUERY_LOG_TABLE", "false").lower() == "true"
+
+_current_stats: ContextVar[Optional["QueryStats"]] = ContextVar("query_stats", default=None)
+# QueryStats des blocs query_budget actifs (reçoivent aussi les requêtes faites hors contexte, ex: TestClient)
+_budget_collectors = []
+
+# Paramètres (%(id_1)s psycopg2, $1::INTEGER asyncpg, ?), listes IN étendues, littéraux
+_PARAM = r"(?:%\(\w+\)s|\$\d+(?:::\w+(?:\[\])?)?|\?)"
+_IN_LIST_RE = re.compile(rf"\(\s*{_PARAM}(?:\s*,\s*{_PARAM})*\s*\)")
+_PARAM_RE = re.compile(_PARAM)
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def fingerprint(statement: str) -> str:
+    """Forme normalisée d'une requête SQL (valeurs remplacées par ?)"""
+    statement = _IN_LIST_RE.sub("(?)", statement)
+    statement = _PARAM_RE.sub("?", statement)
+    statement = _STRING_RE.sub("?", statement)
+    statement = _NUMBER_RE.sub("?", statement)
+    return _WHITESPACE_RE.sub(" ", statement).strip()
+
+
+class QueryStats:
+    """Compteurs SQL d'une requête HTTP (ou d'un bloc query_budget)"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.fingerprints = Counter()
+        # Plan de l'utilisateur authentifié (renseigné par les dépendances d'auth)
+        self.plan = None
+        self.slow = []
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, duration_ms: float, row_count: int = -1):
+        key = fingerprint(statement)
+        with self._lock:
+            self.count += 1
+            self.total_ms += duration_ms
+            self.fingerprints[key] += 1
+            if duration_ms >= SLOW_QUERY_THRESHOLD_MS:
+                self.slow.append({
+                    "fingerprint": key,
+                    "statement": statement[:2000],
+                    "duration_ms": round(duration_ms, 2),
+                    "row_count": row_count,
+                    "created_at": datetime.utcnow()
+                })
+
+    def merge(self, other: "QueryStats"):
+        with self._lock:
+            self.count += other.count
+            self.total_ms += other.total_ms
+            self.fingerprints.update(other.fingerprints)
+
+    def repeated(self, threshold: int = QUERY_N_PLUS_ONE_THRESHOLD) -> list:
+        """Empreintes exécutées au moins `threshold` fois : [(empreinte, nombre)]"""
+        return [(key, count) for key, count in self.fingerprints.most_common() if count >= threshold]
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_stats.get() is not None or _budget_collectors:
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("query_start_time")
+    if not starts:
+        return
+    duration_ms = (time.perf_counter() - starts.pop()) * 1000
+    row_count = getattr(cursor, "rowcount", -1)
+
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.record(statement, duration_ms, row_count)
+    else:
+        for collector in list(_budget_collectors):
+            collector.record(statement, duration_ms, row_count)
+
+
+def instrument_engine(engine):
+    """Branche les compteurs sur un moteur sync (ou AsyncEngine.sync_engine)"""
+    if engine is not None and not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def start_request_stats() -> tuple:
+    """Active un nouveau QueryStats pour le contexte courant : (stats, token)"""
+    stats = QueryStats()
+    return stats, _current_stats.set(stats)
+
+
+def stop_request_stats(token):
+    _current_stats.reset(token)
+
+
+def set_request_plan(plan: Optional[str]):
+    """Attribue les requêtes SQL de la requête HTTP courante au plan de l'utilisateur"""
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.plan = plan
+
+
+# Agrégats par route (exposés dans /admin/metrics/queries)
+_routes_lock = threading.Lock()
+_route_stats = {}
+
+
+def record_route(route: str, stats: QueryStats):
+    for collector in list(_budget_collectors):
+        collector.merge(stats)
+
+    repeated = stats.repeated()
+    with _routes_lock:
+        entry = _route_stats.setdefault(route, {
+            "requests": 0, "queries": 0, "max_queries": 0, "db_time_ms": 0.0,
+            "n_plus_one_requests": 0, "n_plus_one_fingerprints": Counter()
+        })
+        entry["requests"] += 1
+        entry["queries"] += stats.count
+        entry["max_queries"] = max(entry["max_queries"], stats.count)
+        entry["db_time_ms"] += stats.total_ms
+        if repeated:
+            entry["n_plus_one_requests"] += 1
+            for key, _ in repeated:
+                entry["n_plus_one_fingerprints"][key] += 1
+
+    if repeated:
+        key, count = repeated[0]
+        print(f"⚠️ N+1 suspect sur {route}: {stats.count} requêtes SQL, {count}x \"{key[:200]}\"")
+
+    if stats.slow:
+        _record_slow_queries(route, stats)
+
+
+def get_query_metrics() -> dict:
+    with _routes_lock:
+        routes = {
+            route: {
+                "requests": entry["requests"],
+                "avg_queries": round(entry["queries"] / entry["requests"], 1),
+                "max_queries": entry["max_queries"],
+                "avg_db_time_ms": round(entry["db_time_ms"] / entry["requests"], 2),
+                "n_plus_one_requests": entry["n_plus_one_requests"],
+                "top_repeated": [
+                    {"fingerprint": key, "requests": count}
+                    for key, count in entry["n_plus_one_fingerprints"].most_common(3)
+                ]
+            }
+            for route, entry in _route_stats.items()
+        }
+    return {
+        "n_plus_one_threshold": QUERY_N_PLUS_ONE_THRESHOLD,
+        "routes": dict(sorted(routes.items(), key=lambda item: item[1]["max_queries"], reverse=True))
+    }
+
+
+# Requêtes lentes : tampon circulaire (toujours) + file d'attente vers la table (si activée)
+_slow_lock = threading.Lock()
+_slow_queries = deque(maxlen=SLOW_QUERY_BUFFER_SIZE)
+_slow_pending = []
+
+
+def _record_slow_queries(route: str, stats: QueryStats):
+    entries = [dict(entry, route=route, plan=stats.plan) for entry in stats.slow]
+    with _slow_lock:
+        _slow_queries.extend(entries)
+        if SLOW_QUERY_LOG_TABLE:
+            _slow_pending.extend(entries[:SLOW_QUERY_BUFFER_SIZE - len(_slow_pending)])
+    for entry in entries:
+        print(f"🐢 Requête lente sur {route} ({entry['duration_ms']:.0f} ms, {entry['row_count']} lignes): {entry['fingerprint'][:200]}")
+
+
+def has_pending_slow_queries() -> bool:
+    return bool(_slow_pending)
+
+
+def persist_slow_queries():
+    """
+    Écrit les requêtes lentes en attente dans slow_query_logs.
+    Appelé hors contexte de requête HTTP : ces INSERT ne sont pas eux-mêmes comptés.
+    """
+    from app.database import SessionLocal
+    from app.models import SlowQueryLog
+
+    with _slow_lock:
+        entries = _slow_pending[:]
+        _slow_pending.clear()
+    if not entries:
+        return
+
+    db = SessionLocal()
+    try:
+        db.add_all([SlowQueryLog(**entry) for entry in entries])
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"⚠️ Impossible d'enregistrer {len(entries)} requête(s) lente(s): {e}")
+    finally:
+        db.close()
+
+
+def summarize_slow_queries(entries, limit: int = 20) -> list:
+    """Empreintes classées par temps total : nombre, total/moyenne/max, lignes, routes et plans"""
+    summary = {}
+    for entry in entries:
+        item = summary.setdefault(entry["fingerprint"], {
+            "fingerprint": entry["fingerprint"], "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+            "max_rows": -1, "routes": Counter(), "plans": Counter(), "example": entry["statement"]
+        })
+        item["count"] += 1
+        item["total_ms"] += entry["duration_ms"]
+        item["max_rows"] = max(item["max_rows"], entry["row_count"] if entry["row_count"] is not None else -1)
+        if entry["duration_ms"] >= item["max_ms"]:
+            item["max_ms"] = entry["duration_ms"]
+            item["example"] = entry["statement"]
+        item["routes"][entry["route"]] += 1
+        item["plans"][entry["plan"] or "anonymous"] += 1
+
+    ranked = sorted(summary.values(), key=lambda item: item["total_ms"], reverse=True)[:limit]
+    return [
+        dict(
+            item,
+            total_ms=round(item["total_ms"], 2),
+            avg_ms=round(item["total_ms"] / item["count"], 2),
+            routes=dict(item["routes"].most_common(5)),
+            plans=dict(item["plans"])
+        )
+        for item in ranked
+    ]
+
+
+def get_slow_query_metrics(limit: int = 20) -> dict:
+    """Top des empreintes lentes (tampon en mémoire de ce worker)"""
+    with _slow_lock:
+        entries = list(_slow_queries)
+    return {
+        "threshold_ms": SLOW_QUERY_THRESHOLD_MS,
+        "buffered": len(entries),
+        "buffer_size": SLOW_QUERY_BUFFER_SIZE,
+        "top_fingerprints": summarize_slow_queries(entries, limit)
+    }
+
+
+@contextmanager
+def job_query_stats(name: str):
+    """
+    Instrumente un job hors requête HTTP (cron, tâche de fond) comme une route :
+    agrégats sous "job <name>" (/admin/metrics/queries du worker), N+1 et
+    requêtes lentes signalés, résumé imprimé à la fin. Les scripts cron
+    n'importent pas app.main : le moteur sync est instrumenté ici.
+    """
+    from app.database import engine
+
+    instrument_engine(engine)
+    stats, token = start_request_stats()
+    try:
+        yield stats
+    finally:
+        stop_request_stats(token)
+        record_route(f"job {name}", stats)
+        print(f"📊 Job {name}: {stats.count} requête(s) SQL, {stats.total_ms:.0f} ms en base")
+        if has_pending_slow_queries():
+            persist_slow_queries()
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def query_budget(max_queries: int, max_repeats: Optional[int] = None):
+    """
+    Vérifie le budget SQL d'un bloc de code (ex: un appel TestClient) :
+
+        with query_budget(5):
+            client.get("/content/history", headers=headers)
+
+    Lève QueryBudgetExceeded si le bloc dépasse max_queries requêtes, ou si une
+    même empreinte est exécutée plus de max_repeats fois (N+1). Compte aussi les
+    requêtes HTTP servies pendant le bloc (middleware), même dans un autre thread.
+    """
+    stats = QueryStats()
+    _budget_collectors.append(stats)
+    try:
+        yield stats
+    finally:
+        _budget_collectors.remove(stats)
+
+    if stats.count > max_queries:
+        raise QueryBudgetExceeded(
+            f"{stats.count} requêtes SQL (budget: {max_queries}). Les plus fréquentes: {stats.fingerprints.most_common(3)}"
+        )
+    if max_repeats is not None:
+        repeated = stats.repeated(max_repeats + 1)
+        if repeated:
+            raise QueryBudgetExceeded(f"Requête répétée {repeated[0][1]} fois (max: {max_repeats}): {repeated[0][0]}")
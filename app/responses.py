@@ -0,0 +1,23 @@
+"""
+Réponse JSON rapide (orjson), classe par défaut de l'application
+
+orjson sérialise nativement dict, list, datetime, UUID et enums ; les autres
+types (Decimal des agrégats SQL, modèles Pydantic) passent par _default.
+Les routes à gros volume (historique, recherche) renvoient directement
+FastJSONResponse(...) : FastAPI saute alors le passage par jsonable_encoder.
+"""
+import decimal
+import orjson
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+
+def _default(value):
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    return jsonable_encoder(value)
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
@@ -1,10 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc, extract
-from app.database import get_db
-from app.models import User, ContentRequest, UsageAnalytics, GeneratedContent
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import func, desc
+from app.database import get_db, get_replica_db, get_replica_status
+from app.db_pool import get_pool_metrics
+from app.models import User, ContentRequest, UsageAnalytics, GeneratedContent, SlowQueryLog, ContentArchive
 from app.auth import get_current_user
 from app.plan_config import get_plan_credits, PLAN_CONFIG
+from app.http_client import get_http_metrics
+from app.bulk_export import delete_user_exports
+from app.query_stats import get_query_metrics, get_slow_query_metrics, SLOW_QUERY_THRESHOLD_MS
 from datetime import datetime, timedelta
 from typing import List, Dict
 from pydantic import BaseModel
@@ -32,7 +36,7 @@ def verify_admin(current_user: User = Depends(get_current_user)):
 
 @router.get("/stats")
 def get_admin_stats(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_replica_db),
     admin: User = Depends(verify_admin)
 ):
     """Statistiques globales de la plateforme"""
@@ -49,12 +53,12 @@ def get_admin_stats(
     # Total de requêtes
     total_requests = db.query(func.count(ContentRequest.id)).scalar()
 
-    # Requêtes ce mois
-    current_month = datetime.utcnow().month
-    current_year = datetime.utcnow().year
+    # Requêtes ce mois (intervalle sur created_at : index et élagage des partitions, contrairement à extract())
+    month_start = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    next_month_start = (month_start + timedelta(days=32)).replace(day=1)
     requests_this_month = db.query(func.count(ContentRequest.id)).filter(
-        extract('month', ContentRequest.created_at) == current_month,
-        extract('year', ContentRequest.created_at) == current_year
+        ContentRequest.created_at >= month_start,
+        ContentRequest.created_at < next_month_start
     ).scalar()
 
     # Utilisateurs actifs (au moins une requête dans les 30 derniers jours)
@@ -88,15 +92,14 @@ def get_all_users(
 ):
     """Liste de tous les utilisateurs avec pagination"""
 
-    users = db.query(User).order_by(desc(User.created_at)).offset(skip).limit(limit).all()
+    # Nombre de requêtes de chaque utilisateur en sous-requête corrélée (une seule requête SQL)
+    request_count = db.query(func.count(ContentRequest.id)).filter(
+        ContentRequest.user_id == User.id
+    ).correlate(User).scalar_subquery()
+    users = db.query(User, request_count).order_by(desc(User.created_at)).offset(skip).limit(limit).all()
 
-    # Ajouter le nombre de requêtes pour chaque utilisateur
     users_data = []
-    for user in users:
-        request_count = db.query(func.count(ContentRequest.id)).filter(
-            ContentRequest.user_id == user.id
-        ).scalar()
-
+    for user, total_requests in users:
         users_data.append({
             "id": user.id,
             "email": user.email,
@@ -106,7 +109,7 @@ def get_all_users(
             "email_verified": user.email_verified,
             "is_admin": user.is_admin,
             "created_at": user.created_at,
-            "total_requests": request_count
+            "total_requests": total_requests
         })
 
     return users_data
@@ -129,7 +132,7 @@ def get_user_details(
     ).scalar()
 
     # Dernières requêtes
-    recent_requests = db.query(ContentRequest).filter(
+    recent_requests = db.query(ContentRequest).options(joinedload(ContentRequest.original_blob)).filter(
         ContentRequest.user_id == user_id
     ).order_by(desc(ContentRequest.created_at)).limit(10).all()
 
@@ -226,7 +229,7 @@ def toggle_admin_status(
 @router.get("/requests/recent")
 def get_recent_requests(
     limit: int = 50,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_replica_db),
     admin: User = Depends(verify_admin)
 ):
     """Liste des requêtes récentes de tous les utilisateurs"""
@@ -236,7 +239,9 @@ def get_recent_requests(
         User.email,
         User.name,
         User.current_plan
-    ).join(User).order_by(desc(ContentRequest.created_at)).limit(limit).all()
+    ).join(User).options(
+        joinedload(ContentRequest.original_blob)
+    ).order_by(desc(ContentRequest.created_at)).limit(limit).all()
 
     return [
         {
@@ -256,7 +261,7 @@ def get_recent_requests(
 @router.get("/analytics/usage-trends")
 def get_usage_trends(
     days: int = 30,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_replica_db),
     admin: User = Depends(verify_admin)
 ):
     """Tendances d'utilisation sur les derniers jours"""
@@ -281,7 +286,7 @@ def get_usage_trends(
 
 @router.get("/analytics/platform-distribution")
 def get_platform_distribution(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_replica_db),
     admin: User = Depends(verify_admin)
 ):
     """Distribution des requêtes par plateforme"""
@@ -385,9 +390,87 @@ def delete_user(
     request_ids = [req.id for req in db.query(ContentRequest.id).filter(ContentRequest.user_id == user_id).all()]
     if request_ids:
         db.query(GeneratedContent).filter(GeneratedContent.request_id.in_(request_ids)).delete(synchronize_session=False)
+    db.query(ContentArchive).filter(ContentArchive.user_id == user_id).delete()
+    delete_user_exports(db, user_id)
 
     db.query(ContentRequest).filter(ContentRequest.user_id == user_id).delete()
     db.delete(user)
     db.commit()
 
     return {"message": "Utilisateur supprimé avec succès"}
+
+@router.get("/metrics/http")
+def get_outbound_http_metrics(
+    admin: User = Depends(verify_admin)
+):
+    """Métriques des pools HTTP sortants (réutilisation des connexions, handshakes TLS)"""
+    return get_http_metrics()
+
+@router.get("/metrics/db-replica")
+def get_db_replica_status(
+    admin: User = Depends(verify_admin)
+):
+    """État de la réplique en lecture (santé, retard de réplication)"""
+    return get_replica_status()
+
+@router.get("/metrics/db-pool")
+def get_db_pool_metrics(
+    admin: User = Depends(verify_admin)
+):
+    """Pools de connexions BDD : profil, connexions utilisées, overflow, attente, timeouts, recyclages"""
+    return get_pool_metrics()
+
+@router.get("/metrics/queries")
+def get_sql_query_metrics(
+    admin: User = Depends(verify_admin)
+):
+    """Requêtes SQL par route (moyenne, max, temps BDD) et empreintes N+1 détectées"""
+    return get_query_metrics()
+
+@router.get("/metrics/slow-queries")
+def get_slow_queries(
+    limit: int = 20,
+    source: str = "memory",
+    hours: int = 24,
+    admin: User = Depends(verify_admin),
+    db: Session = Depends(get_replica_db)
+):
+    """
+    Empreintes SQL lentes classées par temps total.
+    source=memory : tampon de ce worker ; source=table : slow_query_logs des `hours` dernières heures (tous workers)
+    """
+    if source == "memory":
+        return get_slow_query_metrics(limit)
+    if source != "table":
+        raise HTTPException(status_code=400, detail="source doit valoir 'memory' ou 'table'")
+
+    total_ms = func.sum(SlowQueryLog.duration_ms)
+    rows = db.query(
+        SlowQueryLog.fingerprint,
+        func.count(SlowQueryLog.id).label("count"),
+        total_ms.label("total_ms"),
+        func.max(SlowQueryLog.duration_ms).label("max_ms"),
+        func.max(SlowQueryLog.row_count).label("max_rows"),
+        func.array_agg(func.distinct(SlowQueryLog.route)).label("routes"),
+        func.array_agg(func.distinct(SlowQueryLog.plan)).label("plans")
+    ).filter(
+        SlowQueryLog.created_at >= datetime.utcnow() - timedelta(hours=hours)
+    ).group_by(SlowQueryLog.fingerprint).order_by(desc(total_ms)).limit(limit).all()
+
+    return {
+        "threshold_ms": SLOW_QUERY_THRESHOLD_MS,
+        "hours": hours,
+        "top_fingerprints": [
+            {
+                "fingerprint": row.fingerprint,
+                "count": row.count,
+                "total_ms": round(row.total_ms, 2),
+                "avg_ms": round(row.total_ms / row.count, 2),
+                "max_ms": round(row.max_ms, 2),
+                "max_rows": row.max_rows,
+                "routes": [route for route in row.routes if route],
+                "plans": [plan or "anonymous" for plan in row.plans]
+            }
+            for row in rows
+        ]
+    }
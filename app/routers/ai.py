@@ -1,13 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Optional, Dict, Any
 from datetime import datetime
-from groq import Groq
+import asyncio
+import json
 import os
 from ..database import get_db
 from ..auth import get_current_user
 from ..models import User
+from ..http_client import get_async_groq_client
+from ..content_analyzer import analyze_content as local_analyze_content
+from ..posting_time import get_recommendation
+from ..emoji_index import suggest_emojis as local_suggest_emojis, fill_emojis
 
 router = APIRouter(prefix="/ai", tags=["ai"])
 
@@ -20,25 +25,73 @@ class HashtagRequest(BaseModel):
 class HashtagResponse(BaseModel):
     hashtags: List[str]
 
+class HashtagBatchRequest(BaseModel):
+    items: List[HashtagRequest]
+
+class HashtagBatchResult(HashtagResponse):
+    error: Optional[str] = None
+
+class HashtagBatchResponse(BaseModel):
+    results: List[HashtagBatchResult]
+    upstream_calls: int
+
 class EmojiRequest(BaseModel):
     content: str
     platform: str
 
 class EmojiResponse(BaseModel):
     emojis: List[str]
+    source: str = "local"  # local (index) or llm (low-confidence fallback)
+
+class EmojiBatchRequest(BaseModel):
+    items: List[EmojiRequest]
 
-class AnalyzeRequest(BaseModel):
+class EmojiBatchResult(EmojiResponse):
+    error: Optional[str] = None
+
+class EmojiBatchResponse(BaseModel):
+    results: List[EmojiBatchResult]
+    upstream_calls: int
+
+class AnalyzeBatchItem(BaseModel):
     content: str
+    platform: Optional[str] = None
+    language: Optional[str] = None  # fr, en, es (auto-detected if omitted)
+
+class AnalyzeRequest(AnalyzeBatchItem):
+    mode: str = "fast"  # fast (local heuristics) or deep (LLM)
 
 class AnalyzeResponse(BaseModel):
     sentiment: str
     engagement_score: int
     suggestions: List[str]
+    mode: str = "fast"
+    metrics: Optional[Dict[str, Any]] = None
+
+class AnalyzeBatchRequest(BaseModel):
+    items: List[AnalyzeBatchItem]
+    mode: str = "fast"  # applies to every item
+
+class AnalyzeBatchResult(AnalyzeResponse):
+    error: Optional[str] = None
+
+class AnalyzeBatchResponse(BaseModel):
+    results: List[AnalyzeBatchResult]
+    upstream_calls: int = 0
+
+class PostingSlot(BaseModel):
+    day: str
+    hour: int
+    score: float
 
 class PostingTimeResponse(BaseModel):
     best_time: str
     reason: str
     peak_days: List[str]
+    timezone: Optional[str] = None
+    personalized: bool = False
+    data_points: int = 0
+    best_slots: List[PostingSlot] = []
 
 class ImproveRequest(BaseModel):
     content: str
@@ -49,8 +102,72 @@ class ImproveResponse(BaseModel):
     improved_content: str
     improvements: List[str]
 
-# Initialize Groq
-groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+# Max concurrent Groq calls per worker (the others wait without blocking the event loop)
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "8"))
+_ai_semaphore = asyncio.Semaphore(AI_MAX_CONCURRENCY)
+
+# Batch endpoints: max items per request, and max items sharing one Groq call
+MAX_BATCH_ITEMS = 100
+AI_BATCH_CHUNK_SIZE = int(os.getenv("AI_BATCH_CHUNK_SIZE", "10"))
+
+HASHTAG_PLATFORM_CONTEXT = {
+    "linkedin": "professional networking and business content",
+    "twitter": "trending topics and concise engagement",
+    "facebook": "community engagement and broad reach",
+    "instagram": "visual content and lifestyle",
+    "tiktok": "viral trends and entertainment",
+    "youtube": "video content and SEO optimization"
+}
+DEFAULT_HASHTAGS = ["#content", "#socialmedia", "#engagement"]
+
+async def chat_completion(**kwargs):
+    """Async Groq call, capped by AI_MAX_CONCURRENCY"""
+    async with _ai_semaphore:
+        return await get_async_groq_client().chat.completions.create(**kwargs)
+
+def check_batch_size(items: list):
+    if len(items) > MAX_BATCH_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Maximum {MAX_BATCH_ITEMS} items per batch")
+
+def chunked(items: list, size: int = AI_BATCH_CHUNK_SIZE) -> List[list]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def parse_json_object(text: str) -> dict:
+    """Extract the JSON object from an LLM response (ignores surrounding text)"""
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end <= start:
+        raise ValueError("No JSON object in upstream response")
+    data = json.loads(text[start:end + 1])
+    if not isinstance(data, dict):
+        raise ValueError("Upstream response is not a JSON object")
+    return data
+
+async def batch_completion(system_prompt: str, prompt: str, size: int, max_tokens_per_item: int, temperature: float) -> dict:
+    """
+    Single Groq call for a chunk of items numbered 1..size.
+    Returns {number (str): result}; missing items are handled by the caller.
+    """
+    response = await chat_completion(
+        model="llama-3.3-70b-versatile",
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=temperature,
+        max_tokens=max_tokens_per_item * size
+    )
+    return parse_json_object(response.choices[0].message.content.strip())
+
+def parse_hashtags(values) -> List[str]:
+    """Normalize a list (or a text) of hashtags, without duplicates"""
+    if isinstance(values, str):
+        values = values.split()
+    hashtags = []
+    for tag in values:
+        tag = str(tag).strip()
+        if tag.startswith("#") and tag not in hashtags:
+            hashtags.append(tag)
+    return hashtags[:12]
 
 @router.post("/hashtags", response_model=HashtagResponse)
 async def generate_hashtags(
@@ -60,16 +177,7 @@ async def generate_hashtags(
     """Generate relevant hashtags for content based on platform"""
     try:
         # Map platform to specific hashtag strategy
-        platform_context = {
-            "linkedin": "professional networking and business content",
-            "twitter": "trending topics and concise engagement",
-            "facebook": "community engagement and broad reach",
-            "instagram": "visual content and lifestyle",
-            "tiktok": "viral trends and entertainment",
-            "youtube": "video content and SEO optimization"
-        }
-
-        context = platform_context.get(request.platform.lower(), "general social media")
+        context = HASHTAG_PLATFORM_CONTEXT.get(request.platform.lower(), "general social media")
 
         prompt = f"""Generate 8-12 relevant and trending hashtags for the following {request.platform} content.
 
@@ -84,7 +192,7 @@ Requirements:
 
 Hashtags:"""
 
-        response = groq_client.chat.completions.create(
+        response = await chat_completion(
             model="llama-3.3-70b-versatile",
             messages=[
                 {"role": "system", "content": "You are a social media expert specializing in hashtag strategy."},
@@ -95,25 +203,82 @@ Hashtags:"""
         )
 
         hashtags_text = response.choices[0].message.content.strip()
-        hashtags = [tag.strip() for tag in hashtags_text.split('\n') if tag.strip().startswith('#')]
+        hashtags = parse_hashtags(hashtags_text.split('\n'))
 
         # Ensure we have hashtags
         if not hashtags:
-            hashtags = ["#content", "#socialmedia", "#engagement"]
+            hashtags = list(DEFAULT_HASHTAGS)
 
-        return HashtagResponse(hashtags=hashtags[:12])
+        return HashtagResponse(hashtags=hashtags)
 
     except Exception as e:
         print(f"Error generating hashtags: {e}")
         # Return default hashtags on error
-        return HashtagResponse(hashtags=["#content", "#socialmedia", "#engagement"])
+        return HashtagResponse(hashtags=list(DEFAULT_HASHTAGS))
+
+async def hashtags_for_chunk(chunk: List[HashtagRequest]) -> List[HashtagBatchResult]:
+    """Hashtags for a chunk of posts in a single Groq call"""
+    posts = "\n\n".join(
+        f"Post {number} ({item.platform}, {HASHTAG_PLATFORM_CONTEXT.get(item.platform.lower(), 'general social media')}, "
+        f"hashtags in {item.language}):\n{item.content[:500]}"
+        for number, item in enumerate(chunk, start=1)
+    )
+    prompt = f"""Generate 8-12 relevant and trending hashtags for each of the following {len(chunk)} posts.
+
+{posts}
+
+Requirements:
+- Mix of popular and niche hashtags
+- Relevant to each post's platform, in the requested language
+- No duplicates within a post
+- Return ONLY a JSON object mapping each post number to its list of hashtags with # prefix, e.g. {{"1": ["#tag1", "#tag2"], "2": ["#tag3"]}}"""
+
+    try:
+        data = await batch_completion(
+            "You are a social media expert specializing in hashtag strategy. Always respond in valid JSON format.",
+            prompt, len(chunk), max_tokens_per_item=200, temperature=0.7
+        )
+    except Exception as e:
+        print(f"Error generating batch hashtags: {e}")
+        return [HashtagBatchResult(hashtags=list(DEFAULT_HASHTAGS), error="Hashtag generation failed") for _ in chunk]
+
+    results = []
+    for number in range(1, len(chunk) + 1):
+        # List or text expected: any other value (object, number, null) falls back to the default hashtags
+        value = data.get(str(number))
+        hashtags = parse_hashtags(value) if isinstance(value, (list, str)) else []
+        if hashtags:
+            results.append(HashtagBatchResult(hashtags=hashtags))
+        else:
+            results.append(HashtagBatchResult(hashtags=list(DEFAULT_HASHTAGS), error="No hashtags returned for this item"))
+    return results
+
+@router.post("/hashtags/batch", response_model=HashtagBatchResponse)
+async def generate_hashtags_batch(
+    request: HashtagBatchRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """Generate hashtags for several posts (one LLM call per chunk, chunks run concurrently)"""
+    check_batch_size(request.items)
+
+    chunks = chunked(request.items)
+    chunk_results = await asyncio.gather(*(hashtags_for_chunk(chunk) for chunk in chunks))
+
+    return HashtagBatchResponse(
+        results=[result for results in chunk_results for result in results],
+        upstream_calls=len(chunks)
+    )
 
 @router.post("/emojis", response_model=EmojiResponse)
 async def suggest_emojis(
     request: EmojiRequest,
     current_user: User = Depends(get_current_user)
 ):
-    """Suggest relevant emojis for content"""
+    """Suggest relevant emojis for content (local index, LLM only for low-confidence inputs)"""
+    emojis, confident = local_suggest_emojis(request.content, request.platform)
+    if confident:
+        return EmojiResponse(emojis=emojis, source="local")
+
     try:
         prompt = f"""Suggest 5-8 relevant emojis for this {request.platform} content:
 
@@ -121,7 +286,7 @@ Content: {request.content[:300]}
 
 Return ONLY the emojis, separated by spaces, no explanations."""
 
-        response = groq_client.chat.completions.create(
+        response = await chat_completion(
             model="llama-3.3-70b-versatile",
             messages=[
                 {"role": "system", "content": "You are an emoji expert for social media content."},
@@ -132,20 +297,79 @@ Return ONLY the emojis, separated by spaces, no explanations."""
         )
 
         emojis_text = response.choices[0].message.content.strip()
-        emojis = emojis_text.split()
 
-        return EmojiResponse(emojis=emojis[:8])
+        return EmojiResponse(emojis=fill_emojis(emojis_text.split() + emojis, request.platform), source="llm")
 
     except Exception as e:
         print(f"Error suggesting emojis: {e}")
-        return EmojiResponse(emojis=["✨", "🎯", "💡", "🚀", "⭐"])
+        return EmojiResponse(emojis=emojis, source="local")
 
-@router.post("/analyze", response_model=AnalyzeResponse)
-async def analyze_content(
-    request: AnalyzeRequest,
+async def emojis_for_chunk(chunk: List[tuple]) -> List[EmojiBatchResult]:
+    """Emojis for a chunk of posts the local index is unsure about, in a single Groq call"""
+    posts = "\n\n".join(
+        f"Post {number} ({item.platform}):\n{item.content[:300]}"
+        for number, (item, _) in enumerate(chunk, start=1)
+    )
+    prompt = f"""Suggest 5-8 relevant emojis for each of the following {len(chunk)} posts.
+
+{posts}
+
+Return ONLY a JSON object mapping each post number to a string of emojis separated by spaces, e.g. {{"1": "🚀 💡 🎯", "2": "🎉 ✨"}}"""
+
+    try:
+        data = await batch_completion(
+            "You are an emoji expert for social media content. Always respond in valid JSON format.",
+            prompt, len(chunk), max_tokens_per_item=50, temperature=0.8
+        )
+    except Exception as e:
+        print(f"Error suggesting batch emojis: {e}")
+        return [EmojiBatchResult(emojis=local, source="local", error="Emoji suggestion failed") for _, local in chunk]
+
+    results = []
+    for number, (item, local) in enumerate(chunk, start=1):
+        suggested = data.get(str(number))
+        if isinstance(suggested, list):
+            suggested = " ".join(str(emoji) for emoji in suggested)
+        if suggested:
+            results.append(EmojiBatchResult(emojis=fill_emojis(str(suggested).split() + local, item.platform), source="llm"))
+        else:
+            results.append(EmojiBatchResult(emojis=local, source="local", error="No emojis returned for this item"))
+    return results
+
+@router.post("/emojis/batch", response_model=EmojiBatchResponse)
+async def suggest_emojis_batch(
+    request: EmojiBatchRequest,
     current_user: User = Depends(get_current_user)
 ):
-    """Analyze content for sentiment and engagement potential"""
+    """Suggest emojis for several posts (local index; low-confidence items share chunked LLM calls)"""
+    check_batch_size(request.items)
+
+    results = [None] * len(request.items)
+    fallback = []
+    for position, item in enumerate(request.items):
+        emojis, confident = local_suggest_emojis(item.content, item.platform)
+        if confident:
+            results[position] = EmojiBatchResult(emojis=emojis, source="local")
+        else:
+            fallback.append((position, item, emojis))
+
+    chunks = chunked(fallback)
+    chunk_results = await asyncio.gather(*(
+        emojis_for_chunk([(item, emojis) for _, item, emojis in chunk]) for chunk in chunks
+    ))
+    for chunk, chunk_result in zip(chunks, chunk_results):
+        for (position, _, _), result in zip(chunk, chunk_result):
+            results[position] = result
+
+    return EmojiBatchResponse(results=results, upstream_calls=len(chunks))
+
+def local_analysis(request: AnalyzeBatchItem) -> AnalyzeResponse:
+    """Heuristic analysis computed in-process (no LLM call)"""
+    result = local_analyze_content(request.content, request.platform, request.language)
+    return AnalyzeResponse(mode="fast", **result)
+
+async def deep_analysis(request: AnalyzeRequest) -> AnalyzeResponse:
+    """LLM analysis (opt-in), falls back to the local analyzer on error"""
     try:
         prompt = f"""Analyze this social media content:
 
@@ -163,7 +387,7 @@ Format your response as JSON:
   "suggestions": ["suggestion 1", "suggestion 2", "suggestion 3"]
 }}"""
 
-        response = groq_client.chat.completions.create(
+        response = await chat_completion(
             model="llama-3.3-70b-versatile",
             messages=[
                 {"role": "system", "content": "You are a social media analytics expert. Always respond in valid JSON format."},
@@ -173,70 +397,100 @@ Format your response as JSON:
             max_tokens=300
         )
 
-        import json
         result = json.loads(response.choices[0].message.content.strip())
 
         return AnalyzeResponse(
             sentiment=result.get("sentiment", "neutral"),
             engagement_score=min(100, max(0, result.get("engagement_score", 50))),
-            suggestions=result.get("suggestions", [])[:3]
+            suggestions=result.get("suggestions", [])[:3],
+            mode="deep"
         )
 
     except Exception as e:
         print(f"Error analyzing content: {e}")
-        return AnalyzeResponse(
-            sentiment="neutral",
-            engagement_score=50,
-            suggestions=[
-                "Add more engaging questions",
-                "Include relevant hashtags",
-                "Make the call-to-action clearer"
-            ]
+        return local_analysis(request)
+
+@router.post("/analyze", response_model=AnalyzeResponse)
+async def analyze_content(
+    request: AnalyzeRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """Analyze content for sentiment and engagement potential (mode="deep" uses the LLM)"""
+    if request.mode == "deep":
+        return await deep_analysis(request)
+    return local_analysis(request)
+
+async def deep_analysis_for_chunk(chunk: List[AnalyzeBatchItem]) -> List[AnalyzeBatchResult]:
+    """LLM analysis of a chunk of posts in a single Groq call (local fallback per item)"""
+    posts = "\n\n".join(f"Post {number}:\n{item.content}" for number, item in enumerate(chunk, start=1))
+    prompt = f"""Analyze each of the following {len(chunk)} social media posts.
+
+{posts}
+
+For each post provide:
+1. Sentiment (positive/neutral/negative)
+2. Engagement score (0-100)
+3. 3 specific improvement suggestions
+
+Format your response as a JSON object keyed by post number:
+{{
+  "1": {{"sentiment": "positive/neutral/negative", "engagement_score": 75, "suggestions": ["suggestion 1", "suggestion 2", "suggestion 3"]}}
+}}"""
+
+    try:
+        data = await batch_completion(
+            "You are a social media analytics expert. Always respond in valid JSON format.",
+            prompt, len(chunk), max_tokens_per_item=300, temperature=0.5
         )
+    except Exception as e:
+        print(f"Error analyzing batch content: {e}")
+        return [AnalyzeBatchResult(**local_analysis(item).model_dump(), error="Deep analysis failed, local analysis returned") for item in chunk]
+
+    results = []
+    for number, item in enumerate(chunk, start=1):
+        result = data.get(str(number))
+        try:
+            results.append(AnalyzeBatchResult(
+                sentiment=result.get("sentiment", "neutral"),
+                engagement_score=min(100, max(0, int(result.get("engagement_score", 50)))),
+                suggestions=result.get("suggestions", [])[:3],
+                mode="deep"
+            ))
+        except Exception:
+            results.append(AnalyzeBatchResult(**local_analysis(item).model_dump(), error="Deep analysis missing, local analysis returned"))
+    return results
+
+@router.post("/analyze/batch", response_model=AnalyzeBatchResponse)
+async def analyze_content_batch(
+    request: AnalyzeBatchRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """Analyze several texts at once (deep mode: one LLM call per chunk, chunks run concurrently)"""
+    check_batch_size(request.items)
+
+    if request.mode != "deep":
+        return AnalyzeBatchResponse(results=[AnalyzeBatchResult(**local_analysis(item).model_dump()) for item in request.items])
+
+    chunks = chunked(request.items)
+    chunk_results = await asyncio.gather(*(deep_analysis_for_chunk(chunk) for chunk in chunks))
+
+    return AnalyzeBatchResponse(
+        results=[result for results in chunk_results for result in results],
+        upstream_calls=len(chunks)
+    )
 
 @router.get("/best-posting-time", response_model=PostingTimeResponse)
-async def get_best_posting_time(
+def get_best_posting_time(
     platform: str,
-    current_user: User = Depends(get_current_user)
+    timezone: str = "Europe/Paris",
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ):
-    """Get best posting times based on platform and industry data"""
-
-    # Data based on social media research and best practices
-    posting_times = {
-        "linkedin": {
-            "best_time": "Mardi-Jeudi, 9h-11h",
-            "reason": "Activité maximale des professionnels pendant les heures de travail",
-            "peak_days": ["Mardi", "Mercredi", "Jeudi"]
-        },
-        "twitter": {
-            "best_time": "Lundi-Vendredi, 12h-13h",
-            "reason": "Pic d'engagement pendant la pause déjeuner",
-            "peak_days": ["Lundi", "Mercredi", "Vendredi"]
-        },
-        "facebook": {
-            "best_time": "Mercredi-Vendredi, 13h-16h",
-            "reason": "Engagement élevé en milieu d'après-midi",
-            "peak_days": ["Mercredi", "Jeudi", "Vendredi"]
-        },
-        "instagram": {
-            "best_time": "Lundi-Vendredi, 11h-14h",
-            "reason": "Activité maximale pendant et après le déjeuner",
-            "peak_days": ["Lundi", "Mercredi", "Vendredi"]
-        },
-        "tiktok": {
-            "best_time": "Mardi-Jeudi, 18h-22h",
-            "reason": "Pic d'engagement en soirée",
-            "peak_days": ["Mardi", "Jeudi", "Samedi"]
-        },
-        "youtube": {
-            "best_time": "Jeudi-Samedi, 14h-16h",
-            "reason": "Meilleur moment pour les vidéos longue durée",
-            "peak_days": ["Jeudi", "Vendredi", "Samedi"]
-        }
-    }
-
-    platform_lower = platform.lower()
-    data = posting_times.get(platform_lower, posting_times["linkedin"])
+    """Get best posting times from platform trends and the user's own activity"""
+    try:
+        data = get_recommendation(db, current_user.id, platform, timezone)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     return PostingTimeResponse(**data)
 
@@ -274,7 +528,7 @@ Format as JSON:
   "improvements": ["improvement 1", "improvement 2", "improvement 3"]
 }}"""
 
-        response = groq_client.chat.completions.create(
+        response = await chat_completion(
             model="llama-3.3-70b-versatile",
             messages=[
                 {"role": "system", "content": f"You are a social media copywriting expert. Always write in {request.language} and respond in valid JSON format."},
@@ -284,7 +538,6 @@ Format as JSON:
             max_tokens=500
         )
 
-        import json
         result = json.loads(response.choices[0].message.content.strip())
 
         return ImproveResponse(
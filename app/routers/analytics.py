@@ -1,41 +1,44 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func, extract
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, extract, select
+from sqlalchemy.orm import joinedload
 from datetime import datetime, timedelta
-from app.database import get_db
-from app.auth import get_current_user
-from app.models import User, UsageAnalytics, ContentRequest, GeneratedContent
+from app.auth import get_current_user_async, get_async_read_db
+from app.models import User, UsageAnalytics, ContentRequest, GeneratedContent, ContentArchive
 from app.plan_config import get_plan_config, get_plan_credits
-from app.utils.team_utils import get_effective_plan
-from typing import Dict, List
+from app.utils.team_utils import get_effective_plan_async
+from app.fieldsets import VIEW_PATTERN, parse_fields, pick_fields, wants, text_previews_async
+from typing import Dict, List, Optional
 
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 
 @router.get("/stats")
-def get_user_stats(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+async def get_user_stats(
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_read_db)
 ) -> Dict:
     """Récupère les statistiques globales de l'utilisateur (Pro/Business: statistiques détaillées)"""
 
     # Get effective plan (considering team membership)
-    effective_plan = get_effective_plan(current_user, db)
+    effective_plan = await get_effective_plan_async(current_user, db)
 
     # Check if user has advanced analytics
     plan_config = get_plan_config(effective_plan)
     analytics_enabled = plan_config.get('features', {}).get('analytics', False)
 
     # Total de requêtes
-    total_requests = db.query(func.count(ContentRequest.id)).filter(
-        ContentRequest.user_id == current_user.id
-    ).scalar() or 0
+    total_requests = (await db.execute(
+        select(func.count(ContentRequest.id)).where(ContentRequest.user_id == current_user.id)
+    )).scalar() or 0
 
     # Crédits utilisés ce mois
     first_day_of_month = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    credits_used_this_month = db.query(func.count(ContentRequest.id)).filter(
-        ContentRequest.user_id == current_user.id,
-        ContentRequest.created_at >= first_day_of_month
-    ).scalar() or 0
+    credits_used_this_month = (await db.execute(
+        select(func.count(ContentRequest.id)).where(
+            ContentRequest.user_id == current_user.id,
+            ContentRequest.created_at >= first_day_of_month
+        )
+    )).scalar() or 0
 
     # Récupère les crédits max depuis la configuration
     max_credits = get_plan_credits(effective_plan)
@@ -54,29 +57,36 @@ def get_user_stats(
     # Pro/Business get additional detailed stats
     if analytics_enabled:
         # Total generated contents
-        total_generated = db.query(func.count(GeneratedContent.id)).join(
-            ContentRequest
-        ).filter(
-            ContentRequest.user_id == current_user.id
-        ).scalar() or 0
+        total_generated = (await db.execute(
+            select(func.count(GeneratedContent.id)).join(
+                GeneratedContent.request
+            ).where(
+                ContentRequest.user_id == current_user.id
+            )
+        )).scalar() or 0
+        total_generated += (await db.execute(
+            select(func.sum(ContentArchive.variants_count)).where(ContentArchive.user_id == current_user.id)
+        )).scalar() or 0
 
         # Total tokens used
-        total_tokens = db.query(func.sum(UsageAnalytics.tokens_used)).filter(
-            UsageAnalytics.user_id == current_user.id
-        ).scalar() or 0
+        total_tokens = (await db.execute(
+            select(func.sum(UsageAnalytics.tokens_used)).where(UsageAnalytics.user_id == current_user.id)
+        )).scalar() or 0
 
         # Average variants per request
         avg_variants = total_generated / total_requests if total_requests > 0 else 0
 
         # Most used tone
-        most_used_tone = db.query(
-            ContentRequest.tone,
-            func.count(ContentRequest.id).label('count')
-        ).filter(
-            ContentRequest.user_id == current_user.id
-        ).group_by(
-            ContentRequest.tone
-        ).order_by(func.count(ContentRequest.id).desc()).first()
+        most_used_tone = (await db.execute(
+            select(
+                ContentRequest.tone,
+                func.count(ContentRequest.id).label('count')
+            ).where(
+                ContentRequest.user_id == current_user.id
+            ).group_by(
+                ContentRequest.tone
+            ).order_by(func.count(ContentRequest.id).desc()).limit(1)
+        )).first()
 
         base_stats.update({
             "total_generated_contents": total_generated,
@@ -88,24 +98,26 @@ def get_user_stats(
     return base_stats
 
 @router.get("/daily-usage")
-def get_daily_usage(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+async def get_daily_usage(
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_read_db)
 ) -> List[Dict]:
     """Récupère l'utilisation quotidienne des 7 derniers jours"""
     
     seven_days_ago = datetime.utcnow() - timedelta(days=7)
     
     # Requêtes par jour
-    daily_data = db.query(
-        func.date(ContentRequest.created_at).label('date'),
-        func.count(ContentRequest.id).label('count')
-    ).filter(
-        ContentRequest.user_id == current_user.id,
-        ContentRequest.created_at >= seven_days_ago
-    ).group_by(
-        func.date(ContentRequest.created_at)
-    ).all()
+    daily_data = (await db.execute(
+        select(
+            func.date(ContentRequest.created_at).label('date'),
+            func.count(ContentRequest.id).label('count')
+        ).where(
+            ContentRequest.user_id == current_user.id,
+            ContentRequest.created_at >= seven_days_ago
+        ).group_by(
+            func.date(ContentRequest.created_at)
+        )
+    )).all()
     
     # Créer un dictionnaire pour tous les 7 derniers jours
     result = []
@@ -126,20 +138,22 @@ def get_daily_usage(
     return result
 
 @router.get("/platform-usage")
-def get_platform_usage(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+async def get_platform_usage(
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_read_db)
 ) -> List[Dict]:
     """Récupère la répartition par plateforme"""
     
-    platform_data = db.query(
-        ContentRequest.platform,
-        func.count(ContentRequest.id).label('count')
-    ).filter(
-        ContentRequest.user_id == current_user.id
-    ).group_by(
-        ContentRequest.platform
-    ).all()
+    platform_data = (await db.execute(
+        select(
+            ContentRequest.platform,
+            func.count(ContentRequest.id).label('count')
+        ).where(
+            ContentRequest.user_id == current_user.id
+        ).group_by(
+            ContentRequest.platform
+        )
+    )).all()
     
     # Noms conviviaux pour les plateformes
     platform_names = {
@@ -160,41 +174,57 @@ def get_platform_usage(
     
     return result
 
+RECENT_ACTIVITY_FIELDS = ("id", "platform", "tone", "preview", "created_at")
+RECENT_ACTIVITY_PREVIEW_LENGTH = 100
+
+
 @router.get("/recent-activity")
-def get_recent_activity(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
-    limit: int = 10
+async def get_recent_activity(
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_read_db),
+    limit: int = 10,
+    fields: Optional[str] = None,
+    view: str = Query("preview", pattern=VIEW_PATTERN)
 ) -> List[Dict]:
-    """Récupère les activités récentes de l'utilisateur"""
-    
-    recent_requests = db.query(ContentRequest).filter(
+    """Récupère les activités récentes de l'utilisateur (view=full : texte original complet dans preview)"""
+    selected = parse_fields(fields, RECENT_ACTIVITY_FIELDS)
+    want_preview = wants(selected, "preview")
+
+    # Texte complet lu seulement en view=full ; sinon aperçu tronqué en SQL
+    query = select(ContentRequest).where(
         ContentRequest.user_id == current_user.id
     ).order_by(
         ContentRequest.created_at.desc()
-    ).limit(limit).all()
-    
+    ).limit(limit)
+    if view == "full" and want_preview:
+        query = query.options(joinedload(ContentRequest.original_blob))
+    recent_requests = (await db.execute(query)).scalars().all()
+
+    previews = {}
+    if view == "preview" and want_preview:
+        previews = await text_previews_async(
+            db, [request.original_text_hash for request in recent_requests], RECENT_ACTIVITY_PREVIEW_LENGTH
+        )
+
     result = []
     for request in recent_requests:
-        result.append({
-            "id": request.id,
-            "platform": request.platform,
-            "tone": request.tone,
-            "preview": request.original_text[:100] + "..." if len(request.original_text) > 100 else request.original_text,
-            "created_at": request.created_at.isoformat()
-        })
+        item = {"id": request.id, "platform": request.platform, "tone": request.tone}
+        if want_preview:
+            item["preview"] = previews.get(request.original_text_hash) if view == "preview" else request.original_text
+        item["created_at"] = request.created_at.isoformat()
+        result.append(pick_fields(item, selected))
 
     return result
 
 @router.get("/format-analytics")
-def get_format_analytics(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+async def get_format_analytics(
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_read_db)
 ) -> Dict:
     """Analyse détaillée par format (Pro/Business uniquement)"""
 
     # Get effective plan (considering team membership)
-    effective_plan = get_effective_plan(current_user, db)
+    effective_plan = await get_effective_plan_async(current_user, db)
 
     # Check if user has analytics feature
     plan_config = get_plan_config(effective_plan)
@@ -207,20 +237,22 @@ def get_format_analytics(
         )
 
     # Get format distribution with detailed stats
-    format_stats = db.query(
-        GeneratedContent.format_name,
-        func.count(GeneratedContent.id).label('total_generated'),
-        func.avg(func.length(GeneratedContent.polished_text)).label('avg_length'),
-        func.min(GeneratedContent.created_at).label('first_used'),
-        func.max(GeneratedContent.created_at).label('last_used')
-    ).join(
-        ContentRequest
-    ).filter(
-        ContentRequest.user_id == current_user.id,
-        GeneratedContent.format_name.isnot(None)
-    ).group_by(
-        GeneratedContent.format_name
-    ).all()
+    format_stats = (await db.execute(
+        select(
+            GeneratedContent.format_name,
+            func.count(GeneratedContent.id).label('total_generated'),
+            func.avg(func.length(GeneratedContent.polished_text)).label('avg_length'),
+            func.min(GeneratedContent.created_at).label('first_used'),
+            func.max(GeneratedContent.created_at).label('last_used')
+        ).join(
+            GeneratedContent.request
+        ).where(
+            ContentRequest.user_id == current_user.id,
+            GeneratedContent.format_name.isnot(None)
+        ).group_by(
+            GeneratedContent.format_name
+        )
+    )).all()
 
     # Format names mapping
     format_labels = {
@@ -247,19 +279,21 @@ def get_format_analytics(
     formats_data.sort(key=lambda x: x['total_generated'], reverse=True)
 
     # Get tone performance by format
-    tone_format_stats = db.query(
-        ContentRequest.tone,
-        GeneratedContent.format_name,
-        func.count(GeneratedContent.id).label('count')
-    ).join(
-        GeneratedContent
-    ).filter(
-        ContentRequest.user_id == current_user.id,
-        GeneratedContent.format_name.isnot(None)
-    ).group_by(
-        ContentRequest.tone,
-        GeneratedContent.format_name
-    ).all()
+    tone_format_stats = (await db.execute(
+        select(
+            ContentRequest.tone,
+            GeneratedContent.format_name,
+            func.count(GeneratedContent.id).label('count')
+        ).join(
+            ContentRequest.generated_contents
+        ).where(
+            ContentRequest.user_id == current_user.id,
+            GeneratedContent.format_name.isnot(None)
+        ).group_by(
+            ContentRequest.tone,
+            GeneratedContent.format_name
+        )
+    )).all()
 
     tone_distribution = {}
     for stat in tone_format_stats:
@@ -275,15 +309,15 @@ def get_format_analytics(
     }
 
 @router.get("/performance-summary")
-def get_performance_summary(
+async def get_performance_summary(
     days: int = 30,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_read_db)
 ) -> Dict:
     """Résumé des performances (Pro/Business uniquement)"""
 
     # Get effective plan (considering team membership)
-    effective_plan = get_effective_plan(current_user, db)
+    effective_plan = await get_effective_plan_async(current_user, db)
 
     # Check if user has analytics feature
     plan_config = get_plan_config(effective_plan)
@@ -300,42 +334,50 @@ def get_performance_summary(
     start_date = end_date - timedelta(days=days)
 
     # Get activity by day of week
-    day_of_week_stats = db.query(
-        extract('dow', ContentRequest.created_at).label('day_of_week'),
-        func.count(ContentRequest.id).label('count')
-    ).filter(
-        ContentRequest.user_id == current_user.id,
-        ContentRequest.created_at >= start_date
-    ).group_by(
-        extract('dow', ContentRequest.created_at)
-    ).all()
+    day_of_week_stats = (await db.execute(
+        select(
+            extract('dow', ContentRequest.created_at).label('day_of_week'),
+            func.count(ContentRequest.id).label('count')
+        ).where(
+            ContentRequest.user_id == current_user.id,
+            ContentRequest.created_at >= start_date
+        ).group_by(
+            extract('dow', ContentRequest.created_at)
+        )
+    )).all()
 
     # Map day numbers to names
     day_names = ['Dimanche', 'Lundi', 'Mardi', 'Mercredi', 'Jeudi', 'Vendredi', 'Samedi']
     activity_by_day = {day_names[int(stat.day_of_week)]: stat.count for stat in day_of_week_stats}
 
     # Get activity by hour of day
-    hour_stats = db.query(
-        extract('hour', ContentRequest.created_at).label('hour'),
-        func.count(ContentRequest.id).label('count')
-    ).filter(
-        ContentRequest.user_id == current_user.id,
-        ContentRequest.created_at >= start_date
-    ).group_by(
-        extract('hour', ContentRequest.created_at)
-    ).all()
+    hour_stats = (await db.execute(
+        select(
+            extract('hour', ContentRequest.created_at).label('hour'),
+            func.count(ContentRequest.id).label('count')
+        ).where(
+            ContentRequest.user_id == current_user.id,
+            ContentRequest.created_at >= start_date
+        ).group_by(
+            extract('hour', ContentRequest.created_at)
+        )
+    )).all()
 
     activity_by_hour = {int(stat.hour): stat.count for stat in hour_stats}
 
     # Get content efficiency (avg chars per content)
-    avg_content_length = db.query(
-        func.avg(func.length(GeneratedContent.polished_text))
-    ).join(
-        ContentRequest
-    ).filter(
-        ContentRequest.user_id == current_user.id,
-        ContentRequest.created_at >= start_date
-    ).scalar() or 0
+    avg_content_length = (await db.execute(
+        select(
+            func.avg(func.length(GeneratedContent.polished_text))
+        ).join(
+            GeneratedContent.request
+        ).where(
+            ContentRequest.user_id == current_user.id,
+            ContentRequest.created_at >= start_date,
+            # Une variante n'est jamais antérieure à sa requête : borne explicite pour l'élagage des partitions
+            GeneratedContent.created_at >= start_date
+        )
+    )).scalar() or 0
 
     return {
         "period_days": days,
@@ -1,14 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, func
+from sqlalchemy.orm import joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from pydantic import BaseModel
 from datetime import datetime
 
-from app.database import get_db
-from app.models import User, ContentRequest, GeneratedContent, UsageAnalytics, Platform
+from app.database import get_async_db
+from app.models import User, ContentRequest, GeneratedContent, ContentArchive, UsageAnalytics, Platform
 from app.auth_api import get_current_user_from_api_key
 from app.ai_service import polish_content_multi_format
+from app.posting_time import record_content_request
+from app.crud import mark_user_write, create_generated_contents_async
 from app.plan_config import PLAN_LIMITS
+from app.pagination import apply_keyset, split_page, cached_count
+from app.fieldsets import VIEW_PATTERN, parse_fields, pick_fields, wants, text_previews_async
+from app.content_archive import get_variants_async
 
 router = APIRouter(prefix="/api/v1", tags=["API v1"])
 
@@ -42,11 +50,12 @@ class ContentGenerateResponse(BaseModel):
 
 
 class ContentHistoryItem(BaseModel):
+    # Champs facultatifs : seuls ceux demandés par fields= sont renvoyés
     id: int
-    original_text: str
-    platform: str
-    created_at: datetime
-    variants_count: int
+    original_text: Optional[str] = None
+    platform: Optional[str] = None
+    created_at: Optional[datetime] = None
+    variants_count: Optional[int] = None
 
     class Config:
         from_attributes = True
@@ -57,7 +66,7 @@ class ContentHistoryItem(BaseModel):
 async def generate_content(
     request: ContentGenerateRequest,
     current_user: User = Depends(get_current_user_from_api_key),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Génère du contenu poli pour une plateforme spécifique.
@@ -99,12 +108,14 @@ async def generate_content(
         language=request.language
     )
     db.add(content_request)
-    db.commit()
-    db.refresh(content_request)
+    await db.commit()
+    record_content_request(current_user.id, content_request.platform, content_request.created_at)
 
     # Générer le contenu avec l'AI
     try:
-        formats_dict, tokens_used = polish_content_multi_format(
+        # Génération synchrone (appels Groq bloquants) : exécutée hors de l'event loop
+        formats_dict, tokens_used = await run_in_threadpool(
+            polish_content_multi_format,
             original_text=request.text,
             tone=request.tone or "professional",
             language=request.language or "fr",
@@ -146,17 +157,12 @@ async def generate_content(
                         "format": request.platform
                     })
 
-        # Sauvegarder les variantes générées
-        generated_variants = []
-        for idx, variant in enumerate(variants, 1):
-            gen_content = GeneratedContent(
-                request_id=content_request.id,
-                polished_text=variant["text"],
-                format_name=variant.get("format"),
-                variant_number=idx
-            )
-            db.add(gen_content)
-            generated_variants.append(gen_content)
+        # Sauvegarder les variantes générées (un seul INSERT ... RETURNING)
+        generated_variants = await create_generated_contents_async(
+            db,
+            content_request.id,
+            [(variant.get("format"), idx, variant["text"]) for idx, variant in enumerate(variants, 1)]
+        )
 
         # Déduire un crédit
         current_user.credits_remaining -= 1
@@ -169,35 +175,40 @@ async def generate_content(
         )
         db.add(analytics)
 
-        db.commit()
-
-        # Rafraîchir pour obtenir les IDs
-        for variant in generated_variants:
-            db.refresh(variant)
+        mark_user_write(current_user)
+        await db.commit()
 
         return ContentGenerateResponse(
             request_id=content_request.id,
             original_text=request.text,
             platform=request.platform,
-            variants=[GeneratedContentResponse.from_orm(v) for v in generated_variants],
+            variants=[GeneratedContentResponse(**v) for v in generated_variants],
             credits_used=1,
             credits_remaining=current_user.credits_remaining
         )
 
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error generating content: {str(e)}"
         )
 
 
-@router.get("/content", response_model=List[ContentHistoryItem])
+CONTENT_HISTORY_FIELDS = ("id", "original_text", "platform", "created_at", "variants_count")
+
+
+@router.get("/content", response_model=List[ContentHistoryItem], response_model_exclude_unset=True)
 async def get_content_history(
+    response: Response,
     limit: int = 50,
     offset: int = 0,
+    cursor: Optional[str] = None,
+    include_total: bool = False,
+    fields: Optional[str] = None,
+    view: str = Query("full", pattern=VIEW_PATTERN),
     current_user: User = Depends(get_current_user_from_api_key),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Récupère l'historique des contenus générés.
@@ -206,36 +217,73 @@ async def get_content_history(
 
     Args:
         limit: Nombre maximum de résultats (défaut: 50, max: 100)
-        offset: Nombre de résultats à sauter (pagination)
+        offset: Nombre de résultats à sauter (déprécié : préférer cursor)
+        cursor: Valeur de l'en-tête X-Next-Cursor de la page précédente
+        include_total: Renvoie le total (mis en cache) dans l'en-tête X-Total-Count
+        fields: Champs renvoyés, séparés par des virgules (id, original_text, platform, created_at, variants_count)
+        view: "preview" tronque original_text côté serveur
 
     Returns:
         Liste de l'historique des contenus générés
+        (en-tête X-Next-Cursor absent sur la dernière page)
     """
     # Limiter le limit à 100
     if limit > 100:
         limit = 100
+    selected = parse_fields(fields, CONTENT_HISTORY_FIELDS)
+    preview = view == "preview"
+    want_original = wants(selected, "original_text")
+
+    # Récupérer les requêtes de contenu avec leur nombre de variantes (une seule requête)
+    live_count = select(func.count(GeneratedContent.id)).where(
+        GeneratedContent.request_id == ContentRequest.id
+    ).correlate(ContentRequest).scalar_subquery()
+    # Variantes archivées à froid (app.content_archive)
+    archived_count = select(ContentArchive.variants_count).where(
+        ContentArchive.request_id == ContentRequest.id
+    ).correlate(ContentRequest).scalar_subquery()
+    variants_count = live_count + func.coalesce(archived_count, 0)
+
+    query = select(ContentRequest).where(ContentRequest.user_id == current_user.id)
+    if wants(selected, "variants_count"):
+        query = query.add_columns(variants_count)
+    if want_original and not preview:
+        # Texte complet lu seulement s'il est renvoyé (sinon aperçu tronqué en SQL ou champ non demandé)
+        query = query.options(joinedload(ContentRequest.original_blob))
+    if include_total:
+        total = await cached_count(
+            db, ("api_v1_content", current_user.id),
+            select(ContentRequest.id).where(ContentRequest.user_id == current_user.id),
+            last_write_at=current_user.last_write_at
+        )
+        response.headers["X-Total-Count"] = str(total)
+
+    # Curseur keyset (coût constant quelle que soit la profondeur) ; offset seulement sans curseur
+    page_query = apply_keyset(query, ContentRequest.created_at, ContentRequest.id, cursor)
+    if offset and not cursor:
+        page_query = page_query.offset(offset)
+    rows, next_cursor = split_page(
+        (await db.execute(page_query.limit(limit + 1))).all(),
+        limit,
+        lambda row: (row[0].created_at, row[0].id)
+    )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
 
-    # Récupérer les requêtes de contenu
-    requests = db.query(ContentRequest).filter(
-        ContentRequest.user_id == current_user.id
-    ).order_by(
-        ContentRequest.created_at.desc()
-    ).limit(limit).offset(offset).all()
+    previews = {}
+    if preview and want_original:
+        previews = await text_previews_async(db, [row[0].original_text_hash for row in rows])
 
-    # Compter les variantes pour chaque requête
     results = []
-    for req in requests:
-        variants_count = db.query(GeneratedContent).filter(
-            GeneratedContent.request_id == req.id
-        ).count()
-
-        results.append(ContentHistoryItem(
-            id=req.id,
-            original_text=req.original_text,
-            platform=req.platform,
-            created_at=req.created_at,
-            variants_count=variants_count
-        ))
+    for row in rows:
+        req = row[0]
+        item = {"id": req.id}
+        if want_original:
+            item["original_text"] = previews.get(req.original_text_hash) if preview else req.original_text
+        item["platform"] = req.platform
+        item["created_at"] = req.created_at
+        item["variants_count"] = row[1] if len(row) > 1 else None
+        results.append(ContentHistoryItem(**pick_fields(item, selected)))
 
     return results
 
@@ -244,7 +292,7 @@ async def get_content_history(
 async def get_content_by_id(
     request_id: int,
     current_user: User = Depends(get_current_user_from_api_key),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Récupère un contenu généré spécifique par son ID.
@@ -258,10 +306,12 @@ async def get_content_by_id(
         Le contenu généré avec toutes ses variantes
     """
     # Récupérer la requête
-    content_req = db.query(ContentRequest).filter(
-        ContentRequest.id == request_id,
-        ContentRequest.user_id == current_user.id
-    ).first()
+    content_req = (await db.execute(
+        select(ContentRequest).options(joinedload(ContentRequest.original_blob)).where(
+            ContentRequest.id == request_id,
+            ContentRequest.user_id == current_user.id
+        )
+    )).scalars().first()
 
     if not content_req:
         raise HTTPException(
@@ -269,10 +319,8 @@ async def get_content_by_id(
             detail="Content not found"
         )
 
-    # Récupérer les variantes
-    variants = db.query(GeneratedContent).filter(
-        GeneratedContent.request_id == request_id
-    ).order_by(GeneratedContent.variant_number).all()
+    # Récupérer les variantes (en table ou réhydratées depuis l'archive)
+    variants = sorted(await get_variants_async(db, content_req), key=lambda variant: variant.variant_number or 0)
 
     return ContentGenerateResponse(
         request_id=content_req.id,
@@ -1,5 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException, Header
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Header, Query
+from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import and_, or_
 from typing import List, Optional
 from datetime import datetime, timedelta
@@ -9,6 +9,8 @@ from app.database import get_db
 from app.plan_config import get_plan_config
 from app.utils.team_utils import get_effective_plan, get_user_team
 from app.email_service import send_calendar_reminder
+from app.posting_time import record_scheduled_content
+from app.fieldsets import VIEW_PATTERN, parse_fields, pick_fields, wants, variant_previews
 import os
 
 router = APIRouter(prefix="/calendar", tags=["calendar"])
@@ -80,7 +82,7 @@ def schedule_content(
     # If generated_content_id is provided, verify ownership (including team content)
     if data.generated_content_id:
         generated_content = db.query(models.GeneratedContent).join(
-            models.ContentRequest
+            models.GeneratedContent.request
         ).filter(
             models.GeneratedContent.id == data.generated_content_id,
             models.ContentRequest.user_id.in_(allowed_user_ids)
@@ -104,6 +106,7 @@ def schedule_content(
     db.add(scheduled)
     db.commit()
     db.refresh(scheduled)
+    record_scheduled_content(current_user.id, scheduled.platform, scheduled.scheduled_date, scheduled.status)
 
     return {
         "id": scheduled.id,
@@ -114,15 +117,31 @@ def schedule_content(
         "created_at": scheduled.created_at.isoformat()
     }
 
+# Champs des éléments du calendrier (fields=) et longueur des aperçus
+CALENDAR_FIELDS = (
+    "id", "time", "platform", "status", "title", "notes", "content_preview",
+    "content_request_id", "generated_content_id"
+)
+UPCOMING_FIELDS = ("id", "scheduled_date", "platform", "title", "content_preview", "days_until")
+CALENDAR_PREVIEW_LENGTH = 100
+UPCOMING_PREVIEW_LENGTH = 150
+
+
 @router.get("/view")
 def get_calendar_view(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     platform: Optional[str] = None,
+    fields: Optional[str] = None,
+    view: str = Query("preview", pattern=VIEW_PATTERN),
     current_user: models.User = Depends(auth.get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get calendar view of scheduled content (Pro/Business only)"""
+    """
+    Get calendar view of scheduled content (Pro/Business only)
+    fields= limite les champs ; view=full renvoie le texte complet dans content_preview
+    """
+    selected = parse_fields(fields, CALENDAR_FIELDS)
 
     # Get effective plan (considering team membership)
     effective_plan = get_effective_plan(current_user, db)
@@ -175,6 +194,14 @@ def get_calendar_view(
     for item in scheduled_items:
         print(f"  - ID {item.id}: {item.scheduled_date} ({item.scheduled_date.date().isoformat()})")
 
+    # Aperçus de tous les contenus en une requête, tronqués en SQL
+    previews = {}
+    if wants(selected, "content_preview"):
+        previews = variant_previews(
+            db, [item.generated_content_id for item in scheduled_items],
+            None if view == "full" else CALENDAR_PREVIEW_LENGTH
+        )
+
     # Group by date
     calendar_data = {}
     for item in scheduled_items:
@@ -183,26 +210,17 @@ def get_calendar_view(
         if date_key not in calendar_data:
             calendar_data[date_key] = []
 
-        # Get content preview if available
-        content_preview = None
-        if item.generated_content_id:
-            gen_content = db.query(models.GeneratedContent).filter(
-                models.GeneratedContent.id == item.generated_content_id
-            ).first()
-            if gen_content:
-                content_preview = gen_content.polished_text[:100] + "..." if len(gen_content.polished_text) > 100 else gen_content.polished_text
-
-        calendar_data[date_key].append({
+        calendar_data[date_key].append(pick_fields({
             "id": item.id,
             "time": item.scheduled_date.strftime("%H:%M"),
             "platform": item.platform,
             "status": item.status,
             "title": item.title,
             "notes": item.notes,
-            "content_preview": content_preview,
+            "content_preview": previews.get(item.generated_content_id),
             "content_request_id": item.content_request_id,
             "generated_content_id": item.generated_content_id
-        })
+        }, selected))
 
     print(f"🔑 Calendar data keys: {list(calendar_data.keys())}")
 
@@ -244,6 +262,8 @@ def update_scheduled_content(
     if not scheduled:
         raise HTTPException(status_code=404, detail="Scheduled content not found")
 
+    previous = (scheduled.platform, scheduled.scheduled_date, scheduled.status)
+
     # Update fields
     if data.scheduled_date:
         scheduled.scheduled_date = data.scheduled_date
@@ -260,6 +280,8 @@ def update_scheduled_content(
 
     db.commit()
     db.refresh(scheduled)
+    record_scheduled_content(current_user.id, *previous, count=-1)
+    record_scheduled_content(current_user.id, scheduled.platform, scheduled.scheduled_date, scheduled.status)
 
     return {
         "id": scheduled.id,
@@ -301,18 +323,23 @@ def delete_scheduled_content(
     if not scheduled:
         raise HTTPException(status_code=404, detail="Scheduled content not found")
 
+    previous = (scheduled.platform, scheduled.scheduled_date, scheduled.status)
     db.delete(scheduled)
     db.commit()
+    record_scheduled_content(current_user.id, *previous, count=-1)
 
     return {"message": "Scheduled content deleted successfully"}
 
 @router.get("/upcoming")
 def get_upcoming_content(
     days: int = 7,
+    fields: Optional[str] = None,
+    view: str = Query("preview", pattern=VIEW_PATTERN),
     current_user: models.User = Depends(auth.get_current_user),
     db: Session = Depends(get_db)
 ):
     """Get upcoming scheduled content (Pro/Business only)"""
+    selected = parse_fields(fields, UPCOMING_FIELDS)
 
     # Get effective plan (considering team membership)
     effective_plan = get_effective_plan(current_user, db)
@@ -338,25 +365,24 @@ def get_upcoming_content(
         models.ScheduledContent.status == "scheduled"
     ).order_by(models.ScheduledContent.scheduled_date).all()
 
+    # Aperçus de tous les contenus en une requête, tronqués en SQL
+    previews = {}
+    if wants(selected, "content_preview"):
+        previews = variant_previews(
+            db, [item.generated_content_id for item in upcoming],
+            None if view == "full" else UPCOMING_PREVIEW_LENGTH
+        )
+
     results = []
     for item in upcoming:
-        # Get content preview
-        content_preview = None
-        if item.generated_content_id:
-            gen_content = db.query(models.GeneratedContent).filter(
-                models.GeneratedContent.id == item.generated_content_id
-            ).first()
-            if gen_content:
-                content_preview = gen_content.polished_text[:150] + "..." if len(gen_content.polished_text) > 150 else gen_content.polished_text
-
-        results.append({
+        results.append(pick_fields({
             "id": item.id,
             "scheduled_date": item.scheduled_date.isoformat(),
             "platform": item.platform,
             "title": item.title,
-            "content_preview": content_preview,
+            "content_preview": previews.get(item.generated_content_id),
             "days_until": (item.scheduled_date.date() - now.date()).days
-        })
+        }, selected))
 
     return {
         "upcoming": results,
@@ -410,7 +436,9 @@ def trigger_reminders(
 
             content_preview = "Votre contenu planifié"
             if scheduled.generated_content_id:
-                gen_content = db.query(models.GeneratedContent).filter(
+                gen_content = db.query(models.GeneratedContent).options(
+                    joinedload(models.GeneratedContent.polished_blob)
+                ).filter(
                     models.GeneratedContent.id == scheduled.generated_content_id
                 ).first()
                 if gen_content:
@@ -467,7 +495,9 @@ def trigger_reminders(
 
             content_preview = "Votre contenu planifié"
             if scheduled.generated_content_id:
-                gen_content = db.query(models.GeneratedContent).filter(
+                gen_content = db.query(models.GeneratedContent).options(
+                    joinedload(models.GeneratedContent.polished_blob)
+                ).filter(
                     models.GeneratedContent.id == scheduled.generated_content_id
                 ).first()
                 if gen_content:
@@ -540,7 +570,9 @@ def delete_scheduled_content(
         raise HTTPException(status_code=404, detail="Contenu planifié non trouvé")
 
     # Delete it
+    previous = (scheduled.platform, scheduled.scheduled_date, scheduled.status)
     db.delete(scheduled)
     db.commit()
+    record_scheduled_content(current_user.id, *previous, count=-1)
 
     return {"success": True, "message": "Contenu planifié supprimé"}
@@ -1,14 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy import select, func, or_
+from sqlalchemy.orm import Session, selectinload, joinedload
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
+from fractions import Fraction
 from pydantic import BaseModel
 from app import crud, schemas, auth, models
-from app.database import get_db
-from app.utils.team_utils import get_effective_plan, get_effective_credits, deduct_credits
-import io
-import zipfile
-from datetime import datetime
+from app.database import get_db, run_in_transaction
+from app.utils.team_utils import (
+    get_effective_plan, get_effective_credits, get_user_team, get_user_team_async,
+    get_effective_plan_async, visible_content_query
+)
+from app.plan_config import get_history_cutoff
+from app.responses import FastJSONResponse
+from app.search import search_filter, search_requests
+from app.fieldsets import VIEW_PATTERN, parse_fields, wants, text_previews_async, truncate_text
+from app.pagination import apply_keyset, split_page, cached_count
+from app.content_archive import (
+    iter_variants, get_variants, get_variants_async, get_variants_for_requests_async
+)
+from app.posting_time import record_content_request
+from app.zip_stream import stream_zip
+from app.bulk_export import (
+    BULK_EXPORT_FORMATS, BULK_EXPORT_SYNC_MAX_REQUESTS, export_query, count_requests, export_chunks, run_export_job
+)
+import itertools
+import os
+from datetime import datetime, timezone
 
 router = APIRouter(prefix="/content", tags=["content"])
 
@@ -25,6 +44,44 @@ class IdeasResponse(BaseModel):
     theme: str
     language: str
 
+
+# Schema for bulk export
+class BulkExportRequest(BaseModel):
+    format: str = "ndjson"  # ndjson, csv, zip
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+    include_team: bool = True
+    cursor: Optional[str] = None  # Reprise : curseur du dernier enregistrement reçu
+
+
+# Schemas for partial regeneration
+class RegenerateTarget(BaseModel):
+    format: str
+    variant: Optional[int] = None  # None = toutes les variantes de ce format
+
+
+class RegenerateRequest(BaseModel):
+    targets: List[RegenerateTarget]
+
+
+def get_custom_style_analysis(tone: Optional[str], user_id: int, db: Session) -> Optional[str]:
+    """Retourne l'analyse du profil de style si le tone est de la forme "custom_<id>" """
+    if not tone or not tone.startswith("custom_"):
+        return None
+
+    try:
+        profile_id = int(tone.replace("custom_", ""))
+    except ValueError:
+        return None  # Si l'ID n'est pas valide, on continue avec le tone normal
+
+    style_profile = db.query(models.UserStyleProfile).filter(
+        models.UserStyleProfile.id == profile_id,
+        models.UserStyleProfile.user_id == user_id,
+        models.UserStyleProfile.status == "ready"
+    ).first()
+
+    return style_profile.style_analysis if style_profile else None
+
 @router.post("/polish")
 def polish_content(
     request: schemas.ContentRequestCreate,
@@ -41,20 +98,17 @@ def polish_content(
         if current_user.has_used_pro_trial:
             raise HTTPException(status_code=403, detail="Vous avez déjà utilisé votre essai Pro gratuit")
 
-        # Marquer l'essai comme utilisé
-        current_user.has_used_pro_trial = True
-        current_user.pro_trial_activated_at = datetime.utcnow()
-        db.commit()
+        # L'essai est marqué comme utilisé dans la transaction finale
         using_pro_trial = True
         print(f"🌟 User {current_user.id} is using Pro trial!")
 
-    # Check effective credits (skip if using Pro trial)
+    # Check effective credits (skip if using Pro trial) - revérifié sous verrou avant d'écrire
     if not using_pro_trial:
         effective_credits = get_effective_credits(current_user, db)
         if effective_credits <= 0:
             raise HTTPException(status_code=403, detail="Crédits insuffisants")
 
-    content_request = crud.create_content_request(db, request, current_user.id)
+    user_id = current_user.id
 
     # Get effective plan (force 'pro' if using trial, otherwise use current plan)
     if using_pro_trial:
@@ -67,20 +121,10 @@ def polish_content(
     from app.plan_config import get_plan_config
 
     # Récupérer le style personnalisé si le tone commence par "custom_"
-    custom_style_analysis = None
-    if request.tone.startswith("custom_"):
-        try:
-            profile_id = int(request.tone.replace("custom_", ""))
-            style_profile = db.query(models.UserStyleProfile).filter(
-                models.UserStyleProfile.id == profile_id,
-                models.UserStyleProfile.user_id == current_user.id,
-                models.UserStyleProfile.status == "ready"
-            ).first()
-
-            if style_profile:
-                custom_style_analysis = style_profile.style_analysis
-        except ValueError:
-            pass  # Si l'ID n'est pas valide, on continue avec le tone normal
+    custom_style_analysis = get_custom_style_analysis(request.tone, current_user.id, db)
+
+    # Fin des lectures : la connexion retourne au pool pendant la génération (appels Groq longs)
+    db.rollback()
 
     all_formats, tokens_used = polish_content_multi_format(
         request.original_text,
@@ -115,48 +159,37 @@ def polish_content(
         )
     
     # Sauvegarde tous les formats avec leurs variantes
-    generated_contents = []
-
+    variants = []
     for format_name, content_data in all_formats.items():
         # Si content_data est une liste (plusieurs variantes), traiter chacune
         if isinstance(content_data, list):
             for variant_idx, content_text in enumerate(content_data, 1):
-                generated = crud.create_generated_content(
-                    db,
-                    content_request.id,
-                    content_text,
-                    variant_number=variant_idx,  # Use actual variant index (1, 2, 3)
-                    format_name=format_name
-                )
-                generated_contents.append({
-                    "id": generated.id,
-                    "format": format_name,
-                    "variant": variant_idx,
-                    "content": content_text,
-                    "created_at": generated.created_at
-                })
+                variants.append((format_name, variant_idx, content_text))
         else:
             # Une seule variante (plans Free/Starter)
-            generated = crud.create_generated_content(
-                db,
-                content_request.id,
-                content_data,
-                variant_number=1,  # Always 1 for single variant
-                format_name=format_name
-            )
-            generated_contents.append({
-                "id": generated.id,
-                "format": format_name,
-                "variant": 1,
-                "content": content_data,
-                "created_at": generated.created_at
-            })
-
-    # Deduct credits from team or personal pool (skip if using Pro trial)
-    if not using_pro_trial:
-        deduct_credits(current_user, db, amount=1)
+            variants.append((format_name, 1, content_data))
 
-    crud.create_usage_analytics(db, current_user.id, tokens_used, None)
+    # Une seule transaction courte : verrou du compte, revérification, requête, variantes, crédit, analytics
+    try:
+        content_request, rows = run_in_transaction(
+            db,
+            lambda tx: crud.persist_polish(tx, user_id, request, variants, tokens_used, using_pro_trial)
+        )
+    except crud.PolishRejected as e:
+        raise HTTPException(status_code=403, detail=str(e))
+
+    record_content_request(user_id, content_request.platform, content_request.created_at)
+
+    generated_contents = [
+        {
+            "id": row["id"],
+            "format": row["format_name"],
+            "variant": row["variant_number"],
+            "content": row["polished_text"],
+            "created_at": row["created_at"]
+        }
+        for row in rows
+    ]
 
     return {
         "request_id": content_request.id,
@@ -168,6 +201,128 @@ def polish_content(
     }
 
 
+@router.post("/regenerate/{request_id}")
+def regenerate_content(
+    request_id: int,
+    data: RegenerateRequest,
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Régénère uniquement certains formats/variantes d'une requête existante.
+    Réutilise le ton, la langue et le profil de style de la requête d'origine,
+    met à jour les contenus en place et facture une fraction de crédit
+    proportionnelle au nombre de variantes régénérées.
+    """
+    from app.ai_service import regenerate_format_variants, FORMAT_PROMPTS
+
+    if not data.targets:
+        raise HTTPException(status_code=400, detail="Aucun format à régénérer")
+
+    content_request = db.query(models.ContentRequest).options(
+        joinedload(models.ContentRequest.original_blob)
+    ).filter(
+        models.ContentRequest.id == request_id,
+        models.ContentRequest.user_id == current_user.id
+    ).first()
+
+    if not content_request:
+        raise HTTPException(status_code=404, detail="Content request not found")
+
+    effective_credits = get_effective_credits(current_user, db)
+    if effective_credits <= 0:
+        raise HTTPException(status_code=403, detail="Crédits insuffisants")
+
+    # Variantes en table ou décodées de l'archive (en mémoire) : l'archive n'est remise en table qu'à l'écriture
+    generated_contents = get_variants(db, content_request)
+
+    existing = {(gc.format_name, gc.variant_number): gc for gc in generated_contents}
+
+    # Résout les cibles en couples (format, variante) existants
+    to_regenerate = []
+    for target in data.targets:
+        if target.format not in FORMAT_PROMPTS:
+            raise HTTPException(status_code=400, detail=f"Format invalide: {target.format}")
+
+        if target.variant is None:
+            keys = sorted(key for key in existing if key[0] == target.format)
+        else:
+            keys = [(target.format, target.variant)] if (target.format, target.variant) in existing else []
+
+        if not keys:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Aucun contenu généré pour {target.format}" + (f" variante {target.variant}" if target.variant else "")
+            )
+
+        for key in keys:
+            if key not in to_regenerate:
+                to_regenerate.append(key)
+
+    # Nombre de variantes de la requête d'origine (pour garder les mêmes consignes par variante)
+    num_variants = max(gc.variant_number or 1 for gc in generated_contents)
+
+    custom_style_analysis = get_custom_style_analysis(content_request.tone, current_user.id, db)
+    original_text, tone, language = content_request.original_text, content_request.tone, content_request.language
+    # Clés primaires des variantes ciblées (les objets sont expirés par le rollback)
+    variant_keys = {key: (existing[key].id, existing[key].created_at) for key in to_regenerate}
+    variants_total = len(generated_contents)
+    user_id = current_user.id
+
+    # Fin des lectures : aucune transaction ni verrou pendant la génération (appels Groq longs)
+    db.rollback()
+
+    regenerated, tokens_used = regenerate_format_variants(
+        original_text,
+        to_regenerate,
+        tone=tone or "professional",
+        language=language or "fr",
+        num_variants=num_variants,
+        custom_style_analysis=custom_style_analysis
+    )
+
+    if not regenerated:
+        raise HTTPException(status_code=500, detail="Erreur lors de la régénération. Veuillez réessayer.")
+
+    # Une requête complète coûte 1 crédit : on facture la part régénérée
+    credit_fraction = Fraction(len(regenerated), variants_total)
+
+    # Une seule transaction courte : verrou du compte, débit revérifié, textes, analytics
+    try:
+        credits_deducted = run_in_transaction(
+            db,
+            lambda tx: crud.persist_regeneration(
+                tx, user_id, content_request, variant_keys, regenerated, credit_fraction, tokens_used
+            )
+        )
+    except crud.PolishRejected as e:
+        raise HTTPException(status_code=403, detail=str(e))
+
+    updated_contents = [
+        {
+            "id": variant_keys[(format_name, variant_number)][0],
+            "format": format_name,
+            "variant": variant_number,
+            "content": content_text,
+            "created_at": variant_keys[(format_name, variant_number)][1]
+        }
+        for (format_name, variant_number), content_text in regenerated.items()
+    ]
+
+    return {
+        "request_id": request_id,
+        "formats": updated_contents,
+        "failed": [
+            {"format": format_name, "variant": variant_number}
+            for format_name, variant_number in to_regenerate
+            if (format_name, variant_number) not in regenerated
+        ],
+        "tokens_used": tokens_used,
+        "credit_fraction": round(float(credit_fraction), 4),
+        "credits_deducted": credits_deducted
+    }
+
+
 @router.post("/ideas", response_model=IdeasResponse)
 def generate_ideas(
     request: IdeasRequest,
@@ -203,113 +358,209 @@ def generate_ideas(
     )
 
 
+async def _history_query(current_user: models.User, show_team: bool, db: AsyncSession):
+    """Retourne (équipe, select(ContentRequest) restreint au périmètre et à la rétention du plan)"""
+    # Get user's team if they are a member
+    team = await get_user_team_async(current_user, db)
+    query = visible_content_query(current_user, team, show_team)
+    return team, query
+
+
+# Champs des éléments de /history (fields=)
+HISTORY_FIELDS = (
+    "id", "original_text", "tone", "language", "created_at", "created_by", "is_own",
+    "formats_count", "generated_contents"
+)
+
+
 @router.get("/history")
-def get_content_history(
-    skip: int = Query(0, ge=0),
+async def get_content_history(
+    skip: int = Query(0, ge=0, description="Deprecated: use cursor"),
     limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    include_total: bool = Query(True, description="Include the (cached) total count"),
     search: Optional[str] = None,
     show_team: bool = Query(True, description="Include team members' content"),
-    current_user: models.User = Depends(auth.get_current_user),
-    db: Session = Depends(get_db)
+    fields: Optional[str] = Query(None, description=f"Comma-separated item fields: {', '.join(HISTORY_FIELDS)}"),
+    view: str = Query("full", pattern=VIEW_PATTERN, description="preview: texts truncated server-side"),
+    current_user: models.User = Depends(auth.get_current_user_async),
+    db: AsyncSession = Depends(auth.get_async_read_db)
 ):
-    """Get user's content generation history with pagination, optionally including team content"""
-    from app.utils.team_utils import get_user_team
-
-    # Get user's team if they are a member
-    team = get_user_team(current_user, db)
-
-    # Build query
-    if show_team and team:
-        # Get all team member IDs
-        team_members = db.query(models.TeamMember).filter(
-            models.TeamMember.team_id == team.id,
-            models.TeamMember.status == "active"
-        ).all()
-        team_user_ids = [member.user_id for member in team_members]
-
-        # Query for all team members' content
-        query = db.query(models.ContentRequest).filter(
-            models.ContentRequest.user_id.in_(team_user_ids)
-        )
-    else:
-        # Query only for current user's content
-        query = db.query(models.ContentRequest).filter(
-            models.ContentRequest.user_id == current_user.id
-        )
+    """
+    Get user's content generation history, optionally including team content.
+    Pagination par curseur (next_cursor) ; skip reste accepté pour les anciens clients.
+    fields= et view=preview allègent la page (app.fieldsets).
+    """
+    selected = parse_fields(fields, HISTORY_FIELDS)
+    preview = view == "preview"
+    want_original = wants(selected, "original_text")
+    want_variants = wants(selected, "generated_contents")
+    team, query = await _history_query(current_user, show_team, db)
 
-    # Search filter
+    # Search filter (plein texte, textes originaux et variantes : app.search)
     if search:
-        query = query.filter(
-            models.ContentRequest.original_text.ilike(f"%{search}%")
+        query = query.where(search_filter(search))
+
+    # Total (optionnel) mis en cache par périmètre et filtres
+    total = None
+    if include_total:
+        scope = ("team", team.id) if show_team and team else ("user", current_user.id)
+        total = await cached_count(
+            db, ("history",) + scope + (search,), query, last_write_at=current_user.last_write_at
         )
 
-    # Total count
-    total = query.count()
+    # Page suivante par curseur (coût constant) ; skip seulement sans curseur (anciens clients)
+    page_query = apply_keyset(query, models.ContentRequest.created_at, models.ContentRequest.id, cursor)
+    if skip and not cursor:
+        page_query = page_query.offset(skip)
+
+    # Auteurs (requête IN) et texte complet seulement s'ils sont demandés
+    options = []
+    if wants(selected, "created_by"):
+        options.append(selectinload(models.ContentRequest.user))
+    if want_original and not preview:
+        options.append(joinedload(models.ContentRequest.original_blob))
+
+    # Most recent first, limit + 1 pour savoir s'il reste une page
+    requests, next_cursor = split_page(
+        (await db.execute(page_query.options(*options).limit(limit + 1))).scalars().all(),
+        limit,
+        lambda req: (req.created_at, req.id)
+    )
 
-    # Get paginated results ordered by most recent
-    requests = query.order_by(
-        models.ContentRequest.created_at.desc()
-    ).offset(skip).limit(limit).all()
+    # Variantes de toute la page en une requête (plus une pour les archives) : pas de N+1
+    variants_by_request = {}
+    if want_variants or wants(selected, "formats_count"):
+        variants_by_request = await get_variants_for_requests_async(
+            db, requests, load_texts=want_variants and not preview
+        )
+
+    # Aperçus (originaux et variantes) tronqués en SQL, en une requête
+    previews = {}
+    if preview:
+        hashes = [req.original_text_hash for req in requests] if want_original else []
+        if want_variants:
+            hashes += [gc.polished_text_hash for variants in variants_by_request.values() for gc in variants]
+        previews = await text_previews_async(db, hashes)
+
+    def text_of(instance, hash_attribute, text_attribute):
+        if not preview:
+            return getattr(instance, text_attribute)
+        digest = getattr(instance, hash_attribute)
+        if digest in previews:
+            return previews[digest]
+        # Variante archivée : texte déjà en mémoire, tronqué ici
+        return truncate_text(getattr(instance, text_attribute))
 
     # Format response with generated contents
     history_items = []
     for req in requests:
-        generated_contents = db.query(models.GeneratedContent).filter(
-            models.GeneratedContent.request_id == req.id
-        ).all()
-
-        # Get user info for this content
-        user = db.query(models.User).filter(models.User.id == req.user_id).first()
-
-        history_items.append({
-            "id": req.id,
-            "original_text": req.original_text,
-            "tone": req.tone,
-            "language": req.language,
-            "created_at": req.created_at,
-            "created_by": {
-                "id": user.id,
-                "name": user.name,
-                "email": user.email
-            } if user else None,
-            "is_own": req.user_id == current_user.id,
-            "formats_count": len(generated_contents),
-            "generated_contents": [
+        item = {"id": req.id}
+        if want_original:
+            item["original_text"] = text_of(req, "original_text_hash", "original_text")
+        if wants(selected, "tone"):
+            item["tone"] = req.tone
+        if wants(selected, "language"):
+            item["language"] = req.language
+        if wants(selected, "created_at"):
+            item["created_at"] = req.created_at
+        if wants(selected, "created_by"):
+            item["created_by"] = {
+                "id": req.user.id,
+                "name": req.user.name,
+                "email": req.user.email
+            } if req.user else None
+        if wants(selected, "is_own"):
+            item["is_own"] = req.user_id == current_user.id
+        if wants(selected, "formats_count"):
+            item["formats_count"] = len(variants_by_request[req.id])
+        if want_variants:
+            item["generated_contents"] = [
                 {
                     "id": gc.id,
-                    "content": gc.polished_text,
+                    "content": text_of(gc, "polished_text_hash", "polished_text"),
                     "variant_number": gc.variant_number,
                     "format_name": gc.format_name
                 }
-                for gc in generated_contents
+                for gc in variants_by_request[req.id]
             ]
-        })
+        history_items.append(item)
 
-    return {
+    # Page volumineuse (jusqu'à 100 requêtes x variantes) : sérialisée directement par orjson
+    return FastJSONResponse({
         "total": total,
         "items": history_items,
         "skip": skip,
-        "limit": limit
-    }
+        "limit": limit,
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None
+    })
+
+
+@router.get("/search")
+async def search_content_history(
+    q: str = Query(..., min_length=2, max_length=200),
+    limit: int = Query(20, ge=1, le=50),
+    skip: int = Query(0, ge=0),
+    show_team: bool = Query(True, description="Include team members' content"),
+    current_user: models.User = Depends(auth.get_current_user_async),
+    db: AsyncSession = Depends(auth.get_async_read_db)
+):
+    """
+    Recherche plein texte (textes originaux et variantes) dans l'historique,
+    triée par pertinence, avec extraits surlignés (<mark>).
+    """
+    _, query = await _history_query(current_user, show_team, db)
+    results, has_more = await search_requests(
+        db, query.options(selectinload(models.ContentRequest.user)), q, limit, skip
+    )
+
+    return FastJSONResponse({
+        "query": q,
+        "items": [
+            {
+                "id": result["request"].id,
+                "platform": result["request"].platform,
+                "tone": result["request"].tone,
+                "language": result["request"].language,
+                "created_at": result["request"].created_at,
+                "created_by": {
+                    "id": result["request"].user.id,
+                    "name": result["request"].user.name,
+                    "email": result["request"].user.email
+                } if result["request"].user else None,
+                "is_own": result["request"].user_id == current_user.id,
+                "rank": result["rank"],
+                "snippet": result["snippet"],
+                "matching_variants": result["variants"]
+            }
+            for result in results
+        ],
+        "skip": skip,
+        "limit": limit,
+        "has_more": has_more
+    })
 
 @router.get("/history/{request_id}")
-def get_content_request_detail(
+async def get_content_request_detail(
     request_id: int,
-    current_user: models.User = Depends(auth.get_current_user),
-    db: Session = Depends(get_db)
+    current_user: models.User = Depends(auth.get_current_user_async),
+    db: AsyncSession = Depends(auth.get_async_read_db)
 ):
     """Get details of a specific content request"""
-    content_request = db.query(models.ContentRequest).filter(
+    query = select(models.ContentRequest).options(joinedload(models.ContentRequest.original_blob)).where(
         models.ContentRequest.id == request_id,
         models.ContentRequest.user_id == current_user.id
-    ).first()
+    )
+    history_cutoff = get_history_cutoff(await get_effective_plan_async(current_user, db))
+    if history_cutoff:
+        query = query.where(models.ContentRequest.created_at >= history_cutoff)
+    content_request = (await db.execute(query)).scalars().first()
 
     if not content_request:
         raise HTTPException(status_code=404, detail="Content request not found")
 
-    generated_contents = db.query(models.GeneratedContent).filter(
-        models.GeneratedContent.request_id == request_id
-    ).all()
+    generated_contents = await get_variants_async(db, content_request)
 
     return {
         "id": content_request.id,
@@ -343,24 +594,32 @@ def delete_content_request(
     if not content_request:
         raise HTTPException(status_code=404, detail="Content request not found")
 
+    variants = db.query(models.GeneratedContent).filter(
+        models.GeneratedContent.request_id == request_id,
+        models.GeneratedContent.created_at >= content_request.created_at
+    )
+
+    # Pas de FK vers les tables partitionnées : les entrées de calendrier sont détachées explicitement
+    db.query(models.ScheduledContent).filter(
+        or_(
+            models.ScheduledContent.content_request_id == request_id,
+            models.ScheduledContent.generated_content_id.in_(variants.with_entities(models.GeneratedContent.id))
+        )
+    ).update({"content_request_id": None, "generated_content_id": None}, synchronize_session=False)
+
     # Delete all generated contents first (cascade)
-    db.query(models.GeneratedContent).filter(
-        models.GeneratedContent.request_id == request_id
-    ).delete()
+    variants.delete(synchronize_session=False)
+    db.query(models.ContentArchive).filter(models.ContentArchive.request_id == request_id).delete()
 
     # Delete the request
     db.delete(content_request)
+    crud.mark_user_write(current_user)
     db.commit()
 
     return {"message": "Content request deleted successfully"}
 
-@router.get("/export/{request_id}")
-def export_all_formats(
-    request_id: int,
-    current_user: models.User = Depends(auth.get_current_user),
-    db: Session = Depends(get_db)
-):
-    """Export all generated formats as a ZIP file (Pro/Business only)"""
+def _require_bulk_export(current_user: models.User, db: Session):
+    """403 si le plan effectif (équipe comprise) n'inclut pas l'export en masse"""
     from app.plan_config import get_plan_config
 
     # Get effective plan (considering team membership)
@@ -376,8 +635,20 @@ def export_all_formats(
             detail="L'export en masse est réservé aux plans Pro et Business"
         )
 
+
+@router.get("/export/{request_id}")
+def export_all_formats(
+    request_id: int,
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Export all generated formats as a ZIP file (Pro/Business only)"""
+    _require_bulk_export(current_user, db)
+
     # Get the content request
-    content_request = db.query(models.ContentRequest).filter(
+    content_request = db.query(models.ContentRequest).options(
+        joinedload(models.ContentRequest.original_blob)
+    ).filter(
         models.ContentRequest.id == request_id,
         models.ContentRequest.user_id == current_user.id
     ).first()
@@ -385,37 +656,29 @@ def export_all_formats(
     if not content_request:
         raise HTTPException(status_code=404, detail="Content request not found")
 
-    # Get all generated contents
-    generated_contents = db.query(models.GeneratedContent).filter(
-        models.GeneratedContent.request_id == request_id
-    ).all()
+    # Variantes lues au fil de l'écriture du ZIP (réhydratées depuis l'archive si besoin)
+    variants = iter_variants(db, content_request)
+    first_variant = next(variants, None)
 
-    if not generated_contents:
+    if first_variant is None:
         raise HTTPException(status_code=404, detail="No generated content found")
 
-    # Create ZIP file in memory
-    zip_buffer = io.BytesIO()
-
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+    def zip_entries():
         # Group contents by format for counting variants
         formats_count = {}
-        for gc in generated_contents:
+        total_files = 0
+        for gc in itertools.chain([first_variant], variants):
             format_key = gc.format_name or f"format_{gc.variant_number}"
             if format_key not in formats_count:
                 formats_count[format_key] = 0
             formats_count[format_key] += 1
+            total_files += 1
 
             # Create descriptive filename
             variant_suffix = f"_variant_{formats_count[format_key]}" if formats_count[format_key] > 1 else ""
-            filename = f"{format_key}{variant_suffix}.txt"
-
-            # Add content to zip
-            zip_file.writestr(
-                filename,
-                gc.polished_text
-            )
+            yield f"{format_key}{variant_suffix}.txt", gc.polished_text
 
-        # Add metadata file
+        # Add metadata file (en dernier : les comptes sont connus une fois les variantes lues)
         metadata = f"""Content Export - AI Content Polisher
 ================================================
 Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
@@ -430,17 +693,130 @@ Settings:
 Generated Formats:
 {chr(10).join([f'- {fmt}: {count} variant(s)' for fmt, count in formats_count.items()])}
 
-Total Files: {len(generated_contents)}
+Total Files: {total_files}
 """
-        zip_file.writestr("_README.txt", metadata)
-
-    # Prepare response
-    zip_buffer.seek(0)
+        yield "_README.txt", metadata
 
+    # ZIP produit morceau par morceau (app.zip_stream) : aucune copie de l'archive en mémoire
     return StreamingResponse(
-        io.BytesIO(zip_buffer.getvalue()),
+        stream_zip(zip_entries()),
         media_type="application/zip",
         headers={
             "Content-Disposition": f"attachment; filename=content_export_{request_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
         }
-    )
\ No newline at end of file
+    )
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _export_job_response(job: models.ExportJob) -> dict:
+    return {
+        "id": job.id,
+        "status": job.status,
+        "format": job.format,
+        "requests_count": job.requests_count,
+        "file_size": job.file_size,
+        "created_at": job.created_at,
+        "completed_at": job.completed_at,
+        "expires_at": job.expires_at,
+        "error": job.error_message if job.status == "failed" else None,
+        "download_url": f"/content/exports/{job.id}/download" if job.status == "ready" else None
+    }
+
+
+@router.post("/exports")
+def create_bulk_export(
+    data: BulkExportRequest,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Export en masse de l'historique sur une période (Pro/Business).
+    Flux NDJSON / CSV / ZIP direct, ou tâche de fond (202 + lien de
+    téléchargement) au-delà de BULK_EXPORT_SYNC_MAX_REQUESTS requêtes.
+    """
+    _require_bulk_export(current_user, db)
+
+    if data.format not in BULK_EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Format must be one of: {', '.join(BULK_EXPORT_FORMATS)}")
+    date_from, date_to = _naive_utc(data.date_from), _naive_utc(data.date_to)
+    if date_from and date_to and date_from >= date_to:
+        raise HTTPException(status_code=400, detail="date_from must be before date_to")
+
+    team = get_user_team(current_user, db)
+    query = export_query(visible_content_query(current_user, team, data.include_team), date_from, date_to, data.cursor)
+    requests_count = count_requests(db, query)
+
+    if requests_count > BULK_EXPORT_SYNC_MAX_REQUESTS:
+        job = models.ExportJob(
+            user_id=current_user.id,
+            format=data.format,
+            include_team=data.include_team,
+            date_from=date_from,
+            date_to=date_to,
+            cursor=data.cursor,
+            requests_count=requests_count
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        background_tasks.add_task(run_export_job, job.id)
+        response.status_code = 202
+        return _export_job_response(job)
+
+    # Flux direct : lecture par curseur serveur pendant l'envoi
+    return StreamingResponse(
+        export_chunks(db, query, data.format),
+        media_type=BULK_EXPORT_FORMATS[data.format],
+        headers={
+            "Content-Disposition": f"attachment; filename=content_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{data.format}",
+            "X-Export-Count": str(requests_count)
+        }
+    )
+
+
+@router.get("/exports/{job_id}")
+def get_bulk_export(
+    job_id: int,
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Statut d'un export en tâche de fond"""
+    job = db.query(models.ExportJob).filter(
+        models.ExportJob.id == job_id,
+        models.ExportJob.user_id == current_user.id
+    ).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Export not found")
+    return _export_job_response(job)
+
+
+@router.get("/exports/{job_id}/download")
+def download_bulk_export(
+    job_id: int,
+    current_user: models.User = Depends(auth.get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Téléchargement d'un export terminé"""
+    job = db.query(models.ExportJob).filter(
+        models.ExportJob.id == job_id,
+        models.ExportJob.user_id == current_user.id
+    ).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Export not found")
+    if job.status == "expired" or (job.expires_at and job.expires_at < datetime.utcnow()):
+        raise HTTPException(status_code=410, detail="Export expired")
+    if job.status != "ready" or not job.file_path or not os.path.exists(job.file_path):
+        raise HTTPException(status_code=409, detail=f"Export not ready (status: {job.status})")
+
+    return FileResponse(
+        job.file_path,
+        media_type=BULK_EXPORT_FORMATS[job.format],
+        filename=f"content_export_{job.id}_{job.created_at.strftime('%Y%m%d')}.{job.format}"
+    )
@@ -105,23 +105,22 @@ def get_my_team(
         return {"team": None, "membership": None}
 
     # Get all team members
-    members = db.query(models.TeamMember).filter(
+    # Membres et utilisateurs en une seule requête (jointure)
+    members = db.query(models.TeamMember, models.User).join(
+        models.User, models.User.id == models.TeamMember.user_id
+    ).filter(
         models.TeamMember.team_id == team.id,
         models.TeamMember.status == "active"
     ).all()
 
-    members_data = []
-    for m in members:
-        user = db.query(models.User).filter(models.User.id == m.user_id).first()
-        if user:
-            members_data.append({
-                "id": m.id,
-                "user_id": m.user_id,
-                "email": user.email,
-                "name": user.name,
-                "role": m.role,
-                "joined_at": m.joined_at.isoformat()
-            })
+    members_data = [{
+        "id": m.id,
+        "user_id": m.user_id,
+        "email": user.email,
+        "name": user.name,
+        "role": m.role,
+        "joined_at": m.joined_at.isoformat()
+    } for m, user in members]
 
     # Get pending invitations
     invitations = db.query(models.TeamInvitation).filter(
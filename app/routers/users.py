@@ -7,6 +7,7 @@ from app.database import get_db
 from app.auth_google import verify_google_token
 from app.email_service import send_verification_email
 from app.plan_config import get_plan_credits, PLAN_MAPPING
+from app.bulk_export import delete_user_exports
 from pydantic import BaseModel
 from app import models
 
@@ -371,6 +372,11 @@ def delete_account(
                 models.GeneratedContent.request_id == request.id
             ).delete()
 
+        db.query(models.ContentArchive).filter(
+            models.ContentArchive.user_id == user_id
+        ).delete()
+        delete_user_exports(db, user_id)
+
         # 2. Supprimer toutes les requêtes de contenu
         db.query(models.ContentRequest).filter(
             models.ContentRequest.user_id == user_id
@@ -1,16 +1,11 @@
 """
 Service de scraping et d'analyse de style pour les profils sociaux
 """
-import requests
 from bs4 import BeautifulSoup
 import json
 import time
 from typing import List, Dict, Optional
-import os
-from groq import Groq
-
-# Initialize Groq client
-groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+from app.http_client import get_groq_client, get_requests_session
 
 
 def scrape_linkedin_posts(profile_url: str, max_posts: int = 10) -> List[str]:
@@ -80,7 +75,7 @@ def scrape_generic_content(url: str, max_posts: int = 10) -> List[str]:
         headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         }
-        response = requests.get(url, headers=headers, timeout=10)
+        response = get_requests_session().get(url, headers=headers, timeout=10)
         response.raise_for_status()
 
         soup = BeautifulSoup(response.text, 'html.parser')
@@ -140,7 +135,7 @@ Voici {len(posts)} publications récentes :
 Fournis une analyse complète et structurée du style d'écriture. Sois très spécifique et donne des exemples concrets tirés des posts."""
 
     try:
-        response = groq_client.chat.completions.create(
+        response = get_groq_client().chat.completions.create(
             model="llama-3.3-70b-versatile",
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -0,0 +1,159 @@
+"""
+Recherche plein texte dans l'historique (PostgreSQL)
+
+text_blobs porte un tsvector généré par configuration (french, english,
+spanish), indexé en GIN (migration f1d7b3c9e264). Une requête correspond si
+son texte original ou l'une de ses variantes correspond, dans la
+configuration de sa langue (ContentRequest.language, français par défaut).
+Les variantes archivées à froid (app.content_archive) ne sont plus en table :
+seul le texte original de ces requêtes reste cherchable.
+"""
+from typing import List, Tuple
+from sqlalchemy import select, func, case, and_, or_, exists, literal_column
+from sqlalchemy.orm import aliased
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import models
+
+# Langue de ContentRequest -> configuration de recherche PostgreSQL
+SEARCH_CONFIGURATIONS = {"fr": "french", "en": "english", "es": "spanish"}
+DEFAULT_SEARCH_LANGUAGE = "fr"
+# Extraits surlignés (ts_headline), calculés uniquement pour la page renvoyée
+HEADLINE_OPTIONS = "StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MaxWords=30, MinWords=10"
+
+
+def _regconfig(config: str):
+    return literal_column(f"'{config}'::regconfig")
+
+
+def _tsquery(config, term: str):
+    # Syntaxe type moteur de recherche : "expression exacte", -exclusion, OR
+    return func.websearch_to_tsquery(config, term)
+
+
+def _language_conditions(language_column):
+    """(configuration, condition sur la langue de la requête) - conditions mutuellement exclusives"""
+    others = [code for code in SEARCH_CONFIGURATIONS if code != DEFAULT_SEARCH_LANGUAGE]
+    for code, config in SEARCH_CONFIGURATIONS.items():
+        if code == DEFAULT_SEARCH_LANGUAGE:
+            yield config, or_(language_column.is_(None), language_column.notin_(others))
+        else:
+            yield config, language_column == code
+
+
+def _vector(blob, config: str):
+    return getattr(blob, f"search_{config}")
+
+
+def _matching_hashes(config: str, term: str):
+    """Empreintes des textes qui correspondent : sous-requête non corrélée, servie par l'index GIN de config"""
+    return select(models.TextBlob.hash).where(
+        _vector(models.TextBlob, config).op("@@")(_tsquery(_regconfig(config), term))
+    )
+
+
+def _text_matches(hash_column, language_column, term: str):
+    # Une branche par langue : hash IN (textes correspondants), évaluée une fois par requête et non par ligne
+    return or_(*[
+        and_(condition, hash_column.in_(_matching_hashes(config, term)))
+        for config, condition in _language_conditions(language_column)
+    ])
+
+
+def _blob_rank(blob, language_column, term: str):
+    return case(*[
+        (condition, func.ts_rank_cd(_vector(blob, config), _tsquery(_regconfig(config), term)))
+        for config, condition in _language_conditions(language_column)
+    ])
+
+
+def _headline(blob, language_column, term: str):
+    config = case(*[(condition, _regconfig(config)) for config, condition in _language_conditions(language_column)])
+    return func.ts_headline(config, blob.content, _tsquery(config, term), HEADLINE_OPTIONS)
+
+
+def _variant_filter(original, polished, term: str):
+    """Variantes (en table) de la requête `original` dont le texte correspond"""
+    return and_(
+        models.GeneratedContent.request_id == original.id,
+        models.GeneratedContent.created_at >= original.created_at,
+        polished.hash == models.GeneratedContent.polished_text_hash,
+        _text_matches(models.GeneratedContent.polished_text_hash, original.language, term)
+    )
+
+
+def search_filter(term: str):
+    """Condition à ajouter à un select(ContentRequest) : texte original ou une variante correspond"""
+    return or_(
+        _text_matches(models.ContentRequest.original_text_hash, models.ContentRequest.language, term),
+        exists().where(
+            models.GeneratedContent.request_id == models.ContentRequest.id,
+            models.GeneratedContent.created_at >= models.ContentRequest.created_at,
+            _text_matches(models.GeneratedContent.polished_text_hash, models.ContentRequest.language, term)
+        )
+    )
+
+
+async def search_requests(db: AsyncSession, query, term: str, limit: int, offset: int = 0) -> Tuple[List[dict], bool]:
+    """
+    Requêtes de query (select(ContentRequest) déjà restreint au périmètre) qui
+    correspondent à term, de la plus pertinente à la moins pertinente.
+    Retourne ([{"request", "rank", "snippet", "variants": [{"id", "format_name", "variant_number", "snippet"}]}], has_more).
+    """
+    original_blob = aliased(models.TextBlob)
+    polished_blob = aliased(models.TextBlob)
+    original_rank = select(_blob_rank(original_blob, models.ContentRequest.language, term)).where(
+        original_blob.hash == models.ContentRequest.original_text_hash
+    ).scalar_subquery()
+    variants_rank = select(func.max(_blob_rank(polished_blob, models.ContentRequest.language, term))).where(
+        _variant_filter(models.ContentRequest, polished_blob, term)
+    ).scalar_subquery()
+    rank = func.greatest(func.coalesce(original_rank, 0), func.coalesce(variants_rank, 0)).label("rank")
+
+    rows = (await db.execute(
+        query.add_columns(rank).where(search_filter(term))
+        .order_by(rank.desc(), models.ContentRequest.created_at.desc(), models.ContentRequest.id.desc())
+        .offset(offset).limit(limit + 1)
+    )).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not rows:
+        return [], has_more
+
+    requests = [row[0] for row in rows]
+    request_ids = [request.id for request in requests]
+    oldest = min(request.created_at for request in requests)
+
+    # Extraits de la page uniquement : ts_headline relit le texte complet
+    snippets = dict((await db.execute(
+        select(models.ContentRequest.id, _headline(original_blob, models.ContentRequest.language, term))
+        .join(original_blob, original_blob.hash == models.ContentRequest.original_text_hash)
+        .where(models.ContentRequest.id.in_(request_ids), models.ContentRequest.created_at >= oldest)
+    )).all())
+
+    variants = {request_id: [] for request_id in request_ids}
+    for variant_id, request_id, format_name, variant_number, snippet in (await db.execute(
+        select(
+            models.GeneratedContent.id, models.GeneratedContent.request_id,
+            models.GeneratedContent.format_name, models.GeneratedContent.variant_number,
+            _headline(polished_blob, models.ContentRequest.language, term)
+        )
+        .where(
+            models.ContentRequest.id.in_(request_ids),
+            models.ContentRequest.created_at >= oldest,
+            models.GeneratedContent.created_at >= oldest,
+            _variant_filter(models.ContentRequest, polished_blob, term)
+        )
+        .order_by(models.GeneratedContent.request_id, models.GeneratedContent.id)
+    )).all():
+        variants[request_id].append({
+            "id": variant_id,
+            "format_name": format_name,
+            "variant_number": variant_number,
+            "snippet": snippet
+        })
+
+    return [
+        {"request": request, "rank": float(rank_value or 0), "snippet": snippets.get(request.id),
+         "variants": variants[request.id]}
+        for request, rank_value in rows
+    ], has_more
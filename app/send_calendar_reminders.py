@@ -5,7 +5,7 @@ Script pour envoyer les rappels de calendrier (24h et 1h avant publication)
 import os
 import sys
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 
 # Add parent directory to path to import app modules
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -45,7 +45,9 @@ def send_reminders():
             content_preview = "Votre contenu planifié"
 
             if scheduled.generated_content_id:
-                gen_content = db.query(models.GeneratedContent).filter(
+                gen_content = db.query(models.GeneratedContent).options(
+                    joinedload(models.GeneratedContent.polished_blob)
+                ).filter(
                     models.GeneratedContent.id == scheduled.generated_content_id
                 ).first()
                 if gen_content:
@@ -92,7 +94,9 @@ def send_reminders():
             content_preview = "Votre contenu planifié"
 
             if scheduled.generated_content_id:
-                gen_content = db.query(models.GeneratedContent).filter(
+                gen_content = db.query(models.GeneratedContent).options(
+                    joinedload(models.GeneratedContent.polished_blob)
+                ).filter(
                     models.GeneratedContent.id == scheduled.generated_content_id
                 ).first()
                 if gen_content:
@@ -0,0 +1,132 @@
+"""
+Stockage des textes adressé par contenu (table text_blobs)
+
+content_requests.original_text_hash et generated_contents.polished_text_hash
+pointent vers text_blobs (clé : SHA-256 du texte) : un texte resoumis ou
+identique entre équipes n'est stocké qu'une fois. L'insertion d'un texte déjà
+présent verrouille son blob jusqu'à la fin de la transaction (ON CONFLICT DO
+UPDATE) : il ne peut pas être supprimé avant que la ligne qui le référence soit
+écrite. Les blobs sans référence (rétention, archivage) sont supprimés par
+collect_unreferenced_texts (maintenance quotidienne).
+
+Côté ORM, original_text / polished_text restent des attributs ordinaires :
+l'affectation calcule le hash et le texte est inséré dans text_blobs au flush.
+"""
+import hashlib
+import os
+from datetime import timedelta
+from typing import Iterable
+from sqlalchemy import event, func, table, column, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Délai avant suppression d'un blob sans référence (laisse le temps à une transaction en cours de le référencer)
+TEXT_BLOB_GC_GRACE_HOURS = int(os.getenv("TEXT_BLOB_GC_GRACE_HOURS", "1"))
+# Âge à partir duquel la réutilisation d'un blob rafraîchit last_used_at
+_TOUCH_AFTER = timedelta(hours=TEXT_BLOB_GC_GRACE_HOURS) / 2
+
+_text_blobs = table(
+    "text_blobs",
+    column("hash"), column("content"), column("byte_size"), column("created_at"), column("last_used_at")
+)
+
+
+def text_hash(value: str) -> str:
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+def _upsert_statement(texts: Iterable[str]):
+    """
+    INSERT ... ON CONFLICT DO UPDATE des textes (un seul aller-retour). Triés par hash :
+    deux transactions qui insèrent les mêmes textes les verrouillent dans le même ordre (pas de deadlock).
+    Un blob existant reste verrouillé jusqu'au commit (même si la condition WHERE l'exclut de la
+    mise à jour) : collect_unreferenced_texts le saute (SKIP LOCKED) tant que la ligne qui va le
+    référencer n'est pas écrite. last_used_at n'est rafraîchi qu'au-delà de la moitié du délai de
+    grâce (pas de nouvelle version de ligne à chaque réutilisation d'un texte courant) :
+    après le commit, un blob réutilisé reste donc au moins une demi-période hors d'atteinte.
+    Retourne (instruction, {texte: hash}).
+    """
+    hashes = {value: text_hash(value) for value in texts}
+    rows = [
+        {"hash": digest, "content": value, "byte_size": len(value.encode("utf-8")),
+         "created_at": func.now(), "last_used_at": func.now()}
+        for value, digest in sorted(hashes.items(), key=lambda item: item[1])
+    ]
+    if not rows:
+        return None, hashes
+    stmt = pg_insert(_text_blobs).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["hash"],
+        set_={"last_used_at": func.now()},
+        where=_text_blobs.c.last_used_at < func.now() - _TOUCH_AFTER
+    )
+    return stmt, hashes
+
+
+def intern_texts(db: Session, texts: Iterable[str]) -> dict:
+    """Garantit la présence des textes dans text_blobs ; retourne {texte: hash}"""
+    stmt, hashes = _upsert_statement(texts)
+    if stmt is not None:
+        db.execute(stmt)
+    return hashes
+
+
+async def intern_texts_async(db, texts: Iterable[str]) -> dict:
+    """Variante AsyncSession de intern_texts"""
+    stmt, hashes = _upsert_statement(texts)
+    if stmt is not None:
+        await db.execute(stmt)
+    return hashes
+
+
+def stage_text(instance, hash_attribute: str, value: str) -> str:
+    """
+    Affectation ORM d'un texte : garde le texte en cache sur l'instance
+    (inséré dans text_blobs au prochain flush) et retourne son hash.
+    """
+    digest = text_hash(value)
+    instance.__dict__.setdefault("_staged_texts", {})[hash_attribute] = (digest, value)
+    return digest
+
+
+def staged_text(instance, hash_attribute: str):
+    """Texte affecté à l'instance s'il correspond toujours au hash courant"""
+    staged = instance.__dict__.get("_staged_texts", {}).get(hash_attribute)
+    if staged and staged[0] == instance.__dict__.get(hash_attribute):
+        return staged[1]
+    return None
+
+
+@event.listens_for(Session, "before_flush")
+def _intern_staged_texts(session, flush_context, instances):
+    texts = []
+    for instance in list(session.new) + list(session.dirty):
+        for hash_attribute in instance.__dict__.get("_staged_texts", {}):
+            value = staged_text(instance, hash_attribute)
+            if value is not None:
+                texts.append(value)
+    if texts:
+        intern_texts(session, texts)
+
+
+def collect_unreferenced_texts(engine, grace_hours: int = TEXT_BLOB_GC_GRACE_HOURS) -> int:
+    """
+    Supprime les blobs qu'aucune ligne ne référence, inutilisés depuis plus de grace_hours.
+    SKIP LOCKED : un blob verrouillé par intern_texts (transaction en cours qui va le
+    référencer) ou par la clé étrangère d'une insertion est laissé au passage suivant ;
+    sa référence ou son last_used_at rafraîchi l'écartent ensuite.
+    """
+    with engine.begin() as conn:
+        deleted = conn.execute(text(
+            "DELETE FROM text_blobs WHERE hash IN ("
+            "SELECT b.hash FROM text_blobs b "
+            "WHERE b.last_used_at < now() - make_interval(hours => :grace_hours) "
+            "AND NOT EXISTS (SELECT 1 FROM content_requests r WHERE r.original_text_hash = b.hash) "
+            "AND NOT EXISTS (SELECT 1 FROM generated_contents g WHERE g.polished_text_hash = b.hash) "
+            "FOR UPDATE SKIP LOCKED)"
+        ), {"grace_hours": grace_hours}).rowcount
+    print(f"🧺 Textes sans référence supprimés: {deleted}")
+    return deleted
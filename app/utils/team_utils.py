@@ -1,5 +1,14 @@
+import math
+from fractions import Fraction
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app import models
+from app.plan_config import get_history_cutoff
+
+# Credit subdivision for partial regenerations: lcm(1..18), so 1/n of a credit
+# is a whole number of units for any request of up to 6 formats x 3 variants
+CREDIT_UNITS = 12_252_240
 
 
 def get_effective_plan(user: models.User, db: Session) -> str:
@@ -53,6 +62,70 @@ def get_user_team(user: models.User, db: Session):
     return None
 
 
+def visible_content_query(user: models.User, team, include_team: bool = True):
+    """
+    select(ContentRequest) visible par l'utilisateur : les siennes, ou celles des
+    membres actifs de son équipe, dans la limite d'historique du plan
+    """
+    if include_team and team:
+        team_user_ids = select(models.TeamMember.user_id).where(
+            models.TeamMember.team_id == team.id,
+            models.TeamMember.status == "active"
+        )
+        query = select(models.ContentRequest).where(models.ContentRequest.user_id.in_(team_user_ids))
+    else:
+        query = select(models.ContentRequest).where(models.ContentRequest.user_id == user.id)
+
+    # Historique limité selon le plan (ex: 7 jours en gratuit) : ne lit que les partitions récentes
+    history_cutoff = get_history_cutoff(team.plan if team else user.current_plan)
+    if history_cutoff:
+        query = query.where(models.ContentRequest.created_at >= history_cutoff)
+    return query
+
+
+async def get_user_team_async(user: models.User, db: AsyncSession):
+    """Variante AsyncSession de get_user_team (une seule requête)"""
+    if not user.id:
+        return None
+
+    return (await db.execute(
+        select(models.Team).join(
+            models.TeamMember, models.TeamMember.team_id == models.Team.id
+        ).where(
+            models.TeamMember.user_id == user.id,
+            models.TeamMember.status == "active"
+        ).limit(1)
+    )).scalars().first()
+
+
+async def get_effective_plan_async(user: models.User, db: AsyncSession) -> str:
+    """Variante AsyncSession de get_effective_plan"""
+    team = await get_user_team_async(user, db)
+    return team.plan if team else user.current_plan
+
+
+def lock_credit_account(user_id: int, db: Session):
+    """
+    Verrouille (SELECT ... FOR UPDATE) l'utilisateur puis son équipe active,
+    toujours dans cet ordre pour éviter les deadlocks.
+    Returns (user, team or None) ; à utiliser dans une transaction d'écriture.
+    """
+    user = db.query(models.User).filter(models.User.id == user_id).with_for_update().one()
+
+    membership = db.query(models.TeamMember).filter(
+        models.TeamMember.user_id == user_id,
+        models.TeamMember.status == "active"
+    ).first()
+
+    team = None
+    if membership:
+        team = db.query(models.Team).filter(
+            models.Team.id == membership.team_id
+        ).with_for_update().first()
+
+    return user, team
+
+
 def get_effective_credits(user: models.User, db: Session) -> int:
     """
     Get effective credits considering team membership
@@ -92,3 +165,35 @@ def deduct_credits(user: models.User, db: Session, amount: int = 1) -> bool:
             db.commit()
             return True
         return False
+
+
+def deduct_partial_credits(user: models.User, team, fraction: Fraction):
+    """
+    Charge a fractional credit to the user or team pool
+
+    The fraction accumulates in partial_credit_units (1 credit = CREDIT_UNITS
+    units, exact for any share of up to 18 variants); every time the balance
+    reaches a full credit, that credit is deducted from the pool. user and team
+    must come from lock_credit_account (same transaction, no commit here).
+
+    Returns the number of whole credits deducted, or None (nothing charged)
+    when the pool cannot cover the charge
+    """
+    account = team if team else user
+    pool = team.team_credits if team else user.credits_remaining
+
+    # Rounded up if the denominator does not divide CREDIT_UNITS
+    units = math.ceil(Fraction(fraction) * CREDIT_UNITS)
+    whole_credits, remaining_units = divmod((account.partial_credit_units or 0) + units, CREDIT_UNITS)
+
+    # An empty pool cannot run up a balance either
+    if pool < max(whole_credits, 1):
+        return None
+
+    if team:
+        team.team_credits -= whole_credits
+    else:
+        user.credits_remaining -= whole_credits
+
+    account.partial_credit_units = remaining_units
+    return whole_credits
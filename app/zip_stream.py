@@ -0,0 +1,78 @@
+"""
+Écriture de ZIP en flux (sans tampon de l'archive entière)
+
+zipfile sait écrire sur un flux non positionnable (en-tête local puis data
+descriptor après chaque fichier) : chaque morceau compressé est rendu dès
+qu'il est produit. Seul le répertoire central (quelques dizaines d'octets
+par fichier) reste en mémoire jusqu'à la fin de l'archive.
+"""
+import io
+import time
+import zipfile
+from typing import Iterable, Iterator, Tuple, Union
+
+# Taille des morceaux de texte passés au compresseur
+ZIP_STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class _ChunkSink(io.RawIOBase):
+    """Flux en écriture seule : accumule les octets jusqu'au prochain drain()"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _pieces(content) -> Iterator[bytes]:
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    if isinstance(content, bytes):
+        for start in range(0, len(content), ZIP_STREAM_CHUNK_SIZE):
+            yield content[start:start + ZIP_STREAM_CHUNK_SIZE]
+        return
+    for piece in content:
+        yield piece.encode("utf-8") if isinstance(piece, str) else piece
+
+
+def stream_zip(entries: Iterable[Tuple[str, Union[str, bytes, Iterable]]]) -> Iterator[bytes]:
+    """
+    Archive ZIP (deflate) produite morceau par morceau.
+    entries : (nom de fichier, contenu) consommés au fur et à mesure ; le
+    contenu peut être un texte, des octets ou un itérable de morceaux.
+    """
+    sink = _ChunkSink()
+    date_time = time.localtime()[:6]
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as archive:
+        for filename, content in entries:
+            info = zipfile.ZipInfo(filename, date_time=date_time)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.external_attr = 0o644 << 16
+            with archive.open(info, "w") as entry:
+                for piece in _pieces(content):
+                    entry.write(piece)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            # Fin du flux compressé et data descriptor
+            data = sink.drain()
+            if data:
+                yield data
+    # Répertoire central
+    yield sink.drain()
@@ -0,0 +1,66 @@
+"""
+Benchmark : plafond de concurrence du moteur sync (threadpool) vs async (asyncpg)
+
+Lance N "requêtes" simultanées qui font chacune une lecture utilisateur + un
+count d'historique (le profil des routes /content/history et /analytics/*).
+Le moteur sync passe par le threadpool de Starlette (40 threads par défaut),
+comme une route `def` FastAPI ; le moteur async reste sur l'event loop.
+
+Usage : python benchmark_db.py [concurrence] [requêtes_totales]
+"""
+import asyncio
+import sys
+import time
+from sqlalchemy import select, func
+from fastapi.concurrency import run_in_threadpool
+from app.database import SessionLocal, AsyncSessionLocal, async_engine, engine
+from app.models import User, ContentRequest
+
+
+def sync_request(user_id: int):
+    db = SessionLocal()
+    try:
+        db.get(User, user_id)
+        db.execute(select(func.count(ContentRequest.id)).where(ContentRequest.user_id == user_id)).scalar()
+    finally:
+        db.close()
+
+
+async def async_request(user_id: int):
+    async with AsyncSessionLocal() as db:
+        await db.get(User, user_id)
+        (await db.execute(select(func.count(ContentRequest.id)).where(ContentRequest.user_id == user_id))).scalar()
+
+
+async def run(label: str, make_call, concurrency: int, total: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            await make_call(i % 50 + 1)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1] * 1000
+    print(f"{label:<8} concurrence={concurrency:<4} {total / elapsed:8.1f} req/s  p95={p95:7.1f} ms")
+
+
+async def main():
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    total = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+
+    await run("sync", lambda user_id: run_in_threadpool(sync_request, user_id), concurrency, total)
+    await run("async", async_request, concurrency, total)
+
+    await async_engine.dispose()
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,83 @@
+"""
+Benchmark : pagination OFFSET vs curseur (keyset) de /content/history
+
+Pour chaque profondeur, lit la page de `limit` requêtes qui commence à cette
+position : d'abord avec OFFSET (l'ancienne pagination skip=), puis avec le
+curseur de l'élément précédent (app.pagination.apply_keyset). OFFSET relit
+et jette toutes les lignes sautées ; le curseur repart de l'index
+(user_id, created_at), à coût constant.
+
+Utilise l'utilisateur qui a le plus d'historique si aucun n'est donné.
+
+Usage : python benchmark_pagination.py [user_id] [taille_de_page] [répétitions]
+"""
+import statistics
+import sys
+import time
+from sqlalchemy import select, func
+from app.database import SessionLocal, engine
+from app.models import ContentRequest
+from app.pagination import apply_keyset, encode_cursor
+
+DEPTHS = (0, 100, 1_000, 10_000, 50_000, 100_000)
+
+
+def page_query(user_id: int):
+    return select(ContentRequest).where(ContentRequest.user_id == user_id)
+
+
+def timed(db, statement, repeats: int) -> float:
+    """Durée médiane (ms) de l'exécution de la requête, lignes lues comprises"""
+    durations = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        db.execute(statement).scalars().all()
+        durations.append((time.perf_counter() - start) * 1000)
+        db.expunge_all()
+    return statistics.median(durations)
+
+
+def main():
+    page_size = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    repeats = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+
+    db = SessionLocal()
+    try:
+        if len(sys.argv) > 1:
+            user_id = int(sys.argv[1])
+            total = db.execute(
+                select(func.count(ContentRequest.id)).where(ContentRequest.user_id == user_id)
+            ).scalar()
+        else:
+            user_id, total = db.execute(
+                select(ContentRequest.user_id, func.count(ContentRequest.id))
+                .group_by(ContentRequest.user_id)
+                .order_by(func.count(ContentRequest.id).desc())
+                .limit(1)
+            ).one()
+        print(f"Utilisateur {user_id} : {total} requêtes, pages de {page_size}, médiane sur {repeats} exécutions\n")
+        print(f"{'profondeur':>10}  {'OFFSET':>10}  {'curseur':>10}  {'rapport':>8}")
+
+        ordered = apply_keyset(page_query(user_id), ContentRequest.created_at, ContentRequest.id, None)
+        for depth in DEPTHS:
+            if depth >= total:
+                break
+
+            offset_ms = timed(db, ordered.offset(depth).limit(page_size + 1), repeats)
+
+            # Curseur de l'élément qui précède la page (ce que le client a reçu avec la page précédente)
+            cursor = None
+            if depth:
+                previous = db.execute(ordered.offset(depth - 1).limit(1)).scalars().one()
+                cursor = encode_cursor(previous.created_at, previous.id)
+            keyset = apply_keyset(page_query(user_id), ContentRequest.created_at, ContentRequest.id, cursor)
+            keyset_ms = timed(db, keyset.limit(page_size + 1), repeats)
+
+            print(f"{depth:>10}  {offset_ms:>8.2f}ms  {keyset_ms:>8.2f}ms  {offset_ms / keyset_ms:>7.1f}x")
+    finally:
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Benchmark : sérialisation JSON et compression des grosses réponses
+
+Charges synthétiques (pas de base) :
+- une page /content/history de 100 requêtes x 18 variantes ;
+- une série analytics de 365 points quotidiens.
+
+Compare le rendu FastAPI par défaut (jsonable_encoder puis json.dumps),
+orjson après jsonable_encoder, et orjson direct (FastJSONResponse renvoyée
+par la route), puis la taille et le temps de gzip / brotli (app.compression).
+Les mots aléatoires se compressent moins bien qu'un vrai texte.
+
+Usage : python benchmark_serialization.py [répétitions]
+"""
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from app.compression import _COMPRESSORS, GZIP_LEVEL, BROTLI_QUALITY, brotli
+from app.responses import FastJSONResponse
+
+WORDS = (
+    "contenu marketing audience engagement stratégie réseau marque client produit lancement "
+    "équipe croissance conseil innovation projet résultat communauté partage idée succès"
+).split()
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def history_page(rng: random.Random, items: int = 100, variants: int = 18) -> dict:
+    now = datetime.utcnow()
+    return {
+        "total": 2500,
+        "items": [
+            {
+                "id": 10_000 + index,
+                "original_text": " ".join(sentence(rng, 20) for _ in range(6)),
+                "tone": "professional",
+                "language": "fr",
+                "created_at": now - timedelta(minutes=index),
+                "created_by": {"id": 42, "name": "Camille Martin", "email": "camille@example.com"},
+                "is_own": True,
+                "formats_count": variants,
+                "generated_contents": [
+                    {
+                        "id": 50_000 + index * variants + number,
+                        "content": " ".join(sentence(rng, 18) for _ in range(4)),
+                        "variant_number": number % 3 + 1,
+                        "format_name": ("linkedin", "instagram", "twitter", "facebook", "tiktok", "newsletter")[number % 6]
+                    }
+                    for number in range(variants)
+                ]
+            }
+            for index in range(items)
+        ],
+        "skip": 0,
+        "limit": items,
+        "next_cursor": "WyIyMDI2LTEwLTE5VDEwOjAwOjAwIiwxMDA5OV0",
+        "has_more": True
+    }
+
+
+def analytics_series(rng: random.Random, days: int = 365) -> list:
+    today = datetime.utcnow().date()
+    return [
+        {
+            "date": (today - timedelta(days=days - 1 - index)).isoformat(),
+            "requests": rng.randint(0, 40),
+            "tokens": Decimal(rng.randint(0, 60_000)),  # SUM() SQL : Decimal
+            "credits_used": rng.randint(0, 40)
+        }
+        for index in range(days)
+    ]
+
+
+def timed(function, repeats: int):
+    """(résultat, durée médiane en ms)"""
+    durations = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        durations.append((time.perf_counter() - start) * 1000)
+    return result, statistics.median(durations)
+
+
+def compress(encoding: str, body: bytes) -> bytes:
+    compressor = _COMPRESSORS[encoding]()
+    return compressor.compress(body) + compressor.finish()
+
+
+def bench(label: str, payload, repeats: int):
+    default = JSONResponse(None)
+    fast = FastJSONResponse(None)
+
+    body, encoder_ms = timed(lambda: default.render(jsonable_encoder(payload)), repeats)
+    _, orjson_encoder_ms = timed(lambda: fast.render(jsonable_encoder(payload)), repeats)
+    body_fast, orjson_ms = timed(lambda: fast.render(payload), repeats)
+
+    print(f"\n{label} ({len(body_fast) / 1024:.1f} Ko JSON)")
+    print(f"  jsonable_encoder + json      {encoder_ms:8.2f} ms")
+    print(f"  jsonable_encoder + orjson    {orjson_encoder_ms:8.2f} ms")
+    print(f"  orjson direct                {orjson_ms:8.2f} ms")
+
+    encodings = [("gzip", f"gzip-{GZIP_LEVEL}")]
+    if brotli is not None:
+        encodings.append(("br", f"br-{BROTLI_QUALITY}"))
+    for encoding, name in encodings:
+        compressed, compress_ms = timed(lambda: compress(encoding, body_fast), repeats)
+        print(f"  {name:<8} {len(compressed) / 1024:8.1f} Ko  {compress_ms:8.2f} ms")
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    rng = random.Random(0)
+
+    bench("Historique, 100 requêtes x 18 variantes", history_page(rng), repeats)
+    bench("Analytics, 365 jours", analytics_series(rng), repeats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Appels Groq des routes /ai : au plus AI_MAX_CONCURRENCY appels simultanés,
+et l'event loop reste libre pendant que les autres attendent le sémaphore :
+/users/me répond sans attendre pendant une rafale sur /ai/hashtags.
+
+Client AsyncGroq remplacé par un faux (pas de réseau). Pas de base non plus :
+l'utilisateur courant n'a pas d'id, /users/me ne lit donc ni équipe ni plan
+en base (get_effective_plan / get_effective_credits) mais passe par la vraie
+route synchrone (threadpool) et sa sérialisation.
+"""
+import asyncio
+import time
+from datetime import datetime
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.auth import get_current_user
+from app.database import get_db
+from app.routers import ai, users
+
+# Durée d'un faux appel Groq
+CALL_SECONDS = 0.2
+
+
+class FakeCompletions:
+    """chat.completions d'AsyncGroq : répond après CALL_SECONDS et mesure les appels simultanés"""
+
+    def __init__(self):
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(CALL_SECONDS)
+        finally:
+            self.active -= 1
+        message = SimpleNamespace(content="#marketing\n#contenu\n#linkedin")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+@pytest.fixture
+def fake_groq(monkeypatch):
+    completions = FakeCompletions()
+    client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    monkeypatch.setattr(ai, "get_async_groq_client", lambda: client)
+    return completions
+
+
+@pytest.fixture
+def ai_app():
+    app = FastAPI()
+    app.include_router(ai.router)
+    app.include_router(users.router)
+    app.dependency_overrides[get_current_user] = lambda: SimpleNamespace(
+        id=0, email="test@example.com", name="Test", subscription_tier="pro", current_plan="pro",
+        credits_remaining=10, email_verified=1, created_at=datetime.utcnow(), is_admin=0
+    )
+    app.dependency_overrides[get_db] = lambda: None
+    return app
+
+
+def test_groq_calls_are_capped_without_blocking_the_loop(ai_app, fake_groq, monkeypatch):
+    requests_count = ai.AI_MAX_CONCURRENCY * 3
+
+    async def scenario():
+        # Sémaphore neuf : celui du module se lie à la première boucle qui l'attend
+        monkeypatch.setattr(ai, "_ai_semaphore", asyncio.Semaphore(ai.AI_MAX_CONCURRENCY))
+        gaps = []
+        done = asyncio.Event()
+
+        async def heartbeat():
+            last = time.perf_counter()
+            while not done.is_set():
+                await asyncio.sleep(0.005)
+                now = time.perf_counter()
+                gaps.append(now - last)
+                last = now
+
+        async def users_me(client):
+            """Requêtes /users/me réparties sur la rafale : (réponse, latence)"""
+            timings = []
+            while not done.is_set():
+                started = time.perf_counter()
+                response = await client.get("/users/me")
+                timings.append((response, time.perf_counter() - started))
+                await asyncio.sleep(0.02)
+            return timings
+
+        beat = asyncio.create_task(heartbeat())
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=ai_app), base_url="http://test") as client:
+            me = asyncio.create_task(users_me(client))
+            started = time.perf_counter()
+            responses = await asyncio.gather(*(
+                client.post("/ai/hashtags", json={"content": f"Post {index}", "platform": "linkedin"})
+                for index in range(requests_count)
+            ))
+            elapsed = time.perf_counter() - started
+            done.set()
+            me_timings = await me
+        await beat
+        return responses, elapsed, gaps, me_timings
+
+    responses, elapsed, gaps, me_timings = asyncio.run(scenario())
+
+    assert all(response.status_code == 200 for response in responses)
+    assert all(response.json()["hashtags"] == ["#marketing", "#contenu", "#linkedin"] for response in responses)
+    assert fake_groq.calls == requests_count
+    # Plafond atteint mais jamais dépassé
+    assert fake_groq.max_active == ai.AI_MAX_CONCURRENCY
+    # Trois vagues d'appels, pas une file séquentielle
+    assert elapsed < requests_count * CALL_SECONDS / 2
+    # Boucle jamais bloquée : un appel synchrone la gèlerait CALL_SECONDS
+    assert max(gaps) < CALL_SECONDS / 2
+    # /users/me servi tout au long de la rafale, sans attendre les appels Groq
+    assert len(me_timings) >= 10
+    assert all(response.status_code == 200 for response, _ in me_timings)
+    assert max(latency for _, latency in me_timings) < CALL_SECONDS / 2
@@ -0,0 +1,168 @@
+"""
+Plans d'exécution des requêtes chaudes : chacune doit passer par son index
+composite (migration 5d7e2a9c4f13), jamais par un parcours séquentiel.
+
+enable_seqscan=off rend le test indépendant du volume de données : le
+planificateur ne revient au Seq Scan que si aucun index n'est utilisable.
+"""
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert, select, text
+
+from conftest import requires_db
+
+pytestmark = requires_db
+
+
+@pytest.fixture
+def seeded(db, make_user, make_history):
+    """Plusieurs utilisateurs, leurs requêtes, programmations et analytics ; statistiques à jour"""
+    from app import models
+
+    now = datetime.utcnow()
+    users = [make_user(plan="pro")[0] for _ in range(5)]
+    requests = {user.id: make_history(user, 40) for user in users}
+
+    db.execute(insert(models.ScheduledContent), [
+        {
+            "user_id": user.id,
+            "scheduled_date": now + timedelta(hours=random.randint(-500, 500)),
+            "platform": "linkedin",
+            "status": random.choice(("scheduled", "published", "published", "cancelled")),
+            "reminder_24h_sent": random.random() < 0.8,
+            "reminder_1h_sent": random.random() < 0.8
+        }
+        for user in users for _ in range(200)
+    ])
+    db.execute(insert(models.UsageAnalytics), [
+        {
+            "user_id": user.id,
+            "tokens_used": 500,
+            "request_date": now - timedelta(hours=random.randint(0, 2000)),
+            "platform": models.Platform.linkedin
+        }
+        for user in users for _ in range(200)
+    ])
+    db.commit()
+    for table in ("content_requests", "generated_contents", "scheduled_contents", "usage_analytics", "team_members"):
+        db.execute(text(f"ANALYZE {table}"))
+    db.commit()
+    return users[0], requests[users[0].id]
+
+
+def _plan_nodes(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+def _explain(db, statement) -> list:
+    """Nœuds du plan (EXPLAIN FORMAT JSON) de l'instruction, parcours séquentiels désactivés"""
+    sql = str(statement.compile(dialect=db.bind.dialect, compile_kwargs={"literal_binds": True}))
+    connection = db.connection()
+    connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+    plan = connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}").scalar()[0]["Plan"]
+    return list(_plan_nodes(plan))
+
+
+def _index_family(db, index_name: str) -> set:
+    """L'index et ses index enfants sur les partitions (tables partitionnées)"""
+    children = db.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :name"
+    ), {"name": index_name}).scalars().all()
+    return {index_name, *children}
+
+
+def assert_uses_index(db, statement, index_name: str):
+    nodes = _explain(db, statement)
+    seq_scans = [node["Relation Name"] for node in nodes if node["Node Type"] == "Seq Scan"]
+    assert not seq_scans, f"Seq Scan sur {seq_scans}"
+    used = {node["Index Name"] for node in nodes if "Index Name" in node}
+    assert used & _index_family(db, index_name), f"{index_name} non utilisé (index du plan : {sorted(used)})"
+
+
+def test_history_page_uses_user_created_at_index(db, seeded):
+    from app import models
+    from app.utils.team_utils import visible_content_query
+
+    user, _ = seeded
+    statement = visible_content_query(user, None).order_by(
+        models.ContentRequest.created_at.desc(), models.ContentRequest.id.desc()
+    ).limit(21)
+    assert_uses_index(db, statement, "ix_content_requests_user_id_created_at")
+
+
+def test_history_variants_use_request_id_index(db, seeded):
+    from app.content_archive import _batch_variants_query
+
+    _, requests = seeded
+    assert_uses_index(db, _batch_variants_query(requests[:20]), "ix_generated_contents_request_id")
+
+
+def test_calendar_view_uses_user_scheduled_date_index(db, seeded):
+    from app import models
+
+    user, _ = seeded
+    now = datetime.utcnow()
+    statement = select(models.ScheduledContent).where(
+        models.ScheduledContent.user_id == user.id,
+        models.ScheduledContent.scheduled_date >= now,
+        models.ScheduledContent.scheduled_date <= now + timedelta(days=30)
+    ).order_by(models.ScheduledContent.scheduled_date)
+    assert_uses_index(db, statement, "ix_scheduled_contents_user_id_scheduled_date")
+
+
+@pytest.mark.parametrize("sent_column, index_name, window", [
+    ("reminder_24h_sent", "ix_scheduled_contents_reminder_24h", timedelta(hours=24)),
+    ("reminder_1h_sent", "ix_scheduled_contents_reminder_1h", timedelta(hours=1)),
+])
+def test_reminders_use_reminder_indexes(db, seeded, sent_column, index_name, window):
+    from app import models
+
+    target = datetime.utcnow() + window
+    statement = select(models.ScheduledContent).where(
+        models.ScheduledContent.status == "scheduled",
+        getattr(models.ScheduledContent, sent_column) == False,
+        models.ScheduledContent.scheduled_date >= target - timedelta(minutes=30),
+        models.ScheduledContent.scheduled_date <= target + timedelta(minutes=30)
+    )
+    assert_uses_index(db, statement, index_name)
+
+
+def test_effective_plan_uses_team_members_index(db, seeded):
+    from app import models
+
+    user, _ = seeded
+    statement = select(models.TeamMember).where(
+        models.TeamMember.user_id == user.id,
+        models.TeamMember.status == "active"
+    ).limit(1)
+    assert_uses_index(db, statement, "ix_team_members_user_id_status")
+
+
+def test_usage_analytics_uses_user_request_date_index(db, seeded):
+    from app import models
+
+    user, _ = seeded
+    statement = select(models.UsageAnalytics).where(
+        models.UsageAnalytics.user_id == user.id,
+        models.UsageAnalytics.request_date >= datetime.utcnow() - timedelta(days=30)
+    )
+    assert_uses_index(db, statement, "ix_usage_analytics_user_id_request_date")
+
+
+def test_search_filter_uses_gin_index(db, seeded):
+    from app import models
+    from app.search import search_filter
+    from app.utils.team_utils import visible_content_query
+
+    user, _ = seeded
+    statement = visible_content_query(user, None).where(search_filter("texte original")).order_by(
+        models.ContentRequest.created_at.desc(), models.ContentRequest.id.desc()
+    ).limit(21)
+    # Textes correspondants lus par l'index GIN (français par défaut), une fois pour toute la requête
+    assert_uses_index(db, statement, "ix_text_blobs_search_french")
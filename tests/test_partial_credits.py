@@ -0,0 +1,58 @@
+"""
+Facturation des régénérations partielles (deduct_partial_credits) : le solde
+partiel est un entier de 1/CREDIT_UNITS de crédit, aucune fraction n'est perdue.
+
+Comptes remplacés par des SimpleNamespace (pas de base).
+"""
+from fractions import Fraction
+from types import SimpleNamespace
+
+from app.utils.team_utils import CREDIT_UNITS, deduct_partial_credits
+
+
+def _user(credits: int = 10):
+    return SimpleNamespace(credits_remaining=credits, partial_credit_units=0)
+
+
+def test_three_thirds_charge_exactly_one_credit():
+    user = _user()
+
+    charged = [deduct_partial_credits(user, None, Fraction(1, 3)) for _ in range(3)]
+
+    assert charged == [0, 0, 1]
+    assert user.credits_remaining == 9
+    assert user.partial_credit_units == 0
+
+
+def test_thirty_thirds_charge_ten_credits():
+    user = _user(credits=20)
+
+    for _ in range(30):
+        assert deduct_partial_credits(user, None, Fraction(1, 3)) is not None
+
+    assert user.credits_remaining == 10
+    assert user.partial_credit_units == 0
+
+
+def test_every_share_of_up_to_18_variants_is_exact():
+    for variants_total in range(1, 19):
+        user = _user(credits=1)
+        for _ in range(variants_total):
+            deduct_partial_credits(user, None, Fraction(1, variants_total))
+        assert (user.credits_remaining, user.partial_credit_units) == (0, 0), variants_total
+
+
+def test_team_pool_is_charged_instead_of_user():
+    user = _user()
+    team = SimpleNamespace(team_credits=1, partial_credit_units=CREDIT_UNITS // 2)
+
+    assert deduct_partial_credits(user, team, Fraction(1, 2)) == 1
+    assert (team.team_credits, team.partial_credit_units) == (0, 0)
+    assert (user.credits_remaining, user.partial_credit_units) == (10, 0)
+
+
+def test_empty_pool_is_refused_without_charging():
+    user = _user(credits=0)
+
+    assert deduct_partial_credits(user, None, Fraction(1, 6)) is None
+    assert user.partial_credit_units == 0
@@ -0,0 +1,144 @@
+"""
+Budgets SQL des routes chaudes (app.query_stats.query_budget)
+
+Chaque page contient assez de lignes (10+) pour qu'une requête par ligne
+dépasse le budget : max_repeats=1 échoue dès qu'une même empreinte revient.
+"""
+from datetime import datetime, timedelta
+
+from conftest import requires_db
+
+pytestmark = requires_db
+
+
+def _schedule(db, user, requests, start):
+    from app import models
+    from app.content_archive import get_variants
+
+    for index, content_request in enumerate(requests):
+        variant = get_variants(db, content_request)[0]
+        db.add(models.ScheduledContent(
+            user_id=user.id,
+            content_request_id=content_request.id,
+            generated_content_id=variant.id,
+            scheduled_date=start + timedelta(hours=index + 1),
+            platform="linkedin",
+            title=f"Post {index}"
+        ))
+    db.commit()
+
+
+def test_calendar_view_budget(client, db, make_user, make_history, query_budget):
+    user, headers = make_user(plan="pro")
+    start = datetime.utcnow()
+    _schedule(db, user, make_history(user, 10), start)
+
+    with query_budget(4, max_repeats=1):
+        response = client.get("/calendar/view", headers=headers, params={
+            "start_date": start.isoformat(),
+            "end_date": (start + timedelta(days=2)).isoformat()
+        })
+    assert response.status_code == 200
+
+
+def test_calendar_upcoming_budget(client, db, make_user, make_history, query_budget):
+    user, headers = make_user(plan="pro")
+    _schedule(db, user, make_history(user, 10), datetime.utcnow())
+
+    with query_budget(4, max_repeats=1):
+        response = client.get("/calendar/upcoming", headers=headers, params={"days": 2})
+    assert response.status_code == 200
+
+
+def test_my_team_budget(client, db, make_user, query_budget):
+    from app import models
+
+    owner, headers = make_user(plan="pro")
+    team = models.Team(name="Équipe test", owner_id=owner.id, plan="business", max_members=5)
+    db.add(team)
+    db.flush()
+    db.add(models.TeamMember(team_id=team.id, user_id=owner.id, role="owner"))
+    for _ in range(4):
+        member, _ = make_user(plan="free")
+        db.add(models.TeamMember(team_id=team.id, user_id=member.id, role="member"))
+    db.commit()
+
+    with query_budget(5, max_repeats=1):
+        response = client.get("/teams/my-team", headers=headers)
+    assert response.status_code == 200
+    assert len(response.json()["members"]) == 5
+
+
+def test_admin_users_budget(client, make_user, make_history, query_budget):
+    admin, headers = make_user(is_admin=True)
+    for _ in range(20):
+        user, _ = make_user(plan="free")
+        make_history(user, 2, formats=1)
+
+    with query_budget(2, max_repeats=1):
+        response = client.get("/admin/users", headers=headers, params={"limit": 20})
+    assert response.status_code == 200
+    assert len(response.json()) == 20
+
+
+def test_api_v1_content_budget(client, db, make_user, make_history, query_budget):
+    from app import models
+    from app.utils.api_keys import generate_api_key
+
+    user, _ = make_user(plan="business")
+    make_history(user, 20)
+    full_key, key_prefix, key_hash = generate_api_key()
+    db.add(models.APIKey(user_id=user.id, name="Tests", key_prefix=key_prefix, key_hash=key_hash))
+    db.commit()
+    headers = {"Authorization": f"Bearer {full_key}"}
+
+    # Clé, utilisateur, last_used_at, page (nombre de variantes en sous-requêtes corrélées)
+    with query_budget(4, max_repeats=1):
+        response = client.get("/api/v1/content", headers=headers, params={"limit": 20})
+    assert response.status_code == 200
+    assert len(response.json()) == 20
+
+    # view=preview : aperçus tronqués en SQL, en une requête de plus
+    with query_budget(5, max_repeats=1):
+        response = client.get("/api/v1/content", headers=headers, params={"limit": 20, "view": "preview"})
+    assert response.status_code == 200
+
+
+def test_content_history_budget(client, make_user, make_history, query_budget):
+    user, headers = make_user(plan="pro")
+    make_history(user, 20)
+
+    # Utilisateur, équipe, total (mis en cache), page, auteurs, variantes
+    with query_budget(6, max_repeats=1):
+        response = client.get("/content/history", headers=headers, params={"limit": 20})
+    assert response.status_code == 200
+    assert len(response.json()["items"]) == 20
+
+
+def test_content_history_page_of_100_is_constant(client, db, make_user, make_history, query_budget):
+    from app import models
+
+    user, headers = make_user(plan="pro")
+    member, _ = make_user(plan="free")
+    team = models.Team(name="Équipe historique", owner_id=user.id, plan="pro", max_members=2)
+    db.add(team)
+    db.flush()
+    db.add_all([
+        models.TeamMember(team_id=team.id, user_id=user.id, role="owner"),
+        models.TeamMember(team_id=team.id, user_id=member.id, role="member")
+    ])
+    db.commit()
+    make_history(user, 100)
+    make_history(member, 50)
+
+    # Utilisateur, équipe, page, auteurs (IN), variantes (IN) : 5 requêtes quelle que soit la taille de la page
+    for show_team in (True, False):
+        with query_budget(5, max_repeats=1):
+            response = client.get("/content/history", headers=headers, params={
+                "limit": 100, "show_team": show_team, "include_total": False
+            })
+        assert response.status_code == 200
+        items = response.json()["items"]
+        assert len(items) == 100
+        assert all(len(item["generated_contents"]) == 3 for item in items)
+        assert {item["created_by"]["id"] for item in items} == ({user.id, member.id} if show_team else {user.id})
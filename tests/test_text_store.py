@@ -0,0 +1,64 @@
+"""
+Textes adressés par contenu (app.text_store) : collect_unreferenced_texts ne
+supprime jamais un blob entre son intern_texts et l'écriture de la ligne qui
+le référence (sinon violation de clé étrangère 23503).
+"""
+import uuid
+
+from sqlalchemy import text
+
+from conftest import requires_db
+
+pytestmark = requires_db
+
+
+def _age_blob(db, value: str):
+    """Blob présent, sans référence et plus vieux que le délai de grâce"""
+    from app.text_store import intern_texts
+
+    digest = intern_texts(db, [value])[value]
+    db.execute(text("UPDATE text_blobs SET last_used_at = now() - interval '2 days' WHERE hash = :hash"), {"hash": digest})
+    db.commit()
+    return digest
+
+
+def _blob_exists(db, digest: str) -> bool:
+    return db.execute(text("SELECT 1 FROM text_blobs WHERE hash = :hash"), {"hash": digest}).first() is not None
+
+
+def test_unreferenced_old_blob_is_collected(db):
+    from app.database import engine
+    from app.text_store import collect_unreferenced_texts
+
+    digest = _age_blob(db, f"Texte orphelin {uuid.uuid4()}")
+
+    collect_unreferenced_texts(engine)
+
+    assert not _blob_exists(db, digest)
+
+
+def test_gc_between_intern_and_referencing_write(db, make_user):
+    from app import models
+    from app.database import engine
+    from app.text_store import collect_unreferenced_texts, intern_texts
+
+    user, _ = make_user(plan="pro")
+    value = f"Texte resoumis {uuid.uuid4()}"
+    digest = _age_blob(db, value)
+
+    # Transaction de génération : le texte est interné, la ligne pas encore écrite
+    intern_texts(db, [value])
+    # Maintenance concurrente (autre connexion) : le blob verrouillé est sauté
+    collect_unreferenced_texts(engine)
+
+    content_request = models.ContentRequest(
+        user_id=user.id, original_text=value, platform="multi_format", tone="professional", language="fr"
+    )
+    db.add(content_request)
+    db.commit()
+
+    assert content_request.original_text_hash == digest
+    # last_used_at rafraîchi : hors d'atteinte de la maintenance même sans référence
+    assert db.execute(text(
+        "SELECT last_used_at > now() - interval '1 minute' FROM text_blobs WHERE hash = :hash"
+    ), {"hash": digest}).scalar()